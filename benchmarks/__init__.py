@@ -0,0 +1 @@
+"""Offscreen benchmarks for the player's hot paths, run from the repository root."""
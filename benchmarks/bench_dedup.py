@@ -0,0 +1,106 @@
+"""
+Duplicate detection costs: indexing, file keys and sampled fingerprints.
+
+Run: python -m benchmarks.bench_dedup [--sizes N,N,...] [--files N] [--big-files N] [--big-mb MB]
+Times DuplicateIndex.add per entry for each playlist size, with a copy of
+every tenth entry mixed in, to show indexing stays O(n). File keys (stat
+and realpath) are timed on a generated folder of small files, once in
+a row and once through a thread pool. Sampled mmap fingerprints of
+large files are compared with hashing the whole file.
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from media_dedup import DuplicateIndex, FileKeys, content_fingerprint, file_keys
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+def index_costs(size):
+    keys = [(f"/media/artist {i // 100}/track {i:07d}.mp3",
+             FileKeys(f"/media/artist {i // 100}/track {i:07d}.mp3", (1, i + 1, 1000 + i), 1000 + i))
+            for i in range(size)]
+    # Every tenth entry again through a symlinked folder: another path, the same identity
+    keys += [(path.replace("/media/", "/mnt/link/"), FileKeys(entry.real, entry.identity, entry.size))
+             for path, entry in keys[::10]]
+    index = DuplicateIndex()
+    start = time.perf_counter()
+    duplicates = sum(index.add(path, entry) is not None for path, entry in keys)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(keys) * 1e6, duplicates
+
+
+def _whole_file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def run(sizes=SIZES, files=10_000, big_files=8, big_mb=64):
+    results = {"index": {size: index_costs(size) for size in sizes}}
+    folder = tempfile.mkdtemp(prefix="bench_dedup_")
+    try:
+        paths = []
+        for i in range(files):
+            directory = os.path.join(folder, f"dir{i // 1000}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"track{i:05d}.mp3")
+            with open(path, 'wb') as f:
+                f.write(b"\0" * (i % 997))
+            paths.append(path)
+        start = time.perf_counter()
+        for path in paths:
+            file_keys(path)
+        results["keys_us"] = (time.perf_counter() - start) / files * 1e6
+        with ThreadPoolExecutor(max_workers=min(16, (os.cpu_count() or 1) * 2)) as executor:
+            start = time.perf_counter()
+            list(executor.map(file_keys, paths, chunksize=64))
+            results["keys_pool_us"] = (time.perf_counter() - start) / files * 1e6
+
+        big_paths = []
+        block = os.urandom(1024 * 1024)
+        for i in range(big_files):
+            path = os.path.join(folder, f"movie{i}.mkv")
+            with open(path, 'wb') as f:
+                for _ in range(big_mb):
+                    f.write(block)
+                f.write(str(i).encode())
+            big_paths.append(path)
+        start = time.perf_counter()
+        sampled = [content_fingerprint(path) for path in big_paths]
+        results["sampled_ms"] = (time.perf_counter() - start) / big_files * 1000
+        start = time.perf_counter()
+        for path in big_paths:
+            _whole_file_hash(path)
+        results["whole_ms"] = (time.perf_counter() - start) / big_files * 1000
+        results["distinct"] = len(set(sampled))
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma separated playlist sizes")
+    parser.add_argument("--files", type=int, default=10_000, help="small files to compute keys for")
+    parser.add_argument("--big-files", type=int, default=8, help="large files to fingerprint")
+    parser.add_argument("--big-mb", type=int, default=64, help="size of each large file in MiB")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = run(sizes, args.files, args.big_files, args.big_mb)
+    for size, (per_entry_us, duplicates) in results["index"].items():
+        print(f"{size:>9} entries: index {per_entry_us:.2f} us per entry, {duplicates} duplicates found")
+    print(f"file keys: {results['keys_us']:.1f} us per file in a row, {results['keys_pool_us']:.1f} us in a pool")
+    print(f"fingerprint of a {args.big_mb} MiB file: sampled {results['sampled_ms']:.2f} ms, "
+          f"whole file {results['whole_ms']:.1f} ms ({results['distinct']} of {args.big_files} distinct)")
+
+
+if __name__ == "__main__":
+    main()
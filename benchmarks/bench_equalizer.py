@@ -0,0 +1,55 @@
+"""
+Equalizer DSP real-time factor.
+
+Run: python -m benchmarks.bench_equalizer [--seconds S] [--chunk N]
+Filters stereo noise in sink-sized chunks with all ten bands active and
+reports audio seconds processed per wall second (the real-time factor)
+at 44.1, 48 and 96 kHz. A gain change is issued every second so the
+cross-faded coefficient swaps are part of the measurement.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from equalizer import EQ_FREQUENCIES, Equalizer
+
+SAMPLE_RATES = (44100, 48000, 96000)
+PRESET = (8, 9, 9, 5, 1, -4, -8, -10, -11, -11)
+
+
+def run(seconds=10.0, chunk_frames=2048, sample_rates=SAMPLE_RATES):
+    results = {}
+    rng = np.random.default_rng(0)
+    for sample_rate in sample_rates:
+        audio = (rng.standard_normal((int(seconds * sample_rate), 2)) * 0.1).astype(np.float32)
+        equalizer = Equalizer(sample_rate, 2)
+        start = time.perf_counter()
+        equalizer.set_gains(PRESET)
+        setup = time.perf_counter() - start
+        next_change = sample_rate
+        start = time.perf_counter()
+        for offset in range(0, len(audio), chunk_frames):
+            if offset >= next_change:
+                shift = (offset // sample_rate) % len(EQ_FREQUENCIES)
+                equalizer.set_gains(PRESET[shift:] + PRESET[:shift])
+                next_change += sample_rate
+            equalizer.process(audio[offset:offset + chunk_frames])
+        elapsed = time.perf_counter() - start
+        results[sample_rate] = {"seconds": elapsed, "setup_ms": setup * 1000.0,
+                                "realtime_factor": seconds / elapsed if elapsed else float("inf")}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0, help="audio length per sample rate")
+    parser.add_argument("--chunk", type=int, default=2048, help="frames handed to process() at once")
+    args = parser.parse_args()
+    for sample_rate, stats in run(args.seconds, args.chunk).items():
+        print(f"{sample_rate / 1000:>5.1f} kHz stereo: {args.seconds:.0f}s of audio in {stats['seconds']:.3f}s "
+              f"= {stats['realtime_factor']:.1f}x real time (filter build {stats['setup_ms']:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
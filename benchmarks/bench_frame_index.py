@@ -0,0 +1,52 @@
+"""
+Frame timestamp index build time.
+
+Run: python -m benchmarks.bench_frame_index [--minutes M] [--fps F]
+Writes synthetic MP4 and Matroska files of the given length (tables and
+block headers only) and times a cold index build and a cached load of each.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import write_mkv, write_mp4_frames
+from frame_index import FrameIndexCache, build_frame_index
+
+
+def run(minutes=120.0, fps=60.0):
+    seconds = minutes * 60
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        cache = FrameIndexCache(os.path.join(root, "cache"))
+        files = {
+            "mp4": lambda path: write_mp4_frames(path, seconds, fps_num=int(fps * 1000), fps_den=1000),
+            "mkv": lambda path: write_mkv(path, seconds, fps=fps),
+        }
+        for label, writer in files.items():
+            path = os.path.join(root, f"video.{label}")
+            frames = writer(path)
+            start = time.perf_counter()
+            index = build_frame_index(path)
+            built = time.perf_counter() - start
+            cache.load(path)
+            start = time.perf_counter()
+            cache.load(path)
+            cached = time.perf_counter() - start
+            results[label] = {"frames": frames, "indexed": len(index), "build_seconds": built,
+                              "cached_seconds": cached}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=120.0)
+    parser.add_argument("--fps", type=float, default=60.0)
+    args = parser.parse_args()
+    for label, stats in run(args.minutes, args.fps).items():
+        print(f"{label}: {stats['indexed']}/{stats['frames']} frames indexed in {stats['build_seconds'] * 1000:.0f} ms, "
+              f"cached load {stats['cached_seconds'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
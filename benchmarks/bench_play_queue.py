@@ -0,0 +1,98 @@
+"""
+Play queue step and edit costs at playlist scale.
+
+Run: python -m benchmarks.bench_play_queue [--sizes N,N,...] [--steps N]
+For each playlist size times shuffled and sequential next, previous back
+through the whole history, removing single rows in the middle of a
+shuffle cycle, removing a thousand scattered rows bottom-up as the
+playlist model reports them and appending rows. A full random.shuffle of the playlist is
+timed as the cost an eager shuffle would pay on every toggle.
+"""
+import argparse
+import random
+import time
+
+from play_queue import HISTORY_LENGTH, PlayQueue
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+def _per_op_us(function, count):
+    start = time.perf_counter()
+    function(count)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def run(sizes=SIZES, steps=10_000):
+    results = {}
+    for size in sizes:
+        rng = random.Random(0)
+        stats = {}
+
+        queue = PlayQueue(size, rng=random.Random(0))
+        start = time.perf_counter()
+        queue.set_shuffle(True)
+        queue.start(0)
+        stats["shuffle_on_us"] = (time.perf_counter() - start) * 1e6
+
+        def step_next(count):
+            for _ in range(count):
+                queue.next()
+
+        def step_previous(count):
+            for _ in range(count):
+                queue.previous()
+
+        stats["shuffle_next_us"] = _per_op_us(step_next, steps)
+        # Only the bounded history can be stepped back through
+        stats["previous_us"] = _per_op_us(step_previous, min(steps, HISTORY_LENGTH))
+
+        def remove_one(count):
+            for _ in range(count):
+                row = rng.randrange(len(queue))
+                queue.remove_range(row, row)
+                queue.next()
+
+        removals = max(10, steps // 100)
+        stats["remove_one_ms"] = _per_op_us(remove_one, removals) / 1000
+
+        rows = sorted(rng.sample(range(len(queue)), 1000))
+        start = time.perf_counter()
+        for row in reversed(rows):
+            queue.remove_range(row, row)
+        queue.next()
+        stats["remove_1000_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(100):
+            count = len(queue)
+            queue.insert_range(count, count + 9)
+        stats["append_10_us"] = (time.perf_counter() - start) / 100 * 1e6
+
+        sequential = PlayQueue(size)
+        stats["sequential_next_us"] = _per_op_us(lambda count: [sequential.next() for _ in range(count)], steps)
+
+        rows = list(range(size))
+        start = time.perf_counter()
+        rng.shuffle(rows)
+        stats["full_shuffle_ms"] = (time.perf_counter() - start) * 1000
+        results[size] = stats
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma separated playlist sizes")
+    parser.add_argument("--steps", type=int, default=10_000, help="next and previous steps per size")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    for size, stats in run(sizes, args.steps).items():
+        print(f"{size:>9} tracks: shuffle next {stats['shuffle_next_us']:.1f} us, "
+              f"sequential next {stats['sequential_next_us']:.1f} us, previous {stats['previous_us']:.1f} us, "
+              f"append 10 {stats['append_10_us']:.1f} us, shuffle on {stats['shuffle_on_us']:.0f} us")
+        print(f"{'':>16} remove 1 {stats['remove_one_ms']:.2f} ms, remove 1000 {stats['remove_1000_ms']:.2f} ms, "
+              f"eager full shuffle {stats['full_shuffle_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
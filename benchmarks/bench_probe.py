@@ -0,0 +1,51 @@
+"""
+Metadata probe throughput in files/sec.
+
+Run: python -m benchmarks.bench_probe [--files N] [--workers N] [--processes]
+Probes a synthetic library cold (no cache), warm (cache hits only) and
+reports files per second for each pass.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.fixtures import make_media_tree
+from media_probe import ProbeCache, probe_paths
+
+
+def run(files=2000, workers=None, processes=False):
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        paths = make_media_tree(os.path.join(root, "media"), files)
+        cache = ProbeCache(os.path.join(root, "probe.sqlite3"))
+        executor = ProcessPoolExecutor(max_workers=workers) if processes else None
+        try:
+            for label in ("cold", "warm"):
+                start = time.perf_counter()
+                probed = sum(1 for _path, info in probe_paths(paths, cache, workers, executor)
+                             if info is not None)
+                elapsed = time.perf_counter() - start
+                results[label] = {"files": probed, "seconds": elapsed,
+                                  "files_per_sec": probed / elapsed if elapsed else float("inf")}
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            cache.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--processes", action="store_true", help="use a process pool instead of threads")
+    args = parser.parse_args()
+    for label, stats in run(args.files, args.workers, args.processes).items():
+        print(f"{label:>5}: {stats['files']} files in {stats['seconds']:.3f}s "
+              f"= {stats['files_per_sec']:.0f} files/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Session store write and restore costs at playlist scale.
+
+Run: python -m benchmarks.bench_session [--sizes N,N,...] [--flushes N]
+For each playlist size times a flush that appends one resume position to
+the journal, the full rewrite a snapshot of the session costs, loading the
+small state that the window needs before it shows, and reading the whole
+playlist back as the background rehydration does.
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+from session_store import SessionStore, read_playlist
+
+SIZES = (1_000, 10_000, 100_000)
+
+
+def run(sizes=SIZES, flushes=1000):
+    results = {}
+    for size in sizes:
+        folder = tempfile.mkdtemp(prefix="bench_session_")
+        try:
+            store = SessionStore(folder)
+            store.load()
+            store.playlist_added([f"/media/music/artist {i // 100}/track {i:06d}.mp3" for i in range(size)])
+            store.set("current", "/media/music/artist 0/track 000000.mp3")
+            store.compact()
+            stats = {}
+
+            start = time.perf_counter()
+            for i in range(flushes):
+                store.set_resume("/media/music/artist 0/track 000000.mp3", 1000 + i)
+                store.flush()
+            stats["flush_us"] = (time.perf_counter() - start) / flushes * 1e6
+
+            start = time.perf_counter()
+            store.compact()
+            stats["compact_ms"] = (time.perf_counter() - start) * 1000
+
+            restored = SessionStore(folder)
+            start = time.perf_counter()
+            restored.load()
+            stats["load_state_ms"] = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            paths = read_playlist(restored.playlist_path, restored.playlist_ops)
+            stats["read_playlist_ms"] = (time.perf_counter() - start) * 1000
+            assert len(paths) == size
+            results[size] = stats
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma separated playlist sizes")
+    parser.add_argument("--flushes", type=int, default=1000, help="position updates to flush per size")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    for size, stats in run(sizes, args.flushes).items():
+        print(f"{size:>7} entries: position flush {stats['flush_us']:.1f} us, full rewrite {stats['compact_ms']:.1f} ms, "
+              f"state load {stats['load_state_ms']:.2f} ms, playlist read {stats['read_playlist_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Launch-to-enqueue latency of single instance forwarding.
+
+Run: python -m benchmarks.bench_single_instance [--runs N] [--files N]
+Listens with an InstanceServer under a private name and launches main.py
+with N files as a second instance would be started. Each run times the
+launch until the files arrive at the server and until the launching
+process has exited. A bare interpreter that imports QtNetwork is timed
+too, since that start cost is the floor for any forwarding launch.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from PyQt6.QtCore import QCoreApplication
+
+from benchmarks.fixtures import make_media_tree
+from single_instance import InstanceServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _summary(values):
+    return {"min_ms": min(values) * 1000, "median_ms": _percentile(values, 0.5) * 1000,
+            "p95_ms": _percentile(values, 0.95) * 1000}
+
+
+def run(runs=20, files=50):
+    app = QCoreApplication.instance() or QCoreApplication([])
+    name = f"MediaPlayer-bench-{os.getpid()}"
+    env = dict(os.environ, MEDIAPLAYER_INSTANCE=name)
+    server = InstanceServer(name)
+    if not server.listen(replace_stale=True):
+        raise RuntimeError(f"cannot listen on {name}")
+    received = []
+    server.message_received.connect(lambda paths, flags: received.append((time.perf_counter(), len(paths))))
+    enqueue, exit_times, baseline = [], [], []
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            paths = make_media_tree(os.path.join(root, "media"), files)
+            for _ in range(runs):
+                received.clear()
+                start = time.perf_counter()
+                process = subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py"), *paths],
+                                           env=env, cwd=ROOT)
+                while not received and process.poll() is None:
+                    app.processEvents()
+                    time.sleep(0.0005)
+                while not received and time.perf_counter() - start < 5.0:
+                    app.processEvents()
+                process.wait()
+                exited = time.perf_counter()
+                if not received or received[0][1] != files:
+                    raise RuntimeError("the launch did not forward its files")
+                enqueue.append(received[0][0] - start)
+                exit_times.append(exited - start)
+            for _ in range(runs):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, "-c", "import PyQt6.QtNetwork"], check=True)
+                baseline.append(time.perf_counter() - start)
+    finally:
+        server.close()
+    return {"launch_to_enqueue": _summary(enqueue), "launch_to_exit": _summary(exit_times),
+            "interpreter_with_qtnetwork": _summary(baseline)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--files", type=int, default=50)
+    args = parser.parse_args()
+    for label, stats in run(args.runs, args.files).items():
+        print(f"{label:>26}: min {stats['min_ms']:.1f} ms, median {stats['median_ms']:.1f} ms, "
+              f"p95 {stats['p95_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+CPU cost of playback telemetry collection.
+
+Run: python -m benchmarks.bench_telemetry [--seconds S] [--fps N]
+Replays the hooks PlaybackTelemetry runs for S seconds of video playback:
+per frame a signal count, a FrameClock step and a lateness observation,
+per position update a signal count, with a seek every ten seconds. The
+frames are timed back to back, then the cost is reported as a share of
+one core at the given frame rate. Rendering snapshots as JSON and as
+Prometheus text is timed separately.
+"""
+import argparse
+import random
+import time
+
+from telemetry import FrameClock, Telemetry
+
+POSITION_HZ = 20
+
+
+def run(seconds=600, fps=60):
+    rng = random.Random(0)
+    metrics = Telemetry()
+    clock = FrameClock()
+    frame_labels = (("signal", "videoFrameChanged"),)
+    position_labels = (("signal", "positionChanged"),)
+    interval_us = 1e6 / fps
+    frames = int(seconds * fps)
+    # Presentation times with an occasional skipped frame, arrival times with jitter
+    schedule = []
+    media_us = 0.0
+    for i in range(frames):
+        media_us += interval_us * (2 if rng.random() < 0.002 else 1)
+        schedule.append((int(media_us), media_us / 1e6 + rng.uniform(0.0, 0.004)))
+    positions_per_frame = POSITION_HZ / fps
+
+    start = time.perf_counter()
+    owed = 0.0
+    for i, (start_us, now) in enumerate(schedule):
+        metrics.count("signals", labels=frame_labels)
+        dropped, late, lateness_ms = clock.frame(start_us, now, 1.0, interval_us)
+        if dropped:
+            metrics.count("dropped_frames", dropped)
+        if late:
+            metrics.count("late_frames")
+        metrics.observe("frame_lateness", lateness_ms)
+        owed += positions_per_frame
+        while owed >= 1.0:
+            owed -= 1.0
+            metrics.count("signals", labels=position_labels)
+        if i % (fps * 10) == 0:
+            metrics.observe("seek", rng.uniform(20.0, 120.0))
+    elapsed = time.perf_counter() - start
+
+    renders = 100
+    start = time.perf_counter()
+    for _ in range(renders):
+        metrics.json_line()
+    json_ms = (time.perf_counter() - start) / renders * 1000
+    start = time.perf_counter()
+    for _ in range(renders):
+        metrics.prometheus_text()
+    prometheus_ms = (time.perf_counter() - start) / renders * 1000
+    dropped = metrics.counters[("dropped_frames", ())].total if ("dropped_frames", ()) in metrics.counters else 0
+    return {"frames": frames, "seconds": elapsed, "per_frame_us": elapsed / frames * 1e6,
+            "cpu_percent": elapsed / seconds * 100, "dropped": dropped,
+            "json_ms": json_ms, "prometheus_ms": prometheus_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=600, help="playback time to replay")
+    parser.add_argument("--fps", type=int, default=60, help="video frame rate")
+    args = parser.parse_args()
+    stats = run(args.seconds, args.fps)
+    print(f"{stats['frames']} frames in {stats['seconds']:.3f}s = {stats['per_frame_us']:.2f} us per frame, "
+          f"{stats['cpu_percent']:.3f}% of one core at {args.fps} fps ({stats['dropped']} dropped frames found)")
+    print(f"snapshot as JSON {stats['json_ms']:.2f} ms, as Prometheus text {stats['prometheus_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
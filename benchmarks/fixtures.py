@@ -0,0 +1,253 @@
+"""
+Synthetic media fixtures for the benchmarks.
+
+Each writer produces a small file with valid container headers so the
+probing and indexing code paths run exactly as they would on real media.
+Audio payloads are silence or a sine tone; they are never decoded here.
+WAV tones and uncompressed AVI video are fully decodable, for the
+benchmarks that play media.
+"""
+import math
+import os
+import struct
+import wave
+
+
+def write_wav(path, seconds=1.0, sample_rate=44100, channels=2, tone_hz=440.0):
+    frames = int(seconds * sample_rate)
+    period = [int(12000 * math.sin(2 * math.pi * tone_hz * i / sample_rate))
+              for i in range(min(frames, sample_rate))]
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        block = b''.join(struct.pack('<h', v) * channels for v in period)
+        written = 0
+        while written < frames:
+            count = min(len(period), frames - written)
+            w.writeframes(block[:count * 2 * channels])
+            written += count
+
+
+def _id3v2(title, artist, album):
+    frames = b''
+    for frame_id, value in ((b'TIT2', title), (b'TPE1', artist), (b'TALB', album)):
+        body = b'\x03' + value.encode('utf-8')
+        frames += frame_id + struct.pack('>I', len(body)) + b'\x00\x00' + body
+    size = len(frames)
+    syncsafe = bytes(((size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F))
+    return b'ID3\x03\x00\x00' + syncsafe + frames
+
+
+def write_mp3(path, seconds=1.0, title="Title", artist="Artist", album="Album"):
+    """MPEG-1 layer III, 128 kbps, 44.1 kHz stereo with a Xing header"""
+    frame_count = int(seconds * 44100 / 1152)
+    frame_size = 144 * 128000 // 44100
+    header = struct.pack('>I', 0xFFFB9000)
+    xing = header + b'\x00' * 32 + b'Xing' + struct.pack('>II', 1, frame_count)
+    xing += b'\x00' * (frame_size - len(xing))
+    silent = header + b'\x00' * (frame_size - 4)
+    with open(path, 'wb') as f:
+        f.write(_id3v2(title, artist, album))
+        f.write(xing)
+        f.write(silent * frame_count)
+
+
+def write_flac(path, seconds=1.0, sample_rate=44100, channels=2, title="Title"):
+    total = int(seconds * sample_rate)
+    packed = (sample_rate << 44) | ((channels - 1) << 41) | (15 << 36) | total
+    streaminfo = struct.pack('>HH', 4096, 4096) + b'\x00' * 6 + packed.to_bytes(8, 'big') + b'\x00' * 16
+    vendor = b'bench'
+    comment = f"TITLE={title}".encode('utf-8')
+    vorbis = (struct.pack('<I', len(vendor)) + vendor + struct.pack('<I', 1)
+              + struct.pack('<I', len(comment)) + comment)
+    with open(path, 'wb') as f:
+        f.write(b'fLaC')
+        f.write(b'\x00' + len(streaminfo).to_bytes(3, 'big') + streaminfo)
+        f.write(b'\x84' + len(vorbis).to_bytes(3, 'big') + vorbis)
+        f.write(b'\xff\xf8' + b'\x00' * 2048)
+
+
+def _ogg_page(payload, granule, serial, sequence, header_type=0):
+    segments = []
+    remaining = len(payload)
+    while remaining >= 255:
+        segments.append(255)
+        remaining -= 255
+    segments.append(remaining)
+    return (b'OggS' + bytes((0, header_type)) + struct.pack('<qIII', granule, serial, sequence, 0)
+            + bytes((len(segments),)) + bytes(segments) + payload)
+
+
+def write_ogg_vorbis(path, seconds=1.0, sample_rate=44100, channels=2, title="Title"):
+    serial = 0x1234
+    ident = (b'\x01vorbis' + struct.pack('<IBIiii', 0, channels, sample_rate, 0, 128000, 0)
+             + b'\xb8\x01')
+    vendor = b'bench'
+    comment = f"TITLE={title}".encode('utf-8')
+    comments = (b'\x03vorbis' + struct.pack('<I', len(vendor)) + vendor + struct.pack('<I', 1)
+                + struct.pack('<I', len(comment)) + comment + b'\x01')
+    with open(path, 'wb') as f:
+        f.write(_ogg_page(ident, 0, serial, 0, header_type=2))
+        f.write(_ogg_page(comments, 0, serial, 1))
+        f.write(_ogg_page(b'\x00' * 1024, int(seconds * sample_rate), serial, 2, header_type=4))
+
+
+def _box(box_type, payload):
+    return struct.pack('>I', 8 + len(payload)) + box_type + payload
+
+
+def mp4_moov(seconds=1.0, timescale=1000, tracks=b''):
+    mvhd = _box(b'mvhd', b'\x00' * 4 + struct.pack('>IIII', 0, 0, timescale, int(seconds * timescale))
+                + b'\x00' * 80)
+    return _box(b'moov', mvhd + tracks)
+
+
+def mp4_track(handler, codec, sample_entry=b'', stbl_extra=b''):
+    hdlr = _box(b'hdlr', b'\x00' * 8 + handler + b'\x00' * 12)
+    entry = _box(codec, b'\x00' * 6 + b'\x00\x01' + sample_entry)
+    stsd = _box(b'stsd', b'\x00' * 4 + struct.pack('>I', 1) + entry)
+    stbl = _box(b'stbl', stsd + stbl_extra)
+    return _box(b'trak', _box(b'mdia', hdlr + _box(b'minf', stbl)))
+
+
+def write_mp4(path, seconds=1.0, moov_at_end=True, stbl_extra=b'', mdat_size=4096):
+    audio_entry = b'\x00' * 8 + struct.pack('>HHHH', 2, 16, 0, 0) + struct.pack('>I', 44100 << 16)
+    tracks = (mp4_track(b'vide', b'avc1', b'\x00' * 70, stbl_extra)
+              + mp4_track(b'soun', b'mp4a', audio_entry))
+    ftyp = _box(b'ftyp', b'isom\x00\x00\x02\x00isomavc1')
+    moov = mp4_moov(seconds, tracks=tracks)
+    mdat = _box(b'mdat', b'\x00' * mdat_size)
+    with open(path, 'wb') as f:
+        f.write(ftyp)
+        f.write(mdat + moov if moov_at_end else moov + mdat)
+
+
+def _chunk(fourcc, data):
+    return fourcc + struct.pack('<I', len(data)) + data + (b'\x00' if len(data) % 2 else b'')
+
+
+def _list(list_type, content):
+    return b'LIST' + struct.pack('<I', 4 + len(content)) + list_type + content
+
+
+def write_avi(path, seconds=10.0, width=160, height=90, fps=25):
+    """Uncompressed 24-bit AVI of a bar sweeping across a grey frame, returns the frame count"""
+    frames = int(seconds * fps)
+    stride = (width * 3 + 3) & ~3
+    frame_size = stride * height
+    avih = struct.pack('<IIIIIIIIII4I', 1000000 // fps, frame_size * fps, 0, 0x10, frames, 0, 1,
+                       frame_size, width, height, 0, 0, 0, 0)
+    strh = struct.pack('<4s4sIHHIIIIIIiIhhhh', b'vids', b'DIB ', 0, 0, 0, 0, 1, fps, 0, frames,
+                       frame_size, -1, 0, 0, 0, width, height)
+    strf = struct.pack('<IiiHHIIiiII', 40, width, height, 1, 24, 0, frame_size, 0, 0, 0, 0)
+    header = _list(b'hdrl', _chunk(b'avih', avih) + _list(b'strl', _chunk(b'strh', strh) + _chunk(b'strf', strf)))
+    background = b'\x40' * (width * 3) + b'\x00' * (stride - width * 3)
+    bar_width = max(1, width // 16)
+    chunks = []
+    index = []
+    offset = 4
+    for i in range(frames):
+        x = (i * 2) % (width - bar_width)
+        row = background[:x * 3] + b'\xf0' * (bar_width * 3) + background[(x + bar_width) * 3:]
+        chunk = _chunk(b'00db', row * height)
+        index.append(struct.pack('<4sIII', b'00db', 0x10, offset, frame_size))
+        chunks.append(chunk)
+        offset += len(chunk)
+    movi = _list(b'movi', b''.join(chunks))
+    body = b'AVI ' + header + movi + _chunk(b'idx1', b''.join(index))
+    with open(path, 'wb') as f:
+        f.write(b'RIFF' + struct.pack('<I', len(body)) + body)
+    return frames
+
+
+WRITERS = {
+    '.wav': write_wav,
+    '.mp3': write_mp3,
+    '.flac': write_flac,
+    '.ogg': write_ogg_vorbis,
+    '.mp4': write_mp4,
+}
+
+
+def make_media_tree(root, count, extensions=('.mp3', '.flac', '.wav', '.ogg', '.mp4'),
+                    per_dir=50, seconds=0.05):
+    """Create count small media files spread over folders of per_dir files, returns their paths"""
+    paths = []
+    for i in range(count):
+        folder = os.path.join(root, f"artist{i // (per_dir * 10):03d}", f"album{i // per_dir:04d}")
+        os.makedirs(folder, exist_ok=True)
+        ext = extensions[i % len(extensions)]
+        path = os.path.join(folder, f"{i % per_dir:02d} - track {i}{ext}")
+        WRITERS[ext](path, seconds=seconds)
+        paths.append(path)
+    return paths
+
+
+def _full_box(box_type, fmt, rows, version=0):
+    return _box(box_type, bytes((version, 0, 0, 0)) + struct.pack('>I', len(rows))
+                + b''.join(struct.pack(fmt, *row) for row in rows))
+
+
+def write_mp4_frames(path, seconds=60.0, fps_num=24000, fps_den=1001, gop=48):
+    """MP4 whose video track carries full stts/ctts/stss tables for IPBB ordered frames"""
+    timescale = fps_num
+    frames = int(seconds * fps_num / fps_den)
+    stts = _full_box(b'stts', '>II', [(frames, fps_den)])
+    # Decode order I P B B: the P is shown two frames late, each B one frame early
+    pattern = [fps_den, 3 * fps_den, 0, 0]
+    ctts_rows = [(1, pattern[i % 4]) for i in range(frames)]
+    ctts = _full_box(b'ctts', '>Ii', ctts_rows, version=1)
+    stss = _full_box(b'stss', '>I', [(i + 1,) for i in range(0, frames, gop)])
+    elst = _full_box(b'elst', '>Ii', [(int(seconds * 1000), fps_den)])
+    mdhd = _box(b'mdhd', b'\x00' * 12 + struct.pack('>II', timescale, frames * fps_den) + b'\x00' * 4)
+    hdlr = _box(b'hdlr', b'\x00' * 8 + b'vide' + b'\x00' * 12)
+    stbl = _box(b'stbl', stts + ctts + stss)
+    trak = _box(b'trak', _box(b'edts', elst) + _box(b'mdia', mdhd + hdlr + _box(b'minf', stbl)))
+    with open(path, 'wb') as f:
+        f.write(_box(b'ftyp', b'isom\x00\x00\x02\x00isomavc1'))
+        f.write(mp4_moov(seconds, tracks=trak))
+        f.write(_box(b'mdat', b'\x00' * 64))
+    return frames
+
+
+def _ebml(element_id, payload):
+    size = len(payload)
+    length = 1
+    while size >= (1 << (7 * length)) - 1:
+        length += 1
+    encoded = (size | (1 << (7 * length))).to_bytes(length, 'big')
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big') + encoded + payload
+
+
+def write_mkv(path, seconds=60.0, fps=25.0, audio_rate=47.0, gop=50, cluster_ms=5000):
+    """Matroska file with a video and an audio track of tiny blocks, returns the video frame count"""
+    header = _ebml(0x1A45DFA3, _ebml(0x4282, b'matroska'))
+    info = _ebml(0x1549A966, _ebml(0x2AD7B1, (1000000).to_bytes(3, 'big')))
+    tracks = _ebml(0x1654AE6B, _ebml(0xAE, _ebml(0xD7, b'\x01') + _ebml(0x83, b'\x01'))
+                   + _ebml(0xAE, _ebml(0xD7, b'\x02') + _ebml(0x83, b'\x02')))
+    video = [round(i * 1000 / fps) for i in range(int(seconds * fps))]
+    audio = [round(i * 1000 / audio_rate) for i in range(int(seconds * audio_rate))]
+    clusters = []
+    v = a = 0
+    for cluster_start in range(0, int(seconds * 1000), cluster_ms):
+        blocks = [_ebml(0xE7, cluster_start.to_bytes(4, 'big'))]
+        cluster_end = cluster_start + cluster_ms
+        while v < len(video) or a < len(audio):
+            take_video = v < len(video) and (a >= len(audio) or video[v] <= audio[a])
+            time = video[v] if take_video else audio[a]
+            if time >= cluster_end:
+                break
+            flags = 0x80 if (not take_video or v % gop == 0) else 0
+            track = 0x81 if take_video else 0x82
+            blocks.append(_ebml(0xA3, bytes((track,)) + struct.pack('>hB', time - cluster_start, flags)
+                                + b'\x00' * 8))
+            if take_video:
+                v += 1
+            else:
+                a += 1
+        clusters.append(_ebml(0x1F43B675, b''.join(blocks)))
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(_ebml(0x18538067, info + tracks + b''.join(clusters)))
+    return len(video)
@@ -0,0 +1,467 @@
+"""
+Offscreen benchmark suite for the player's hot paths.
+
+Run: python -m benchmarks.suite [--quick] [--only NAME,...] [--output FILE]
+                                [--baseline FILE] [--tolerance F]
+Generates WAV tones, uncompressed AVI video and header-only media trees
+in a temporary folder, then times what a user waits on: adding 10k and
+100k playlist entries, folder scanning, playlist search, playlist save
+and load, the play_next switch, seeks and startup to first frame. Window
+benchmarks drive a real MediaPlayer under QT_QPA_PLATFORM=offscreen and
+are reported as skipped when QtMultimedia cannot be loaded. Results go to
+a JSON file. With --baseline each metric is compared against an earlier
+results file, and the run exits with status 1 when one got worse by more
+than the tolerance. Metrics ending in _per_sec are better when higher,
+all others (milliseconds) when lower.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from benchmarks.fixtures import make_media_tree, write_avi, write_wav
+from media_scan import scan_media_files
+from play_queue import REPEAT_ALL
+from playlist_io import iter_playlist, write_playlist
+from playlist_search import PlaylistSearchIndex
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_VERSION = 1
+WAIT_TIMEOUT = 10.0
+# Timings of Qt-free paths are the median of this many runs
+REPEATS = 5
+WORDS = ("love", "night", "blue", "river", "live", "remix", "dance", "moon", "road", "fire", "album", "demo")
+QUERIES = ("l", "lo", "lov", "love", "love night", "remix 12", "zzz")
+
+
+class Skipped(Exception):
+    """Raised by a benchmark that cannot run in this environment"""
+
+
+def synthetic_paths(count, root):
+    """Plausible library paths that do not exist on disk"""
+    rng = random.Random(count)
+    paths = []
+    for i in range(count):
+        title = " ".join(rng.choice(WORDS) for _ in range(3))
+        paths.append(os.path.join(root, f"artist {i // 500:03d}", f"album {i // 20:05d}",
+                                  f"{i % 20:02d} - {title} {i}.mp3"))
+    return paths
+
+
+def _median_ms(values):
+    return statistics.median(values) * 1000.0
+
+
+def _p95_ms(values):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(0.95 * len(values)))] * 1000.0
+
+
+class Suite:
+    """Fixtures and the offscreen application shared by the benchmarks of one run"""
+    def __init__(self, root, quick=False):
+        self.root = root
+        self.quick = quick
+        self.playlist_sizes = (1000, 10000) if quick else (10000, 100000)
+        self.tree_files = 500 if quick else 2000
+        self._main = None
+        self._tones = None
+        self._video = None
+
+    def tones(self, count=4, seconds=10.0):
+        if self._tones is None:
+            self._tones = []
+            for i in range(count):
+                path = os.path.join(self.root, f"tone{i}.wav")
+                write_wav(path, seconds=seconds, tone_hz=220.0 * (i + 1))
+                self._tones.append(path)
+        return self._tones
+
+    def video(self, seconds=20.0):
+        if self._video is None:
+            self._video = os.path.join(self.root, "sweep.avi")
+            write_avi(self._video, seconds=seconds)
+        return self._video
+
+    def main_module(self):
+        if self._main is None:
+            try:
+                import main
+            except ImportError as e:
+                raise Skipped(f"the player cannot be imported here: {e}")
+            from PyQt6.QtCore import QStandardPaths
+            from PyQt6.QtWidgets import QApplication
+            # Caches, bookmarks and probe results go to a throwaway test location
+            QStandardPaths.setTestModeEnabled(True)
+            self.app = QApplication.instance() or QApplication([sys.argv[0]])
+            self._main = main
+        return self._main
+
+    def open_window(self):
+        main = self.main_module()
+        window = main.MediaPlayer(keep_session=False)
+        window.finish_startup([])
+        window.show()
+        self.process_events()
+        return window
+
+    def close_window(self, window):
+        window.close()
+        window.deleteLater()
+        self.process_events()
+
+    def process_events(self):
+        self.app.processEvents()
+
+    def wait_until(self, predicate, timeout=WAIT_TIMEOUT):
+        deadline = time.perf_counter() + timeout
+        while not predicate():
+            if time.perf_counter() > deadline:
+                return False
+            self.app.processEvents()
+            time.sleep(0.0005)
+        return True
+
+
+def bench_playlist_add(suite):
+    results = {}
+    with_window = True
+    try:
+        suite.main_module()
+    except Skipped:
+        with_window = False
+    for size in suite.playlist_sizes:
+        paths = synthetic_paths(size, os.path.join(suite.root, "library"))
+        builds = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            PlaylistSearchIndex(paths)
+            builds.append(time.perf_counter() - start)
+        results[f"search_index_build_{size}_ms"] = _median_ms(builds)
+        if not with_window:
+            continue
+        window = suite.open_window()
+        try:
+            start = time.perf_counter()
+            window.extend_playlist(paths)
+            suite.process_events()
+            results[f"extend_playlist_{size}_ms"] = (time.perf_counter() - start) * 1000
+        finally:
+            suite.close_window(window)
+        if size == suite.playlist_sizes[0]:
+            # One call per file, as drag and drop and the open dialog add them
+            window = suite.open_window()
+            try:
+                start = time.perf_counter()
+                for path in paths:
+                    window.add_to_playlist(path)
+                suite.process_events()
+                results[f"add_to_playlist_{size}_ms"] = (time.perf_counter() - start) * 1000
+            finally:
+                suite.close_window(window)
+    return results
+
+
+def bench_folder_scan(suite):
+    tree = os.path.join(suite.root, "tree")
+    if not os.path.isdir(tree):
+        make_media_tree(tree, suite.tree_files)
+    start = time.perf_counter()
+    rates = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        found = sum(1 for _path in scan_media_files(tree))
+        elapsed = time.perf_counter() - start
+        rates.append(found / elapsed if elapsed > 0 else float("inf"))
+    results = {"scan_files_per_sec": statistics.median(rates)}
+    try:
+        window = suite.open_window()
+    except Skipped:
+        return results
+    try:
+        window.set_gapless_enabled(False)
+        start = time.perf_counter()
+        window.start_folder_scan(tree)
+        if suite.wait_until(lambda: window.folder_scanner is None, timeout=60.0):
+            results["window_folder_scan_ms"] = (time.perf_counter() - start) * 1000
+    finally:
+        suite.close_window(window)
+    return results
+
+
+def bench_playlist_search(suite):
+    size = suite.playlist_sizes[-1]
+    paths = synthetic_paths(size, os.path.join(suite.root, "library"))
+    index = PlaylistSearchIndex(paths)
+    results = {}
+    for query in QUERIES:
+        timings = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            index.search(query)
+            timings.append(time.perf_counter() - start)
+        results[f"search_{size}_{query.replace(' ', '_')}_ms"] = _median_ms(timings)
+    try:
+        window = suite.open_window()
+    except Skipped:
+        return results
+    try:
+        window.extend_playlist(paths)
+        suite.process_events()
+        timings = []
+        # Typing a query one key at a time, each filter applied as the debounce timer would
+        for query in QUERIES:
+            start = time.perf_counter()
+            window.playlist_proxy.set_filter(query)
+            suite.process_events()
+            timings.append(time.perf_counter() - start)
+        results[f"window_filter_{size}_median_ms"] = _median_ms(timings)
+        results[f"window_filter_{size}_max_ms"] = max(timings) * 1000
+    finally:
+        suite.close_window(window)
+    return results
+
+
+def bench_playlist_io(suite):
+    size = suite.playlist_sizes[0]
+    folder = os.path.join(suite.root, "playlists")
+    os.makedirs(folder, exist_ok=True)
+    paths = synthetic_paths(size, os.path.join(folder, "media"))
+    results = {}
+    for extension in (".m3u8", ".pls", ".xspf"):
+        path = os.path.join(folder, f"list{size}{extension}")
+        saves, loads = [], []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            write_playlist(path, paths)
+            saves.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            loaded = sum(1 for _entry in iter_playlist(path))
+            loads.append(time.perf_counter() - start)
+        results[f"save_{extension[1:]}_{size}_ms"] = _median_ms(saves)
+        results[f"load_{extension[1:]}_{size}_ms"] = _median_ms(loads)
+        if loaded != size:
+            raise RuntimeError(f"{path} read back {loaded} of {size} entries")
+    try:
+        window = suite.open_window()
+    except Skipped:
+        return results
+    try:
+        window.set_gapless_enabled(False)
+        start = time.perf_counter()
+        window.start_playlist_load(os.path.join(folder, f"list{size}.m3u8"))
+        if suite.wait_until(lambda: window.playlist_loader is None, timeout=60.0):
+            results[f"window_load_m3u8_{size}_ms"] = (time.perf_counter() - start) * 1000
+    finally:
+        suite.close_window(window)
+    return results
+
+
+def _switch_latencies(suite, window, paths, switches):
+    telemetry = window.telemetry
+    window.extend_playlist(paths)
+    window.play_file(paths[0], 0)
+    if not suite.wait_until(lambda: not telemetry.awaiting_frame):
+        raise Skipped("no first frame or position update, the multimedia backend is not playing")
+    latencies = []
+    for _ in range(switches):
+        start = time.perf_counter()
+        window.play_next()
+        if not suite.wait_until(lambda: not telemetry.awaiting_frame):
+            raise RuntimeError("play_next did not reach a first frame")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_switch(suite):
+    results = {}
+    switches = 4 if suite.quick else 12
+    # A single video repeats, so every next loads it from scratch
+    for label, paths in (("audio", suite.tones()), ("video", [suite.video()])):
+        window = suite.open_window()
+        try:
+            # The plain switch, gapless handoffs are measured by the player itself
+            window.set_gapless_enabled(False)
+            window.play_queue.set_repeat(REPEAT_ALL)
+            latencies = _switch_latencies(suite, window, paths, switches)
+        finally:
+            suite.close_window(window)
+        results[f"play_next_{label}_median_ms"] = _median_ms(latencies)
+        results[f"play_next_{label}_p95_ms"] = _p95_ms(latencies)
+    return results
+
+
+def bench_seek(suite):
+    window = suite.open_window()
+    try:
+        window.set_gapless_enabled(False)
+        video = suite.video()
+        window.extend_playlist([video])
+        window.play_file(video, 0)
+        telemetry = window.telemetry
+        if not suite.wait_until(lambda: not telemetry.awaiting_frame):
+            raise Skipped("no first video frame, the multimedia backend is not playing")
+        scheduler = window.seek_scheduler
+        if not suite.wait_until(lambda: window.media_player.duration() > 0):
+            raise Skipped("the video reports no duration")
+        duration = window.media_player.duration()
+        rng = random.Random(0)
+        latencies = []
+        timeouts = scheduler.counters["timeouts"]
+        for _ in range(10 if suite.quick else 40):
+            measured = len(scheduler.latencies)
+            scheduler.request(rng.randrange(0, max(1, duration - 1000)), exact=True)
+            suite.wait_until(lambda: scheduler.in_flight is None and scheduler.pending is None)
+            if len(scheduler.latencies) > measured:
+                latencies.append(scheduler.latencies[-1] / 1000.0)
+        if not latencies:
+            raise Skipped("no seek produced a frame")
+        results = {"seek_median_ms": _median_ms(latencies), "seek_p95_ms": _p95_ms(latencies),
+                   "seek_timeouts": scheduler.counters["timeouts"] - timeouts}
+    finally:
+        suite.close_window(window)
+    return results
+
+
+def _startup_stages(arguments):
+    """Stage name to milliseconds from a --profile-startup run"""
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", MEDIAPLAYER_INSTANCE=f"MediaPlayer-suite-{os.getpid()}")
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), "--profile-startup", *arguments],
+                             env=env, cwd=ROOT, capture_output=True, text=True, timeout=60)
+    wall = time.perf_counter() - start
+    stages = {}
+    for line in process.stdout.splitlines():
+        match = re.match(r"\s+(\S.*?)\s+(\d+\.\d)\s+\(", line)
+        if match:
+            stages[match.group(1)] = float(match.group(2))
+    if process.returncode != 0 or not stages:
+        raise Skipped(f"main.py --profile-startup failed: {process.stderr.strip().splitlines()[-1:]}")
+    return stages, wall
+
+
+def bench_startup(suite):
+    runs = 3 if suite.quick else 7
+    shown, ready, first_frame, walls = [], [], [], []
+    tone = suite.tones()[0]
+    for _ in range(runs):
+        stages, wall = _startup_stages([tone])
+        shown.append(stages["window shown"] / 1000.0)
+        ready.append(stages["multimedia ready"] / 1000.0)
+        if "first frame" in stages:
+            first_frame.append(stages["first frame"] / 1000.0)
+        walls.append(wall)
+    results = {"startup_window_shown_ms": _median_ms(shown), "startup_multimedia_ready_ms": _median_ms(ready),
+               "startup_process_ms": _median_ms(walls)}
+    if first_frame:
+        results["startup_first_frame_ms"] = _median_ms(first_frame)
+    return results
+
+
+BENCHMARKS = {
+    "playlist_add": bench_playlist_add,
+    "folder_scan": bench_folder_scan,
+    "playlist_search": bench_playlist_search,
+    "playlist_io": bench_playlist_io,
+    "switch": bench_switch,
+    "seek": bench_seek,
+    "startup": bench_startup,
+}
+
+
+def environment():
+    info = {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+    try:
+        from PyQt6.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+        info.update(pyqt=PYQT_VERSION_STR, qt=QT_VERSION_STR)
+    except ImportError:
+        pass
+    return info
+
+
+def run(names=None, quick=False):
+    metrics = {}
+    skipped = {}
+    with tempfile.TemporaryDirectory() as root:
+        suite = Suite(root, quick)
+        for name, function in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            start = time.perf_counter()
+            try:
+                results = function(suite)
+            except Skipped as e:
+                skipped[name] = str(e)
+                print(f"{name:>16}: skipped, {e}")
+                continue
+            for metric, value in results.items():
+                metrics[f"{name}.{metric}"] = value
+            print(f"{name:>16}: {len(results)} metrics in {time.perf_counter() - start:.1f}s")
+    return {"version": RESULTS_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "quick": quick,
+            "environment": environment(), "metrics": metrics, "skipped": skipped}
+
+
+def higher_is_better(metric):
+    return metric.endswith("_per_sec")
+
+
+def compare(results, baseline, tolerance):
+    """Rows of (metric, baseline, current, relative change, regressed) for metrics in both runs"""
+    rows = []
+    for metric, previous in sorted(baseline["metrics"].items()):
+        current = results["metrics"].get(metric)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        worse = -change if higher_is_better(metric) else change
+        rows.append((metric, previous, current, change, worse > tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller fixtures and fewer repetitions")
+    parser.add_argument("--only", help=f"comma separated subset of {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", default="benchmark-results.json", help="results file to write")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown counted as a regression (default 0.25)")
+    args = parser.parse_args()
+    names = set(args.only.split(",")) if args.only else None
+    if names and not names <= set(BENCHMARKS):
+        parser.error(f"unknown benchmark: {', '.join(sorted(names - set(BENCHMARKS)))}")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    results = run(names, args.quick)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Wrote {len(results['metrics'])} metrics to {args.output}")
+    if baseline is None:
+        for metric, value in sorted(results["metrics"].items()):
+            print(f"  {metric:<56}{value:12.2f}")
+        return 0
+    if baseline.get("quick") != results["quick"]:
+        print("warning: comparing a --quick run with a full one", file=sys.stderr)
+    regressions = 0
+    for metric, previous, current, change, regressed in compare(results, baseline, args.tolerance):
+        regressions += regressed
+        print(f"  {metric:<56}{previous:12.2f} -> {current:12.2f}  {change:+7.1%}{'  REGRESSION' if regressed else ''}")
+    print(f"{regressions} regression{'s' if regressions != 1 else ''} beyond {args.tolerance:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
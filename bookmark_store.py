@@ -0,0 +1,163 @@
+"""
+Persistent bookmarks keyed by media content rather than by path.
+
+A file's key hashes its size with its first and last 64 KiB, so bookmarks
+follow a file through renames and moves without hashing whole videos.
+Marks live in an SQLite table that only ever receives appends and point
+deletes. Each file's marks are served from a BookmarkIndex, a sorted list
+that answers next/previous lookups with a bisect. Chapter lists can be
+imported and exported as plain text. Has no Qt dependency.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+Bookmark = namedtuple("Bookmark", ["position", "label"])
+
+SAMPLE_SIZE = 64 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bookmarks (
+    content_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    PRIMARY KEY (content_key, position)
+);
+"""
+
+CHAPTER_TIME = re.compile(r"(?:(\d+):)?(\d{1,2}):(\d{1,2})(?:[.,](\d{1,3}))?")
+OGM_CHAPTER = re.compile(r"CHAPTER(\d+)(NAME)?=(.*)", re.IGNORECASE)
+
+
+def content_key(path):
+    """Identity of a file's content from its size, head and tail"""
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode('ascii'))
+    with open(path, 'rb') as f:
+        digest.update(f.read(SAMPLE_SIZE))
+        if size > 2 * SAMPLE_SIZE:
+            f.seek(-SAMPLE_SIZE, os.SEEK_END)
+            digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def format_position(position):
+    seconds, milliseconds = divmod(position, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+
+def parse_position(text):
+    match = CHAPTER_TIME.match(text.strip())
+    if match is None:
+        return None
+    hours, minutes, seconds, fraction = match.groups()
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int((fraction or "0").ljust(3, "0"))
+
+
+def read_chapters(path):
+    """Bookmarks from 'HH:MM:SS[.mmm] Title' lines or OGM CHAPTERnn=/CHAPTERnnNAME= pairs"""
+    marks = []
+    ogm = {}
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            match = OGM_CHAPTER.match(line)
+            if match is not None:
+                number, is_name, value = match.groups()
+                entry = ogm.setdefault(int(number), [None, None])
+                entry[1 if is_name else 0] = value.strip()
+                continue
+            match = CHAPTER_TIME.match(line)
+            if match is not None:
+                label = line[match.end():].strip(" -\t") or format_position(parse_position(line))
+                marks.append(Bookmark(parse_position(line), label))
+    for number in sorted(ogm):
+        time_text, name = ogm[number]
+        position = parse_position(time_text) if time_text else None
+        if position is not None:
+            marks.append(Bookmark(position, name or f"Chapter {number}"))
+    return marks
+
+
+def write_chapters(path, marks):
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for mark in marks:
+            f.write(f"{format_position(mark.position)} {mark.label}\n")
+    return len(marks)
+
+
+class BookmarkIndex:
+    """Sorted bookmarks of one file"""
+    def __init__(self, marks=()):
+        marks = sorted(marks)
+        self.positions = [mark.position for mark in marks]
+        self.labels = [mark.label for mark in marks]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        return map(Bookmark, self.positions, self.labels)
+
+    def add(self, position, label):
+        i = bisect_left(self.positions, position)
+        if i < len(self.positions) and self.positions[i] == position:
+            self.labels[i] = label
+            return
+        self.positions.insert(i, position)
+        self.labels.insert(i, label)
+
+    def remove(self, position):
+        i = bisect_left(self.positions, position)
+        if i < len(self.positions) and self.positions[i] == position:
+            del self.positions[i]
+            del self.labels[i]
+
+    def next_after(self, position):
+        i = bisect_right(self.positions, position)
+        return Bookmark(self.positions[i], self.labels[i]) if i < len(self.positions) else None
+
+    def previous_before(self, position):
+        i = bisect_left(self.positions, position) - 1
+        return Bookmark(self.positions[i], self.labels[i]) if i >= 0 else None
+
+
+class BookmarkStore:
+    """SQLite backed bookmarks for all files, one BookmarkIndex per content key"""
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def load(self, key):
+        rows = self.conn.execute(
+            "SELECT position, label FROM bookmarks WHERE content_key = ? ORDER BY position", (key,))
+        return BookmarkIndex(map(Bookmark._make, rows))
+
+    def add(self, key, position, label):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO bookmarks VALUES (?, ?, ?)", (key, position, label))
+
+    def add_many(self, key, marks):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO bookmarks VALUES (?, ?, ?)",
+                                  ((key, mark.position, mark.label) for mark in marks))
+
+    def remove(self, key, position):
+        with self.conn:
+            self.conn.execute("DELETE FROM bookmarks WHERE content_key = ? AND position = ?", (key, position))
+
+    def clear(self, key):
+        with self.conn:
+            self.conn.execute("DELETE FROM bookmarks WHERE content_key = ?", (key,))
@@ -0,0 +1,395 @@
+"""
+Per-file video frame timestamp index read straight from container tables.
+
+MP4/MOV files describe every sample in the video track's sample table:
+stts gives decode durations, ctts the presentation offsets, stss the sync
+samples and elst where presentation starts. Matroska/WebM files are walked
+cluster by cluster over a memory map, reading only the few header bytes of
+each block. Either way the media data itself is never read. Indexes are
+cached on disk by file identity. Has no Qt dependency.
+"""
+import hashlib
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from media_probe import _find_mp4_box, iter_mp4_boxes
+
+MP4_EXTENSIONS = frozenset(('.mp4', '.m4v', '.mov', '.3gp'))
+MKV_EXTENSIONS = frozenset(('.mkv', '.webm'))
+
+
+class FrameIndex:
+    """Sorted presentation timestamps (ms) of every video frame and of the keyframes"""
+    def __init__(self, times, keyframes):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.keyframes = np.asarray(keyframes, dtype=np.float64)
+        # Player positions are whole milliseconds, compare against floored timestamps
+        self._positions = np.floor(self.times).astype(np.int64)
+
+    def __len__(self):
+        return len(self.times)
+
+    def keyframe_positions(self):
+        return np.floor(self.keyframes).astype(np.int64).tolist()
+
+    def step(self, position, frames=1):
+        """Position of the frame frames steps away from the one shown at position, None past the ends"""
+        positions = self._positions
+        if frames > 0:
+            i = int(np.searchsorted(positions, position, side='right')) + frames - 1
+        else:
+            i = int(np.searchsorted(positions, position, side='left')) + frames
+        if 0 <= i < len(positions):
+            return int(positions[i])
+        return None
+
+
+# MP4
+
+def _table(mm, box, columns, dtype='>u4'):
+    """Fixed-size records of a full box that starts with a 32-bit entry count"""
+    start, end = box
+    count = struct.unpack_from('>I', mm, start + 4)[0]
+    count = min(count, (end - start - 8) // (4 * columns))
+    # A copy, a view would keep the map exported and stop it from closing
+    return np.frombuffer(mm, dtype=dtype, count=count * columns, offset=start + 8).reshape(count, columns).copy()
+
+
+def _expand_runs(runs, limit):
+    """Per-sample values of (count, value) runs, cut off after limit samples"""
+    counts = runs[:, 0].astype(np.int64)
+    # A damaged run count could ask for billions of samples
+    counts = np.minimum(counts, np.maximum(0, limit - (np.cumsum(counts) - counts)))
+    return np.repeat(runs[:, 1].astype(np.int64), counts)
+
+
+def _mp4_sample_limit(mm, stbl):
+    """Upper bound on the track's sample count, from stsz or stz2 and else the file size"""
+    limit = len(mm)
+    for box_type in (b'stsz', b'stz2'):
+        box = _find_mp4_box(mm, *stbl, box_type)
+        if box is not None:
+            limit = min(limit, struct.unpack_from('>I', mm, box[0] + 8)[0])
+    return limit
+
+
+def _mp4_movie_timescale(mm, moov):
+    mvhd = _find_mp4_box(mm, *moov, b'mvhd')
+    if mvhd is None:
+        return None
+    return struct.unpack_from('>I', mm, mvhd[0] + (20 if mm[mvhd[0]] == 1 else 12))[0] or None
+
+
+def _mp4_edit_shift(mm, edts, timescale, movie_timescale):
+    """Media time that plays at presentation time zero, from the first edit list entries"""
+    elst = _find_mp4_box(mm, *edts, b'elst') if edts is not None else None
+    if elst is None:
+        return 0
+    version = mm[elst[0]]
+    count = struct.unpack_from('>I', mm, elst[0] + 4)[0]
+    pos = elst[0] + 8
+    delay = 0
+    for _ in range(min(count, 2)):
+        if version == 1:
+            duration, media_time = struct.unpack_from('>Qq', mm, pos)
+            pos += 20
+        else:
+            duration, media_time = struct.unpack_from('>Ii', mm, pos)
+            pos += 12
+        if media_time == -1:
+            # An empty edit delays the start, its duration is in movie units
+            if movie_timescale:
+                delay += duration * timescale // movie_timescale
+            continue
+        return media_time - delay
+    return -delay
+
+
+def mp4_frame_index(mm):
+    moov = _find_mp4_box(mm, 0, len(mm), b'moov')
+    if moov is None:
+        return None
+    movie_timescale = _mp4_movie_timescale(mm, moov)
+    for box_type, payload, box_end in iter_mp4_boxes(mm, *moov):
+        if box_type != b'trak':
+            continue
+        mdia = _find_mp4_box(mm, payload, box_end, b'mdia')
+        if mdia is None:
+            continue
+        hdlr = _find_mp4_box(mm, *mdia, b'hdlr')
+        if hdlr is None or bytes(mm[hdlr[0] + 8:hdlr[0] + 12]) != b'vide':
+            continue
+        mdhd = _find_mp4_box(mm, *mdia, b'mdhd')
+        minf = _find_mp4_box(mm, *mdia, b'minf')
+        stbl = _find_mp4_box(mm, *minf, b'stbl') if minf is not None else None
+        stts = _find_mp4_box(mm, *stbl, b'stts') if stbl is not None else None
+        if mdhd is None or stts is None:
+            return None
+        timescale = struct.unpack_from('>I', mm, mdhd[0] + (20 if mm[mdhd[0]] == 1 else 12))[0]
+        if not timescale:
+            return None
+        limit = _mp4_sample_limit(mm, stbl)
+        durations = _expand_runs(_table(mm, stts, 2), limit)
+        decode = np.zeros(len(durations), dtype=np.int64)
+        np.cumsum(durations[:-1], out=decode[1:])
+        ctts = _find_mp4_box(mm, *stbl, b'ctts')
+        if ctts is not None:
+            # Version 0 offsets are nominally unsigned but negative ones are written in practice
+            offsets = _expand_runs(_table(mm, ctts, 2, '>i4'), limit)
+            count = min(len(offsets), len(decode))
+            decode[:count] += offsets[:count]
+        edts = _find_mp4_box(mm, payload, box_end, b'edts')
+        decode -= _mp4_edit_shift(mm, edts, timescale, movie_timescale)
+        times = decode * (1000.0 / timescale)
+        stss = _find_mp4_box(mm, *stbl, b'stss')
+        if stss is not None:
+            samples = _table(mm, stss, 1)[:, 0].astype(np.int64) - 1
+            keyframes = times[samples[(samples >= 0) & (samples < len(times))]]
+        else:
+            keyframes = times
+        return FrameIndex(np.sort(times), np.sort(keyframes))
+    return None
+
+
+# Matroska
+
+EBML_SEGMENT = 0x18538067
+EBML_CLUSTER = 0x1F43B675
+EBML_INFO = 0x1549A966
+EBML_TRACKS = 0x1654AE6B
+EBML_TIMESTAMP_SCALE = 0x2AD7B1
+EBML_TRACK_ENTRY = 0xAE
+EBML_TRACK_NUMBER = 0xD7
+EBML_TRACK_TYPE = 0x83
+EBML_CLUSTER_TIMESTAMP = 0xE7
+EBML_SIMPLE_BLOCK = 0xA3
+EBML_BLOCK_GROUP = 0xA0
+EBML_BLOCK = 0xA1
+EBML_REFERENCE_BLOCK = 0xFB
+# Top level children of Segment: SeekHead, Info, Tracks, Cues, Chapters, Tags, Attachments, Cluster
+LEVEL1_IDS = frozenset((0x114D9B74, EBML_INFO, EBML_TRACKS, 0x1C53BB6B, 0x1043A770, 0x1254C367,
+                        0x1941A469, EBML_CLUSTER))
+
+
+def _ebml_id(mm, pos):
+    first = mm[pos]
+    length = 1
+    mask = 0x80
+    while length <= 4 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 4:
+        raise ValueError("invalid EBML id")
+    return int.from_bytes(mm[pos:pos + length], 'big'), pos + length
+
+
+def _ebml_size(mm, pos):
+    """Element data size and data start, None for an unknown size"""
+    first = mm[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("invalid EBML size")
+    value = first & (mask - 1)
+    for i in range(1, length):
+        value = (value << 8) | mm[pos + i]
+    if value == (1 << (7 * length)) - 1:
+        return None, pos + length
+    return value, pos + length
+
+
+def _ebml_children(mm, start, end):
+    """Yield (id, data_start, data_end), unknown sizes extend to the parent end"""
+    pos = start
+    while pos < end:
+        element_id, pos = _ebml_id(mm, pos)
+        size, pos = _ebml_size(mm, pos)
+        data_end = end if size is None else min(pos + size, end)
+        yield element_id, pos, data_end
+        pos = data_end
+
+
+def _ebml_uint(mm, start, end):
+    return int.from_bytes(mm[start:end], 'big')
+
+
+def _mkv_video_track(mm, start, end):
+    for element_id, data, data_end in _ebml_children(mm, start, end):
+        if element_id != EBML_TRACK_ENTRY:
+            continue
+        number = track_type = None
+        for child, child_data, child_end in _ebml_children(mm, data, data_end):
+            if child == EBML_TRACK_NUMBER:
+                number = _ebml_uint(mm, child_data, child_end)
+            elif child == EBML_TRACK_TYPE:
+                track_type = _ebml_uint(mm, child_data, child_end)
+        if track_type == 1 and number is not None:
+            return number
+    return None
+
+
+def _mkv_cluster_blocks(mm, start, end, track, times, keyframes):
+    """Append the block timestamps of one cluster, returns where the cluster ended"""
+    cluster_time = 0
+    pos = start
+    while pos < end:
+        element = mm[pos]
+        # SimpleBlocks dominate, decode their one byte id and common size forms inline
+        if element == EBML_SIMPLE_BLOCK or element == EBML_BLOCK_GROUP:
+            size_byte = mm[pos + 1]
+            if size_byte & 0x80:
+                size = size_byte & 0x7F
+                data = pos + 2
+            else:
+                size, data = _ebml_size(mm, pos + 1)
+                if size is None:
+                    return end
+            pos = data + size
+            is_key = True
+            if element == EBML_BLOCK_GROUP:
+                block = None
+                for child, child_data, _child_end in _ebml_children(mm, data, pos):
+                    if child == EBML_BLOCK:
+                        block = child_data
+                    elif child == EBML_REFERENCE_BLOCK:
+                        is_key = False
+                if block is None:
+                    continue
+                data = block
+            number = mm[data]
+            if number & 0x80:
+                number &= 0x7F
+                data += 1
+            else:
+                number, data = _ebml_size(mm, data)
+            if number != track:
+                continue
+            relative = (mm[data] << 8) | mm[data + 1]
+            if relative & 0x8000:
+                relative -= 0x10000
+            time = cluster_time + relative
+            times.append(time)
+            if element == EBML_SIMPLE_BLOCK:
+                is_key = mm[data + 2] & 0x80
+            if is_key:
+                keyframes.append(time)
+            continue
+        element_id, data = _ebml_id(mm, pos)
+        if element_id in LEVEL1_IDS:
+            # An unknown-size cluster ends where the next top level element starts
+            return pos
+        size, data = _ebml_size(mm, data)
+        if size is None:
+            return end
+        if element_id == EBML_CLUSTER_TIMESTAMP:
+            cluster_time = _ebml_uint(mm, data, data + size)
+        pos = data + size
+    return end
+
+
+def mkv_frame_index(mm):
+    element_id, pos = _ebml_id(mm, 0)
+    if element_id != 0x1A45DFA3:
+        return None
+    size, pos = _ebml_size(mm, pos)
+    pos += size or 0
+    segment = None
+    while pos < len(mm):
+        element_id, data = _ebml_id(mm, pos)
+        size, data = _ebml_size(mm, data)
+        if element_id == EBML_SEGMENT:
+            segment = (data, len(mm) if size is None else min(data + size, len(mm)))
+            break
+        if size is None:
+            return None
+        pos = data + size
+    if segment is None:
+        return None
+    scale = 1000000
+    track = None
+    times = []
+    keyframes = []
+    pos, end = segment
+    while pos < end:
+        element_id, data = _ebml_id(mm, pos)
+        size, data = _ebml_size(mm, data)
+        data_end = end if size is None else min(data + size, end)
+        if element_id == EBML_INFO:
+            for child, child_data, child_end in _ebml_children(mm, data, data_end):
+                if child == EBML_TIMESTAMP_SCALE:
+                    scale = _ebml_uint(mm, child_data, child_end) or scale
+        elif element_id == EBML_TRACKS:
+            track = _mkv_video_track(mm, data, data_end)
+        elif element_id == EBML_CLUSTER:
+            if track is None:
+                return None
+            data_end = _mkv_cluster_blocks(mm, data, data_end, track, times, keyframes)
+        elif size is None:
+            break
+        pos = data_end
+    if not times:
+        return None
+    factor = scale / 1e6
+    return FrameIndex(np.sort(np.array(times, dtype=np.float64) * factor),
+                      np.sort(np.array(keyframes, dtype=np.float64) * factor))
+
+
+# Files and caching
+
+def build_frame_index(path):
+    """FrameIndex for a media file, None when the container is not supported or has no video"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in MP4_EXTENSIONS:
+        parser = mp4_frame_index
+    elif ext in MKV_EXTENSIONS:
+        parser = mkv_frame_index
+    else:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return parser(mm)
+    except (OSError, ValueError, IndexError, struct.error, BufferError, MemoryError):
+        return None
+
+
+class FrameIndexCache:
+    """Frame indexes stored as .npz files keyed by path, size and modification time"""
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        identity = f"{os.path.normcase(os.path.realpath(path))}\0{st.st_size}\0{st.st_mtime_ns}"
+        key = hashlib.sha1(identity.encode('utf-8', 'surrogatepass')).hexdigest()
+        return os.path.join(self.directory, key + '.npz')
+
+    def load(self, path):
+        """Cached index, else a freshly built one that is then cached"""
+        cache_path = self._path(path)
+        if cache_path is None:
+            return None
+        try:
+            with np.load(cache_path) as data:
+                return FrameIndex(data['times'], data['keyframes'])
+        except (OSError, KeyError, ValueError):
+            pass
+        index = build_frame_index(path)
+        if index is not None:
+            try:
+                with open(cache_path + '.tmp', 'wb') as f:
+                    np.savez(f, times=index.times, keyframes=index.keyframes)
+                os.replace(cache_path + '.tmp', cache_path)
+            except OSError:
+                pass
+        return index
@@ -1,15 +1,53 @@
 import sys
 import os
+import time
+# Start of the import stage for --profile-startup
+MODULE_STARTED = time.perf_counter()
+from single_instance import InstanceServer, forward_launch, launch_request
+if __name__ == "__main__" and forward_launch(sys.argv):
+    # A running player took the files, skip loading widgets and multimedia
+    sys.exit(0)
+import argparse
+import math
+import queue
+import sqlite3
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QSlider, QLabel, QFileDialog,
-                             QListWidget, QMenuBar, QStatusBar, QToolBar, QSplitter,
-                             QMessageBox, QListWidgetItem, QDialog, QComboBox,
+                             QMenuBar, QStatusBar, QToolBar, QSplitter,
+                             QMessageBox, QDialog, QComboBox,
                              QGroupBox, QGridLayout, QCheckBox, QSizePolicy, QStackedWidget,
-                             QLineEdit)
-from PyQt6.QtCore import Qt, QTimer, QUrl, QSize, pyqtSignal
-from PyQt6.QtGui import QAction, QKeySequence, QFont, QIcon, QPalette, QColor, QPainter, QLinearGradient
-from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
+                             QLineEdit, QListView, QAbstractItemView, QStyle)
+from PyQt6.QtCore import (Qt, QTimer, QUrl, QSize, pyqtSignal, QAbstractListModel, QModelIndex,
+                          QAbstractProxyModel, QThread, QStandardPaths, QObject, QBuffer, QByteArray, QPoint,
+                          QEventLoop)
+from PyQt6.QtGui import (QAction, QActionGroup, QKeySequence, QFont, QIcon, QPalette, QColor, QPainter,
+                         QLinearGradient, QImage, QPixmap)
+from PyQt6.QtMultimedia import (QMediaPlayer, QAudioOutput, QAudio, QAudioDecoder, QAudioFormat,
+                                QAudioSink, QMediaDevices, QVideoFrame, QVideoSink)
 from PyQt6.QtMultimediaWidgets import QVideoWidget
+from PyQt6.QtNetwork import QHostAddress, QTcpServer
+
+from bookmark_store import BookmarkIndex, BookmarkStore, content_key, read_chapters, write_chapters
+from equalizer import EQ_FREQUENCIES, Equalizer
+from frame_index import FrameIndexCache
+from loudness import GAIN_ALBUM, GAIN_MODES, GAIN_OFF, GAIN_TRACK, LoudnessCache, LoudnessMeter, album_gain, track_gain
+from media_dedup import DuplicateIndex, content_fingerprint, file_keys
+from media_library import MediaLibrary
+from media_probe import ProbeCache, probe_paths
+from media_scan import media_file_filter, scan_media_files
+from play_queue import REPEAT_ALL, REPEAT_MODES, REPEAT_OFF, REPEAT_ONE, PlayQueue
+from playlist_io import iter_playlist, playlist_file_filter, write_playlist
+from playlist_search import PlaylistSearchIndex
+from session_store import SessionStore, read_playlist
+from subtitles import load_subtitles
+from telemetry import FrameClock, Telemetry
+from thumbnail_cache import SheetLayout, ThumbnailCache, sheet_key
+
+IMPORTS_DONE = time.perf_counter()
 
 class ModernButton(QPushButton):
     """Custom styled button with better appearance"""
@@ -18,10 +56,2141 @@ class ModernButton(QPushButton):
         self.setCursor(Qt.CursorShape.PointingHandCursor)
         self.setMinimumHeight(40)
 
+class LazyComboBox(QComboBox):
+    """Combo box that announces its popup so items can be filled on demand"""
+    popup_about_to_show = pyqtSignal()
+
+    def showPopup(self):
+        self.popup_about_to_show.emit()
+        super().showPopup()
+
+def format_time(seconds):
+    hours = seconds // 3600
+    minutes = (seconds % 3600) // 60
+    secs = seconds % 60
+    if hours > 0:
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+class PlaylistModel(QAbstractListModel):
+    """Playlist model backed by a plain list of paths, display text is computed on demand"""
+    # Beyond this many separate row ranges a single model reset is cheaper
+    MAX_REMOVE_RUNS = 256
+
+    def __init__(self, paths=None, parent=None):
+        super().__init__(parent)
+        self.paths = paths if paths is not None else []
+        self._members = set(self.paths)
+        self.metadata = {}
+        self.favorites = set()
+        # Path to row, built on demand and dropped whenever rows move
+        self._row_of = None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.paths)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if row >= len(self.paths):
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            file_path = self.paths[row]
+            info = self.metadata.get(file_path)
+            if info is not None and info.title:
+                text = f"{info.artist} - {info.title}" if info.artist else info.title
+            else:
+                text = os.path.basename(file_path)
+            if info is not None and info.duration:
+                text += f"  [{format_time(int(info.duration))}]"
+            if file_path in self.favorites:
+                text = "⭐ " + text
+            return text
+        if role in (Qt.ItemDataRole.UserRole, Qt.ItemDataRole.ToolTipRole):
+            return self.paths[row]
+        return None
+
+    def update_metadata(self, infos):
+        """Merge probed MediaInfo by path and repaint the rows showing those paths"""
+        self.metadata.update(infos)
+        if self._row_of is None:
+            self._row_of = {path: row for row, path in enumerate(self.paths)}
+        rows = sorted(self._row_of[path] for path in infos if path in self._row_of)
+        # Probes arrive in playlist order, so a batch is usually one run of rows
+        start = 0
+        for i in range(1, len(rows) + 1):
+            if i == len(rows) or rows[i] != rows[i - 1] + 1:
+                self.dataChanged.emit(self.index(rows[start]), self.index(rows[i - 1]),
+                                      [Qt.ItemDataRole.DisplayRole])
+                start = i
+
+    def refresh_row(self, row):
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+
+    def contains(self, file_path):
+        return file_path in self._members
+
+    def path_at(self, row):
+        if 0 <= row < len(self.paths):
+            return self.paths[row]
+        return None
+
+    def append_paths(self, file_paths):
+        """Append new paths with a single insert notification, returns count added"""
+        new_paths = []
+        members = self._members
+        for file_path in file_paths:
+            if file_path not in members:
+                members.add(file_path)
+                new_paths.append(file_path)
+        if not new_paths:
+            return 0
+        first = len(self.paths)
+        self.beginInsertRows(QModelIndex(), first, first + len(new_paths) - 1)
+        self.paths.extend(new_paths)
+        if self._row_of is not None:
+            self._row_of.update(zip(new_paths, range(first, len(self.paths))))
+        self.endInsertRows()
+        return len(new_paths)
+
+    def remove_row(self, row):
+        if not 0 <= row < len(self.paths):
+            return None
+        self.beginRemoveRows(QModelIndex(), row, row)
+        file_path = self.paths.pop(row)
+        self._members.discard(file_path)
+        self._row_of = None
+        self.endRemoveRows()
+        return file_path
+
+    def remove_paths(self, file_paths):
+        """Drop every listed path, returns count removed"""
+        doomed = self._members.intersection(file_paths)
+        if not doomed:
+            return 0
+        self._row_of = None
+        rows = [row for row, path in enumerate(self.paths) if path in doomed]
+        runs = []
+        for row in rows:
+            if runs and runs[-1][1] == row - 1:
+                runs[-1][1] = row
+            else:
+                runs.append([row, row])
+        if len(runs) > self.MAX_REMOVE_RUNS:
+            self.beginResetModel()
+            self.paths[:] = [path for path in self.paths if path not in doomed]
+            self._members.difference_update(doomed)
+            self.endResetModel()
+            return len(doomed)
+        # Remove bottom-up so earlier row numbers stay valid
+        for first, last in reversed(runs):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.paths[first:last + 1]
+            self.endRemoveRows()
+        self._members.difference_update(doomed)
+        return len(doomed)
+
+    def clear(self):
+        self.beginResetModel()
+        self.paths.clear()
+        self._members.clear()
+        self._row_of = None
+        self.endResetModel()
+
+class PlaylistFilterProxy(QAbstractProxyModel):
+    """Shows the playlist rows matching the search box, backed by an incremental search index"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.search_index = PlaylistSearchIndex()
+        self._rows = None
+        self._query = ""
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        self.search_index.rebuild(model.paths)
+        model.rowsAboutToBeInserted.connect(self._source_rows_about_to_be_inserted)
+        model.rowsInserted.connect(self._source_rows_inserted)
+        model.rowsAboutToBeRemoved.connect(self._source_rows_about_to_be_removed)
+        model.rowsRemoved.connect(self._source_rows_removed)
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self._source_reset)
+        model.dataChanged.connect(self._source_data_changed)
+
+    def is_filtered(self):
+        return self._rows is not None
+
+    def set_filter(self, query):
+        rows = self.search_index.search(query)
+        self.beginResetModel()
+        self._query = query
+        self._rows = rows
+        self.endResetModel()
+        return len(self.sourceModel().paths) if rows is None else len(rows)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self._rows is None:
+            return len(self.sourceModel().paths)
+        return len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1
+
+    def index(self, row, column=0, parent=QModelIndex()):
+        if parent.isValid() or column != 0 or not 0 <= row < self.rowCount():
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        row = proxy_index.row()
+        if self._rows is not None:
+            if row >= len(self._rows):
+                return QModelIndex()
+            row = self._rows[row]
+        return self.sourceModel().index(row, 0)
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = source_index.row()
+        if self._rows is not None:
+            position = bisect_left(self._rows, row)
+            if position >= len(self._rows) or self._rows[position] != row:
+                return QModelIndex()
+            row = position
+        return self.createIndex(row, 0)
+
+    def _source_rows_about_to_be_inserted(self, parent, first, last):
+        if self._rows is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    def _source_rows_inserted(self, parent, first, last):
+        paths = self.sourceModel().paths
+        self.search_index.add(paths[first:last + 1])
+        if self._rows is None:
+            self.endInsertRows()
+            return
+        matches = self.search_index.search_rows(self._query, first, last)
+        if matches:
+            # The source only ever appends, so new matches go at the end
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(matches) - 1)
+            self._rows.extend(matches)
+            self.endInsertRows()
+
+    def _source_rows_about_to_be_removed(self, parent, first, last):
+        if self._rows is None:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            return
+        start = bisect_left(self._rows, first)
+        end = bisect_left(self._rows, last + 1)
+        if start < end:
+            self.beginRemoveRows(QModelIndex(), start, end - 1)
+            del self._rows[start:end]
+            self.endRemoveRows()
+
+    def _source_rows_removed(self, parent, first, last):
+        self.search_index.remove_rows(first, last)
+        if self._rows is None:
+            self.endRemoveRows()
+            return
+        count = last - first + 1
+        start = bisect_left(self._rows, first)
+        rows = self._rows
+        for position in range(start, len(rows)):
+            rows[position] -= count
+
+    def _source_data_changed(self, top_left, bottom_right, roles):
+        first, last = top_left.row(), bottom_right.row()
+        if self._rows is not None:
+            # The visible rows inside the source range, as one proxy range
+            start = bisect_left(self._rows, first)
+            end = bisect_left(self._rows, last + 1)
+            if start >= end:
+                return
+            first, last = start, end - 1
+        self.dataChanged.emit(self.index(first), self.index(last), roles)
+
+    def _source_reset(self):
+        self.search_index.rebuild(self.sourceModel().paths)
+        if self._rows is not None:
+            self._rows = self.search_index.search(self._query)
+        self.endResetModel()
+
+class FolderScanner(QThread):
+    """Walks a folder on a worker thread and streams media paths back in batches"""
+    files_found = pyqtSignal(list)
+    progress = pyqtSignal(int, int)
+    scan_finished = pyqtSignal(int, bool)
+
+    BATCH_SIZE = 500
+    BATCH_INTERVAL = 0.1
+
+    def __init__(self, folder_path, parent=None):
+        super().__init__(parent)
+        self.folder_path = folder_path
+        self._cancelled = False
+        self._dirs_scanned = 0
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def _count_directory(self, _path):
+        self._dirs_scanned += 1
+
+    def run(self):
+        batch = []
+        total = 0
+        last_flush = time.monotonic()
+        for file_path in scan_media_files(self.folder_path, self._count_directory, self.is_cancelled):
+            batch.append(file_path)
+            now = time.monotonic()
+            # Flush the very first hit straight away so playback can start
+            if total == 0 or len(batch) >= self.BATCH_SIZE or now - last_flush >= self.BATCH_INTERVAL:
+                total += len(batch)
+                self.files_found.emit(batch)
+                self.progress.emit(self._dirs_scanned, total)
+                batch = []
+                last_flush = now
+            if self._cancelled:
+                break
+        if batch and not self._cancelled:
+            total += len(batch)
+            self.files_found.emit(batch)
+        self.progress.emit(self._dirs_scanned, total)
+        self.scan_finished.emit(total, self._cancelled)
+
+class LibraryScanner(QThread):
+    """Loads the library index and brings it up to date on a worker thread"""
+    files_loaded = pyqtSignal(list)
+    library_delta = pyqtSignal(list, list)
+    scan_finished = pyqtSignal(int, int, bool)
+
+    LOAD_BATCH = 5000
+
+    def __init__(self, db_path, new_root=None, load_existing=True, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.new_root = new_root
+        self.load_existing = load_existing
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def _emit_delta(self, delta):
+        if delta.added or delta.removed:
+            self.library_delta.emit(delta.added, delta.removed)
+
+    def run(self):
+        # SQLite connections are bound to the thread that opened them
+        library = MediaLibrary(self.db_path)
+        try:
+            if self.new_root:
+                library.add_root(self.new_root)
+            if self.load_existing:
+                paths = library.files()
+                for start in range(0, len(paths), self.LOAD_BATCH):
+                    self.files_loaded.emit(paths[start:start + self.LOAD_BATCH])
+            added = removed = 0
+            for root in library.roots():
+                if self._cancelled:
+                    break
+                delta = library.rescan(root, self.is_cancelled, self._emit_delta)
+                added += len(delta.added)
+                removed += len(delta.removed)
+            self.scan_finished.emit(added, removed, self._cancelled)
+        finally:
+            library.close()
+
+class PlaylistLoader(QThread):
+    """Parses a playlist file on a worker thread and feeds paths back in chunks"""
+    entries_loaded = pyqtSignal(list)
+    load_finished = pyqtSignal(int, str)
+
+    CHUNK_SIZE = 2000
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        chunk = []
+        total = 0
+        try:
+            for entry in iter_playlist(self.file_path):
+                chunk.append(entry.path)
+                if len(chunk) >= self.CHUNK_SIZE:
+                    total += len(chunk)
+                    self.entries_loaded.emit(chunk)
+                    chunk = []
+                    if self._cancelled:
+                        break
+            if chunk:
+                total += len(chunk)
+                self.entries_loaded.emit(chunk)
+            self.load_finished.emit(total, "")
+        except (OSError, ValueError, SyntaxError) as e:
+            # ElementTree parse errors derive from SyntaxError
+            self.load_finished.emit(total, str(e))
+
+class SessionLoader(QThread):
+    """Reads the saved session playlist on a worker thread and feeds it back in chunks"""
+    entries_loaded = pyqtSignal(list)
+    load_finished = pyqtSignal(list, str)
+
+    CHUNK_SIZE = PlaylistLoader.CHUNK_SIZE
+
+    def __init__(self, playlist_path, ops, parent=None):
+        super().__init__(parent)
+        self.playlist_path = playlist_path
+        self.ops = ops
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        try:
+            file_paths = read_playlist(self.playlist_path, self.ops)
+        except (OSError, ValueError) as e:
+            self.load_finished.emit([], str(e))
+            return
+        for start in range(0, len(file_paths), self.CHUNK_SIZE):
+            if self._cancelled:
+                return
+            self.entries_loaded.emit(file_paths[start:start + self.CHUNK_SIZE])
+        self.load_finished.emit(file_paths, "")
+
+class PlaylistSaver(QThread):
+    """Streams a snapshot of the playlist to disk on a worker thread"""
+    save_finished = pyqtSignal(int, str)
+
+    def __init__(self, file_path, paths, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.paths = paths
+
+    def run(self):
+        try:
+            count = write_playlist(self.file_path, self.paths)
+            self.save_finished.emit(count, "")
+        except (OSError, ValueError) as e:
+            self.save_finished.emit(0, str(e))
+
+class SubtitleLoader(QThread):
+    """Parses a subtitle file and builds its cue index on a worker thread"""
+    subtitles_loaded = pyqtSignal(object, str)
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+
+    def run(self):
+        try:
+            self.subtitles_loaded.emit(load_subtitles(self.file_path), "")
+        except (OSError, ValueError) as e:
+            self.subtitles_loaded.emit(None, str(e))
+
+class MetadataProber(QThread):
+    """Probes queued files in a thread pool and reports MediaInfo in batches"""
+    metadata_ready = pyqtSignal(dict)
+
+    BATCH_SIZE = 200
+    BATCH_INTERVAL = 0.25
+
+    def __init__(self, cache_path, parent=None):
+        super().__init__(parent)
+        self.cache_path = cache_path
+        self._queue = queue.Queue()
+        self._stopped = False
+
+    def enqueue(self, file_paths):
+        if file_paths:
+            self._queue.put(list(file_paths))
+
+    def stop(self):
+        self._stopped = True
+        self._queue.put(None)
+
+    def _next_batch(self):
+        batch = self._queue.get()
+        if batch is None:
+            return None
+        # Merge whatever else is already queued so the pool sees one long run
+        while True:
+            try:
+                more = self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+            if more is None:
+                self._stopped = True
+                return batch
+            batch.extend(more)
+
+    def run(self):
+        cache = ProbeCache(self.cache_path)
+        executor = ThreadPoolExecutor(max_workers=min(16, (os.cpu_count() or 1) * 2))
+        try:
+            while not self._stopped:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                results = {}
+                last_emit = time.monotonic()
+                probes = probe_paths(batch, cache, executor=executor)
+                try:
+                    for file_path, info in probes:
+                        if info is not None:
+                            results[file_path] = info
+                        now = time.monotonic()
+                        if len(results) >= self.BATCH_SIZE or now - last_emit >= self.BATCH_INTERVAL:
+                            if results:
+                                self.metadata_ready.emit(results)
+                            results = {}
+                            last_emit = now
+                        if self._stopped:
+                            break
+                finally:
+                    # Cancels the queued probes of the batch before the pool is waited on
+                    probes.close()
+                if results:
+                    self.metadata_ready.emit(results)
+        finally:
+            executor.shutdown(wait=True)
+            cache.close()
+
+class DuplicateDetector(QThread):
+    """Indexes playlist files on a worker thread and reports entries that repeat a listed file"""
+    duplicates_found = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._queue = queue.Queue()
+        self._stopped = False
+
+    def add(self, file_paths):
+        if file_paths:
+            self._queue.put(("add", list(file_paths)))
+
+    def forget(self, file_paths):
+        if file_paths:
+            self._queue.put(("remove", list(file_paths)))
+
+    def retain(self, file_paths):
+        self._queue.put(("retain", list(file_paths)))
+
+    def set_fingerprints(self, enabled):
+        # Queued with the edits so it applies between batches, never halfway through one
+        self._queue.put(("fingerprints", enabled))
+
+    def stop(self):
+        self._stopped = True
+        self._queue.put(None)
+
+    def _fingerprint(self, index, executor, file_paths):
+        duplicates = []
+        fingerprints = executor.map(content_fingerprint, file_paths)
+        try:
+            for file_path, fingerprint in zip(file_paths, fingerprints):
+                original = index.add_fingerprint(file_path, fingerprint)
+                if original is not None:
+                    duplicates.append((file_path, original))
+                if self._stopped:
+                    break
+        finally:
+            # Cancels the reads that have not started, cancel_futures needs Python 3.9
+            fingerprints.close()
+        return duplicates
+
+    def run(self):
+        index = DuplicateIndex()
+        fingerprints = False
+        # stat, realpath and the sampled reads all wait on the disk, so threads overlap them
+        executor = ThreadPoolExecutor(max_workers=min(16, (os.cpu_count() or 1) * 2))
+        try:
+            while not self._stopped:
+                message = self._queue.get()
+                if message is None:
+                    break
+                kind, argument = message
+                duplicates = []
+                if kind == "add":
+                    all_keys = executor.map(file_keys, argument, chunksize=64)
+                    try:
+                        for file_path, keys in zip(argument, all_keys):
+                            original = index.add(file_path, keys)
+                            if original is not None:
+                                duplicates.append((file_path, original))
+                            if self._stopped:
+                                break
+                    finally:
+                        all_keys.close()
+                    if fingerprints:
+                        duplicates += self._fingerprint(index, executor, index.fingerprint_candidates(argument))
+                elif kind == "remove":
+                    for file_path in argument:
+                        index.remove(file_path)
+                elif kind == "retain":
+                    index.retain(argument)
+                elif kind == "fingerprints":
+                    fingerprints = argument
+                    if fingerprints:
+                        duplicates = self._fingerprint(index, executor, index.fingerprint_candidates())
+                if duplicates:
+                    self.duplicates_found.emit(duplicates)
+        finally:
+            executor.shutdown(wait=True)
+
+class LoudnessAnalyzer(QThread):
+    """Decodes queued files with QAudioDecoder and measures their loudness, one of a pool sharing a queue"""
+    analyzed = pyqtSignal(str, object)
+
+    SAMPLE_RATE = 48000
+
+    def __init__(self, jobs, cache_path, parent=None):
+        super().__init__(parent)
+        self.jobs = jobs
+        self.cache_path = cache_path
+        self._stopped = False
+        self._decoder = None
+        self._meter = None
+        self._failed = False
+        self._loop = None
+        self._done = False
+
+    def stop(self):
+        self._stopped = True
+        # Quits the decode loop of the file being measured
+        self.quit()
+
+    def run(self):
+        # The pool shares one database, a locked or damaged one only costs the caching
+        try:
+            cache = LoudnessCache(self.cache_path)
+        except sqlite3.Error:
+            cache = None
+        try:
+            while not self._stopped:
+                _priority, _order, file_path = self.jobs.get()
+                if file_path is None:
+                    break
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    self.analyzed.emit(file_path, None)
+                    continue
+                result = None
+                if cache is not None:
+                    try:
+                        result = cache.get(file_path, stat.st_size, stat.st_mtime_ns)
+                    except sqlite3.Error:
+                        pass
+                if result is None:
+                    result = self.measure(file_path)
+                    if result is not None and cache is not None:
+                        try:
+                            cache.put(file_path, stat.st_size, stat.st_mtime_ns, result)
+                        except sqlite3.Error:
+                            pass
+                if not self._stopped:
+                    self.analyzed.emit(file_path, result)
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def measure(self, file_path):
+        audio_format = QAudioFormat()
+        audio_format.setSampleFormat(QAudioFormat.SampleFormat.Float)
+        audio_format.setSampleRate(self.SAMPLE_RATE)
+        audio_format.setChannelCount(2)
+        decoder = QAudioDecoder()
+        decoder.setAudioFormat(audio_format)
+        decoder.setSource(QUrl.fromLocalFile(file_path))
+        # This QThread object lives in the GUI thread, direct connections keep the decoding here
+        direct = Qt.ConnectionType.DirectConnection
+        decoder.bufferReady.connect(self._pull, type=direct)
+        decoder.finished.connect(self._finish, type=direct)
+        decoder.error.connect(self._decode_failed, type=direct)
+        # A loop per file, so nothing one decoder does can end the next file's loop
+        self._decoder, self._meter, self._failed = decoder, None, False
+        self._loop, self._done = QEventLoop(), False
+        decoder.start()
+        # start() can already fail, before there is a loop to quit
+        if not self._done and not self._stopped:
+            self._loop.exec()
+        decoder.bufferReady.disconnect(self._pull)
+        decoder.finished.disconnect(self._finish)
+        decoder.error.disconnect(self._decode_failed)
+        decoder.stop()
+        meter, self._decoder, self._meter, self._loop = self._meter, None, None, None
+        if self._failed or self._stopped or meter is None:
+            return None
+        return meter.result()
+
+    def _finish(self):
+        self._done = True
+        self._loop.quit()
+
+    def _decode_failed(self, error):
+        # An error after finished comes too late to spoil a complete decode
+        if not self._done:
+            self._failed = True
+            self._finish()
+
+    def _pull(self):
+        decoder = self._decoder
+        while decoder.bufferAvailable():
+            buffer = decoder.read()
+            sample_type = EqualizerEngine.SAMPLE_TYPES.get(buffer.format().sampleFormat())
+            if sample_type is None or buffer.byteCount() == 0:
+                continue
+            audio_format = buffer.format()
+            if self._meter is None:
+                self._meter = LoudnessMeter(audio_format.sampleRate(), audio_format.channelCount())
+            data = buffer.constData()
+            data.setsize(buffer.byteCount())
+            samples = np.frombuffer(data, dtype=sample_type[0]).reshape(-1, audio_format.channelCount())
+            if sample_type[1] != 1.0:
+                samples = samples.astype(np.float32) * np.float32(sample_type[1])
+            self._meter.process(samples)
+        if self._stopped:
+            self._finish()
+
+class VolumeNormalizer(QObject):
+    """Measures the loudness of playlist files and turns it into a per-file output gain.
+
+    A bounded pool of LoudnessAnalyzer threads takes files from one priority
+    queue: the playing track first, then the track after it and the rest of
+    its album, then whatever the menu queued for the whole playlist. A file
+    measured once comes back from the cache while its size and modification
+    time stay the same. An album is the playlist entries sharing a folder and
+    album tag, and its gain waits until all of them are measured.
+    """
+    measured = pyqtSignal(str)
+
+    CURRENT, NEXT, ALBUM, BACKGROUND = range(4)
+    MAX_WORKERS = 4
+
+    def __init__(self, window, cache_path):
+        super().__init__(window)
+        self.window = window
+        self.cache_path = cache_path
+        self.mode = GAIN_OFF
+        self.results = {}
+        # Path to the best priority it is queued at
+        self.pending = {}
+        self.jobs = queue.PriorityQueue()
+        self.workers = []
+        self._order = 0
+        self._gains = {}
+        self._albums = {}
+        self._album_revision = None
+
+    def set_mode(self, mode):
+        self.mode = mode
+        self._gains.clear()
+
+    def request(self, file_paths, priority):
+        for file_path in file_paths:
+            if file_path in self.results or self.pending.get(file_path, priority + 1) <= priority:
+                continue
+            # Queued again when it becomes more urgent, the later copy is a cache hit
+            self.pending[file_path] = priority
+            self._order += 1
+            self.jobs.put((priority, self._order, file_path))
+        if self.pending and not self.workers:
+            for _ in range(max(1, min(self.MAX_WORKERS, os.cpu_count() or 1))):
+                worker = LoudnessAnalyzer(self.jobs, self.cache_path, self)
+                worker.analyzed.connect(self.analyzed)
+                worker.start(QThread.Priority.LowPriority)
+                self.workers.append(worker)
+
+    def analyzed(self, file_path, result):
+        if file_path in self.results:
+            return
+        self.pending.pop(file_path, None)
+        self.results[file_path] = result
+        self._gains.clear()
+        self.measured.emit(file_path)
+
+    def track_changed(self, file_path):
+        """Queue what the gain of file_path and of the track after it depends on"""
+        if self.mode == GAIN_OFF or file_path is None:
+            return
+        self.request([file_path], self.CURRENT)
+        index = self.window.peek_next_index()
+        if index is not None:
+            self.request([self.window.playlist[index]], self.NEXT)
+        if self.mode == GAIN_ALBUM:
+            self.request(self.album_paths(file_path), self.ALBUM)
+
+    def album_key(self, file_path):
+        info = self.window.playlist_model.metadata.get(file_path)
+        return os.path.dirname(file_path), info.album if info is not None else None
+
+    def album_paths(self, file_path):
+        # Regrouped only after the playlist or its probed tags changed
+        revision = (len(self.window.playlist), len(self.window.playlist_model.metadata))
+        if revision != self._album_revision:
+            albums = {}
+            for path in self.window.playlist:
+                albums.setdefault(self.album_key(path), []).append(path)
+            self._albums, self._album_revision = albums, revision
+            self._gains.clear()
+        return self._albums.get(self.album_key(file_path), [file_path])
+
+    def gain_db(self, file_path):
+        """Gain for file_path in the current mode, None while it is not known"""
+        if self.mode == GAIN_OFF or self.results.get(file_path) is None:
+            return None
+        if self.mode == GAIN_ALBUM:
+            album = self.album_paths(file_path)
+            if all(path in self.results for path in album):
+                return album_gain([self.results[path] for path in album if self.results[path] is not None])
+        # Until the whole album is measured the track gain is the closer guess
+        return track_gain(self.results[file_path])
+
+    def gain(self, file_path):
+        """Linear factor for the output volume, 1.0 when nothing is known"""
+        if self.mode == GAIN_ALBUM:
+            # Keeps the cached gains in step with the album grouping
+            self.album_paths(file_path)
+        gain = self._gains.get(file_path)
+        if gain is None:
+            gain_db = self.gain_db(file_path)
+            gain = 10.0 ** (gain_db / 20.0) if gain_db is not None else 1.0
+            self._gains[file_path] = gain
+        return gain
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+            self.jobs.put((-1, 0, None))
+        for worker in self.workers:
+            worker.wait()
+        self.workers = []
+
+class GaplessController(QObject):
+    """Pre-arms the next track on a standby player and hands playback over without a reload gap.
+
+    The standby source is set and pre-rolled preload_seconds before the
+    handoff. After a handoff the standby is the retired player, still playing
+    its tail or fading out, and nothing is armed on it until it is released. A single-shot timer, refined on every position
+    update, starts the standby player start_lead_ms ahead of the end so its
+    output startup overlaps the tail of the current track. With a crossfade
+    the handoff moves earlier by crossfade_ms and both outputs follow a
+    scheduled volume ramp.
+    """
+    switch_measured = pyqtSignal(float, float)
+
+    RAMP_INTERVAL = 20
+    PRELOAD_SECONDS = 5
+
+    def __init__(self, window, standby_player, standby_output):
+        super().__init__(window)
+        self.window = window
+        self.standby_player = standby_player
+        self.standby_output = standby_output
+        self.enabled = True
+        self.preload_seconds = self.PRELOAD_SECONDS
+        self.crossfade_ms = 0
+        self.start_lead_ms = 40.0
+        self.armed_index = None
+        self.armed_path = None
+        self.armed_loaded = False
+        self.retiring = False
+        self.latencies = deque(maxlen=100)
+        self._switch_started = None
+        self._switch_lead = 0.0
+        self._ramp = None
+
+        self.handoff_timer = QTimer(self)
+        self.handoff_timer.setSingleShot(True)
+        self.handoff_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.handoff_timer.timeout.connect(self.handoff)
+        self.ramp_timer = QTimer(self)
+        self.ramp_timer.setInterval(self.RAMP_INTERVAL)
+        self.ramp_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.ramp_timer.timeout.connect(self._ramp_step)
+        self.standby_player.mediaStatusChanged.connect(self._standby_status_changed)
+
+    def base_volume(self, file_path=None):
+        return self.window.output_volume(file_path)
+
+    def set_volume(self, volume):
+        # An active ramp reads the slider on every step
+        if self._ramp is None:
+            self.window.audio_output.setVolume(volume)
+
+    def disarm(self):
+        self.handoff_timer.stop()
+        if self.armed_path is not None:
+            self.standby_player.stop()
+            self.standby_player.setSource(QUrl())
+        self.armed_index = None
+        self.armed_path = None
+        self.armed_loaded = False
+
+    def _remaining_wall_ms(self, position):
+        player = self.window.media_player
+        duration = player.duration()
+        if duration <= 0:
+            return None
+        rate = player.playbackRate() or 1.0
+        return (duration - position) / rate
+
+    def position_changed(self, position):
+        if not self.enabled or self.window.is_seeking or self.window.ab_loop.active():
+            return
+        remaining = self._remaining_wall_ms(position)
+        if remaining is None:
+            return
+        if remaining > self.preload_seconds * 1000 + self.crossfade_ms:
+            if self.armed_path is not None:
+                # The user seeked back out of the preload window
+                self.disarm()
+            return
+        if self.armed_path is None:
+            self.arm()
+        if self.armed_loaded and self.window.media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState:
+            delay = remaining - self.start_lead_ms - self.crossfade_ms
+            self.handoff_timer.start(max(0, int(delay)))
+        else:
+            self.handoff_timer.stop()
+
+    def arm(self):
+        index = self.window.peek_next_index()
+        if index is None or self.retiring:
+            return
+        self.armed_index = index
+        self.armed_path = self.window.playlist[index]
+        self.armed_loaded = False
+        self.standby_player.setPlaybackRate(self.window.media_player.playbackRate())
+        self.standby_output.setVolume(0.0)
+        self.standby_player.setSource(QUrl.fromLocalFile(self.armed_path))
+
+    def _standby_status_changed(self, status):
+        if self.armed_path is None:
+            return
+        if status == QMediaPlayer.MediaStatus.LoadedMedia:
+            # Pausing a loaded source pre-rolls the decoder without producing output
+            self.standby_player.pause()
+            self.armed_loaded = True
+        elif status == QMediaPlayer.MediaStatus.InvalidMedia:
+            self.disarm()
+
+    def handoff(self):
+        window = self.window
+        index = self.armed_index
+        if self.armed_path is None or not self.armed_loaded:
+            return
+        if window.path_at(index) != self.armed_path:
+            # The playlist changed underneath the armed track
+            self.disarm()
+            return
+        old_player, old_output = window.media_player, window.audio_output
+        new_player, new_output = self.standby_player, self.standby_output
+        old_path, new_path = window.current_path(), self.armed_path
+        remaining = self._remaining_wall_ms(old_player.position()) or 0.0
+
+        self.standby_player.mediaStatusChanged.disconnect(self._standby_status_changed)
+        self.standby_player, self.standby_output = old_player, old_output
+        self.standby_player.mediaStatusChanged.connect(self._standby_status_changed)
+        self.armed_index = None
+        self.armed_path = None
+        self.armed_loaded = False
+        self.retiring = True
+
+        if self.crossfade_ms > 0:
+            new_output.setVolume(0.0)
+            self._ramp = (old_output, new_output, old_path, new_path, time.perf_counter(), self.crossfade_ms / 1000.0)
+            self.ramp_timer.start()
+        else:
+            new_output.setVolume(self.base_volume(new_path))
+            # Let the old player finish its tail, then release it
+            QTimer.singleShot(int(remaining) + 50, self._release_standby)
+        self.begin_switch_measure(new_player, lead_ms=remaining)
+        new_player.play()
+        window.swap_player(new_player, new_output, index)
+
+    def _release_standby(self):
+        if self.armed_path is None and self._ramp is None:
+            self.standby_player.stop()
+            self.retiring = False
+
+    def _ramp_step(self):
+        old_output, new_output, old_path, new_path, started, length = self._ramp
+        progress = min(1.0, (time.perf_counter() - started) / length)
+        # Equal-power curves keep perceived loudness steady through the fade
+        new_output.setVolume(self.base_volume(new_path) * math.sin(progress * math.pi / 2))
+        old_output.setVolume(self.base_volume(old_path) * math.cos(progress * math.pi / 2))
+        if progress >= 1.0:
+            self.ramp_timer.stop()
+            self._ramp = None
+            self._release_standby()
+
+    def begin_switch_measure(self, player, lead_ms=0.0):
+        """Time from starting a track to its first position update"""
+        self._switch_started = time.perf_counter()
+        self._switch_lead = lead_ms
+        try:
+            player.positionChanged.disconnect(self._first_position)
+        except TypeError:
+            pass
+        player.positionChanged.connect(self._first_position)
+
+    def _first_position(self, position):
+        player = self.sender()
+        if self._switch_started is None or position <= 0:
+            return
+        player.positionChanged.disconnect(self._first_position)
+        latency = (time.perf_counter() - self._switch_started) * 1000
+        self._switch_started = None
+        # The track switch is heard as the start latency not hidden by the overlap
+        gap = latency - self._switch_lead
+        self.latencies.append(gap)
+        if self._switch_lead > 0:
+            # Track the backend's start latency so the next handoff is scheduled better
+            self.start_lead_ms = 0.7 * self.start_lead_ms + 0.3 * min(latency, 500.0)
+        self.switch_measured.emit(latency, gap)
+
+class ABLoopController(QObject):
+    """Loops playback between the window's ab_start and ab_end without overshooting B.
+
+    Every position update anchors a wall clock prediction of when playback
+    reaches B at the current rate, and a precise single-shot timer fires a
+    learned lead time before it. The loop then either starts a standby
+    player that was pre-rolled and paused at A and swaps it in, or seeks the
+    active player back to A when no standby is ready. The first position
+    update after the jump tells when playback was back at A, its distance
+    from the predicted B time is the boundary error, which also corrects
+    the lead of the path that was used.
+    """
+    loop_measured = pyqtSignal(float)
+
+    MIN_LOOP_MS = 200
+    READY_TOLERANCE_MS = 100
+    MEASURE_TIMEOUT = 1.0
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.seamless = True
+        self.seek_lead_ms = 30.0
+        self.standby_lead_ms = 40.0
+        self.errors = deque(maxlen=100)
+        self.loops = {"standby": 0, "seek": 0}
+        self.standby_player = None
+        self.standby_output = None
+        self.standby_ready = False
+        # (position, perf_counter) of the latest update before B
+        self._anchor = None
+        # (predicted time at B, path, time fired, position fired from) until the jump is seen
+        self._expected = None
+
+        self.loop_timer = QTimer(self)
+        self.loop_timer.setSingleShot(True)
+        self.loop_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.loop_timer.timeout.connect(self.loop_back)
+
+    def active(self):
+        return self.window.ab_start is not None and self.window.ab_end is not None
+
+    def set_points(self):
+        self.loop_timer.stop()
+        self._expected = None
+        if self.active() and self.seamless:
+            self.prepare_standby()
+        else:
+            self.release_standby()
+
+    def reset(self):
+        self.loop_timer.stop()
+        self._anchor = None
+        self._expected = None
+        self.release_standby()
+
+    def prepare_standby(self):
+        if self.standby_player is None:
+            self.standby_output = QAudioOutput()
+            self.standby_output.setVolume(0.0)
+            self.standby_player = QMediaPlayer()
+            self.standby_player.setAudioOutput(self.standby_output)
+            self._connect_standby(self.standby_player)
+        self.standby_ready = False
+        source = self.window.media_player.source()
+        if self.standby_player.source() != source:
+            # Parked at A once the source has loaded
+            self.standby_player.setSource(source)
+        else:
+            self._park()
+
+    def release_standby(self):
+        self.standby_ready = False
+        if self.standby_player is not None and not self.standby_player.source().isEmpty():
+            self.standby_player.stop()
+            self.standby_player.setSource(QUrl())
+
+    def _connect_standby(self, player):
+        player.mediaStatusChanged.connect(self._standby_status_changed)
+        player.positionChanged.connect(self._standby_position)
+
+    def _disconnect_standby(self, player):
+        player.mediaStatusChanged.disconnect(self._standby_status_changed)
+        player.positionChanged.disconnect(self._standby_position)
+
+    def _park(self):
+        """Pause the standby player at A so its decoder holds the first frames"""
+        self.standby_output.setVolume(0.0)
+        self.standby_player.pause()
+        self.standby_player.setPosition(self.window.ab_start)
+
+    def _standby_status_changed(self, status):
+        if not self.active():
+            return
+        if status == QMediaPlayer.MediaStatus.LoadedMedia:
+            self._park()
+        elif status == QMediaPlayer.MediaStatus.InvalidMedia:
+            self.release_standby()
+
+    def _standby_position(self, position):
+        if self.active() and abs(position - self.window.ab_start) <= self.READY_TOLERANCE_MS:
+            self.standby_ready = True
+
+    def _use_standby(self):
+        # Routed equalizer audio restarts on every player swap, a seek is smoother there
+        return self.seamless and self.standby_ready and self.window.equalizer_engine.decoder is None
+
+    def position_changed(self, position):
+        if not self.active() or self.window.is_seeking:
+            return
+        now = time.perf_counter()
+        if self._expected is not None:
+            self._measure(position, now)
+            if self._expected is not None:
+                # Still hearing the tail before the jump, do not loop twice
+                return
+        player = self.window.media_player
+        # A burst capture has to play through B, the loop waits until it is done
+        if player.playbackState() != QMediaPlayer.PlaybackState.PlayingState or self.window.frame_capture.capturing():
+            self.loop_timer.stop()
+            return
+        self._anchor = (position, now)
+        end = self.window.ab_end
+        if position >= end:
+            # Overshot, e.g. after the user seeked past B
+            self.loop_back()
+            return
+        rate = player.playbackRate() or 1.0
+        lead = self.standby_lead_ms if self._use_standby() else self.seek_lead_ms
+        self.loop_timer.start(max(0, int((end - position) / rate - lead)))
+
+    def loop_back(self):
+        window = self.window
+        player = window.media_player
+        if not self.active() or player.playbackState() != QMediaPlayer.PlaybackState.PlayingState:
+            return
+        now = time.perf_counter()
+        rate = player.playbackRate() or 1.0
+        anchor_position, anchor_time = self._anchor or (player.position(), now)
+        due = anchor_time + (window.ab_end - anchor_position) / rate / 1000.0
+        if self._use_standby():
+            path = "standby"
+            self._swap()
+        else:
+            path = "seek"
+            player.setPosition(window.ab_start)
+        self.loops[path] += 1
+        self._expected = (due, path, now, anchor_position)
+
+    def _swap(self):
+        window = self.window
+        old_player, old_output = window.media_player, window.audio_output
+        new_player, new_output = self.standby_player, self.standby_output
+        self._disconnect_standby(new_player)
+        self._connect_standby(old_player)
+        self.standby_player, self.standby_output = old_player, old_output
+        self.standby_ready = False
+        new_player.setPlaybackRate(old_player.playbackRate())
+        new_output.setVolume(old_output.volume())
+        new_player.play()
+        window.swap_player(new_player, new_output, window.current_index, same_media=True)
+        # The old player plays on until the new one is heard, then parks at A for the next pass
+        QTimer.singleShot(int(self.standby_lead_ms), self._park_retired)
+
+    def _park_retired(self):
+        if self.active() and self.seamless and self.standby_player is not self.window.media_player:
+            self._park()
+
+    def _measure(self, position, now):
+        due, path, fired, fired_from = self._expected
+        start = self.window.ab_start
+        if now - fired > self.MEASURE_TIMEOUT:
+            self._expected = None
+            return
+        # Updates from before the jump still report positions near B
+        if not start < position < fired_from:
+            return
+        self._expected = None
+        rate = self.window.media_player.playbackRate() or 1.0
+        back_at_start = now - (position - start) / rate / 1000.0
+        error = (back_at_start - due) * 1000.0
+        self.errors.append(error)
+        # Late loops (positive error) need the timer to fire earlier next time
+        if path == "standby":
+            self.standby_lead_ms = min(500.0, max(0.0, self.standby_lead_ms + 0.3 * error))
+        else:
+            self.seek_lead_ms = min(500.0, max(0.0, self.seek_lead_ms + 0.3 * error))
+        self.loop_measured.emit(error)
+
+    def jitter(self):
+        """(mean error, standard deviation, 95th percentile of |error|) in ms"""
+        errors = list(self.errors)
+        mean = sum(errors) / len(errors)
+        deviation = math.sqrt(sum((error - mean) ** 2 for error in errors) / len(errors))
+        magnitudes = sorted(abs(error) for error in errors)
+        return mean, deviation, magnitudes[int(0.95 * (len(magnitudes) - 1))]
+
+    def stats_text(self):
+        loops = self.loops
+        text = f"A-B loops: {loops['standby']} seamless, {loops['seek']} by seek"
+        if self.errors:
+            mean, deviation, p95 = self.jitter()
+            text += (f", boundary error {mean:+.1f} ms mean, jitter {deviation:.1f} ms, "
+                     f"p95 {p95:.1f} ms over {len(self.errors)}")
+        return text + f", lead {self.standby_lead_ms:.0f}/{self.seek_lead_ms:.0f} ms"
+
+class SubtitleOverlay(QLabel):
+    """Caption label floating over the video that only repaints when the visible cues change.
+
+    The active cue set is constant between the position it was computed at
+    and the index's next_change, so position updates inside that window
+    return without touching the cue index or the label.
+    """
+    def __init__(self, video_widget):
+        super().__init__(video_widget)
+        self.cues = None
+        self.active = ()
+        self._valid_from = 0
+        self._valid_until = -1
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.setWordWrap(True)
+        self.setStyleSheet("""
+            QLabel {
+                color: #ffffff;
+                background-color: rgba(0, 0, 0, 160);
+                border-radius: 6px;
+                padding: 6px 12px;
+                font-size: 20px;
+            }
+        """)
+        self.hide()
+        video_widget.installEventFilter(self)
+
+    def set_cues(self, cues):
+        self.cues = cues
+        self.active = ()
+        self._valid_from = 0
+        self._valid_until = -1
+        self.hide()
+
+    def update_position(self, position):
+        if self.cues is None or self._valid_from <= position < self._valid_until:
+            return
+        active = self.cues.active(position)
+        next_change = self.cues.next_change(position)
+        self._valid_from = position
+        self._valid_until = next_change if next_change is not None else float('inf')
+        if active == self.active:
+            return
+        self.active = active
+        if active:
+            self.setText(self.cues.text(active))
+            self.reposition()
+            self.show()
+        else:
+            self.hide()
+
+    def reposition(self):
+        parent = self.parentWidget()
+        width = int(parent.width() * 0.9)
+        self.setFixedWidth(width)
+        self.adjustSize()
+        self.move((parent.width() - width) // 2, parent.height() - self.height() - parent.height() // 12)
+
+    def eventFilter(self, obj, event):
+        if event.type() == event.Type.Resize and self.isVisible():
+            self.reposition()
+        return False
+
+class SeekScheduler(QObject):
+    """Keeps at most one decoder seek in flight and lets the newest target win.
+
+    While a seek runs, newer targets only replace the pending one, so a fast
+    drag turns into a short chain of seeks that always ends on the latest
+    handle position. Drag seeks can snap to the nearest keyframe, which
+    decoders reach without decoding forward; the seek on release is exact.
+    A seek counts as done when the video sink delivers a frame from the seek
+    target (or a position update there for audio-only media), which is also
+    what the latency figures measure. Frames decoded before the seek are
+    ignored, so playback does not end a seek early.
+    """
+    TIMEOUT = 500
+    # A frame this close to the target counts as landed, about a frame at 24 fps with slack
+    LANDING_TOLERANCE = 60
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.snap_to_keyframes = True
+        self.keyframes = None
+        self.pending = None
+        self.pending_floor = None
+        self.in_flight = None
+        # Earliest position the in-flight seek may land on
+        self.floor = None
+        self.last_target = None
+        self.started = 0.0
+        self.latencies = deque(maxlen=200)
+        self.counters = dict.fromkeys(("requested", "issued", "superseded", "timeouts"), 0)
+        self.watchdog = QTimer(self)
+        self.watchdog.setSingleShot(True)
+        self.watchdog.setInterval(self.TIMEOUT)
+        self.watchdog.timeout.connect(self.seek_timed_out)
+        self.video_sink = window.video_widget.videoSink()
+        self.video_sink.videoFrameChanged.connect(self.frame_arrived)
+
+    def set_keyframes(self, keyframes):
+        self.keyframes = keyframes if keyframes else None
+
+    def snapped(self, position):
+        keyframes = self.keyframes
+        if not self.snap_to_keyframes or keyframes is None:
+            return position
+        i = bisect_left(keyframes, position)
+        if i == 0:
+            return keyframes[0]
+        if i == len(keyframes) or position - keyframes[i - 1] <= keyframes[i] - position:
+            return keyframes[i - 1]
+        return keyframes[i]
+
+    def keyframe_before(self, position):
+        keyframes = self.keyframes
+        if keyframes is None:
+            return position
+        i = bisect_right(keyframes, position)
+        return keyframes[i - 1] if i else position
+
+    def request(self, position, exact=True):
+        self.counters["requested"] += 1
+        if not exact:
+            position = self.snapped(position)
+            # Dragging within one keyframe interval keeps hitting the same target
+            if position == self.in_flight or (self.in_flight is None and position == self.last_target):
+                self.pending = None
+                return
+        if self.pending is not None:
+            self.counters["superseded"] += 1
+        self.pending = position
+        # An inexact seek may be served from the keyframe before the target
+        self.pending_floor = position if exact else self.keyframe_before(position)
+        if self.in_flight is None:
+            self.issue()
+
+    def issue(self):
+        position = self.pending
+        self.pending = None
+        if position is None:
+            return
+        self.counters["issued"] += 1
+        self.in_flight = position
+        self.floor = self.pending_floor
+        self.last_target = position
+        self.window.telemetry.seek_issued()
+        self.started = time.perf_counter()
+        self.watchdog.start()
+        self.window.media_player.setPosition(position)
+
+    def complete(self):
+        self.watchdog.stop()
+        latency = (time.perf_counter() - self.started) * 1000.0
+        self.latencies.append(latency)
+        self.window.telemetry.seek_completed(latency)
+        self.in_flight = None
+        if self.pending is not None:
+            self.issue()
+
+    def landed(self, position):
+        return self.floor - self.LANDING_TOLERANCE <= position <= self.in_flight + self.LANDING_TOLERANCE
+
+    def frame_arrived(self, frame):
+        if self.in_flight is None:
+            return
+        start = frame.startTime()
+        # Frames without a timestamp cannot be told apart, take them as landed
+        if start < 0 or self.landed(start // 1000):
+            self.complete()
+
+    def position_changed(self, position):
+        if self.in_flight is not None and not self.window.media_player.hasVideo() and self.landed(position):
+            self.complete()
+
+    def seek_timed_out(self):
+        # Paused or failed seeks may never produce a frame, do not block later ones
+        self.counters["timeouts"] += 1
+        self.window.telemetry.seek_timed_out()
+        self.in_flight = None
+        if self.pending is not None:
+            self.issue()
+
+    def reset(self):
+        self.watchdog.stop()
+        self.pending = None
+        self.in_flight = None
+        self.last_target = None
+
+    def stats_text(self):
+        counters = self.counters
+        text = (f"Seeks: {counters['requested']} requested, {counters['issued']} issued, "
+                f"{counters['superseded']} superseded, {counters['timeouts']} timed out")
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            median = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            text += f"; seek to frame median {median:.0f} ms, p95 {p95:.0f} ms"
+        return text
+
+class FrameIndexLoader(QThread):
+    """Loads or builds a file's frame timestamp index on a worker thread"""
+    index_loaded = pyqtSignal(str, object)
+
+    def __init__(self, file_path, cache_dir, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.cache_dir = cache_dir
+
+    def run(self):
+        try:
+            index = FrameIndexCache(self.cache_dir).load(self.file_path) if self.file_path else None
+        except Exception:
+            # An exception leaving QThread.run aborts the process, a damaged file only loses its index
+            index = None
+        self.index_loaded.emit(self.file_path, index)
+
+class BookmarkLoader(QThread):
+    """Identifies a file by content and loads its bookmarks on a worker thread"""
+    bookmarks_loaded = pyqtSignal(str, str, object)
+
+    def __init__(self, file_path, db_path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.db_path = db_path
+
+    def run(self):
+        try:
+            key = content_key(self.file_path)
+        except OSError:
+            self.bookmarks_loaded.emit(self.file_path, "", BookmarkIndex())
+            return
+        # SQLite connections stay on the thread that opened them
+        try:
+            store = BookmarkStore(self.db_path)
+            try:
+                index = store.load(key)
+            finally:
+                store.close()
+        except sqlite3.Error:
+            # A locked or damaged database shows no bookmarks rather than aborting the player
+            index = BookmarkIndex()
+        self.bookmarks_loaded.emit(self.file_path, key, index)
+
+class ThumbnailGenerator(QObject):
+    """Builds the seek bar sprite sheet of the current file on a headless player.
+
+    A second QMediaPlayer without audio output seeks through the file at
+    fixed intervals while paused, and every frame its QVideoSink delivers
+    is scaled into the next tile of the sheet. Work starts START_DELAY after
+    a track starts, seeks are spaced STEP_DELAY apart and held back while
+    the user scrubs, so the foreground decoder keeps priority. Finished
+    sheets go to a ThumbnailCache and load from there next time.
+    """
+    TILE_WIDTH = 160
+    TILE_HEIGHT = 90
+    COLUMNS = 10
+    MAX_TILES = 200
+    MIN_INTERVAL = 5000
+    START_DELAY = 3000
+    STEP_DELAY = 150
+    FRAME_TIMEOUT = 2000
+
+    def __init__(self, window, cache):
+        super().__init__(window)
+        self.window = window
+        self.cache = cache
+        self.file_path = None
+        self.key = None
+        self.layout = None
+        self.sheet = None
+        self.filled = 0
+        self.waiting = None
+        # The headless player is only built for the first file without a cached sheet
+        self.player = None
+        self.sink = None
+        self.start_timer = QTimer(self)
+        self.start_timer.setSingleShot(True)
+        self.start_timer.setInterval(self.START_DELAY)
+        self.start_timer.timeout.connect(self.begin)
+        self.step_timer = QTimer(self)
+        self.step_timer.setSingleShot(True)
+        self.step_timer.setInterval(self.STEP_DELAY)
+        self.step_timer.timeout.connect(self.next_seek)
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(self.FRAME_TIMEOUT)
+        self.frame_timer.timeout.connect(self.frame_timed_out)
+
+    def load(self, file_path):
+        self.cancel()
+        self.file_path = file_path
+        self.key = sheet_key(file_path, self.TILE_WIDTH, self.TILE_HEIGHT) if file_path else None
+        if self.key is None:
+            return
+        cached = self.cache.get(self.key)
+        if cached is not None:
+            layout, data = cached
+            sheet = QImage.fromData(data)
+            if not sheet.isNull():
+                self.layout = layout
+                self.sheet = sheet
+                self.filled = layout.count
+                return
+        self.start_timer.start()
+
+    def create_player(self):
+        self.player = QMediaPlayer(self)
+        self.sink = QVideoSink(self)
+        self.player.setVideoSink(self.sink)
+        self.sink.videoFrameChanged.connect(self.frame_ready)
+        self.player.mediaStatusChanged.connect(self.media_status_changed)
+        self.player.errorOccurred.connect(self.generation_failed)
+
+    def cancel(self):
+        for timer in (self.start_timer, self.step_timer, self.frame_timer):
+            timer.stop()
+        if self.player is not None and not self.player.source().isEmpty():
+            self.player.stop()
+            self.player.setSource(QUrl())
+        self.layout = None
+        self.sheet = None
+        self.filled = 0
+        self.waiting = None
+
+    def begin(self):
+        player = self.window.media_player
+        duration = player.duration()
+        if duration <= 0 or not player.hasVideo():
+            return
+        interval = max(self.MIN_INTERVAL, -(-duration // self.MAX_TILES))
+        count = max(1, duration // interval)
+        columns = min(self.COLUMNS, count)
+        rows = -(-count // columns)
+        self.layout = SheetLayout(interval, count, columns, self.TILE_WIDTH, self.TILE_HEIGHT)
+        self.sheet = QImage(columns * self.TILE_WIDTH, rows * self.TILE_HEIGHT, QImage.Format.Format_RGB32)
+        self.sheet.fill(QColor("#000000"))
+        if self.player is None:
+            self.create_player()
+        self.player.setSource(QUrl.fromLocalFile(self.file_path))
+
+    def media_status_changed(self, status):
+        if status == QMediaPlayer.MediaStatus.LoadedMedia and self.layout is not None and self.filled == 0:
+            # A paused player renders the frame at every seek target
+            self.player.pause()
+            self.next_seek()
+
+    def next_seek(self):
+        if self.layout is None:
+            return
+        if self.filled >= self.layout.count:
+            self.finish()
+            return
+        window = self.window
+        if window.is_seeking or window.seek_scheduler.in_flight is not None:
+            self.step_timer.start()
+            return
+        self.waiting = self.filled * self.layout.interval_ms + self.layout.interval_ms // 2
+        self.frame_timer.start()
+        self.player.setPosition(self.waiting)
+
+    def frame_ready(self, frame):
+        if self.waiting is None or not frame.isValid():
+            return
+        start = frame.startTime()
+        # Frames decoded before the seek landed can still arrive
+        if start >= 0 and abs(start // 1000 - self.waiting) > self.layout.interval_ms:
+            return
+        image = frame.toImage()
+        if image.isNull():
+            return
+        tile = image.scaled(self.TILE_WIDTH, self.TILE_HEIGHT, Qt.AspectRatioMode.KeepAspectRatio,
+                            Qt.TransformationMode.SmoothTransformation)
+        x, y = self.tile_origin(self.filled)
+        painter = QPainter(self.sheet)
+        painter.drawImage(x + (self.TILE_WIDTH - tile.width()) // 2,
+                          y + (self.TILE_HEIGHT - tile.height()) // 2, tile)
+        painter.end()
+        self.advance()
+
+    def frame_timed_out(self):
+        # Leave the tile black rather than stall on a frame that never comes
+        self.advance()
+
+    def advance(self):
+        self.frame_timer.stop()
+        self.waiting = None
+        self.filled += 1
+        self.step_timer.start()
+
+    def generation_failed(self, error, error_string):
+        self.cancel()
+
+    def finish(self):
+        self.player.stop()
+        self.player.setSource(QUrl())
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QBuffer.OpenModeFlag.WriteOnly)
+        if self.sheet.save(buffer, "JPG", 80):
+            try:
+                self.cache.put(self.key, self.layout, bytes(data))
+            except OSError:
+                pass
+
+    def tile_origin(self, index):
+        row, column = divmod(index, self.layout.columns)
+        return column * self.TILE_WIDTH, row * self.TILE_HEIGHT
+
+    def preview(self, position):
+        """Tile nearest to position (ms), None while it has not been generated"""
+        if self.sheet is None:
+            return None
+        index = min(max(0, position // self.layout.interval_ms), self.layout.count - 1)
+        if index >= self.filled:
+            return None
+        x, y = self.tile_origin(index)
+        return self.sheet.copy(x, y, self.TILE_WIDTH, self.TILE_HEIGHT)
+
+class SeekPreview(QLabel):
+    """Floating thumbnail shown above the progress slider while hovering it"""
+    def __init__(self, window, slider):
+        super().__init__(window, Qt.WindowType.ToolTip)
+        self.window = window
+        self.slider = slider
+        self.setStyleSheet("QLabel { border: 1px solid #0078d4; background-color: #000000; }")
+        slider.setMouseTracking(True)
+        slider.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == event.Type.MouseMove:
+            self.hover(event.position().x())
+        elif event.type() in (event.Type.Leave, event.Type.Hide):
+            self.hide()
+        return False
+
+    def hover(self, x):
+        duration = self.window.media_player.duration()
+        if duration <= 0:
+            self.hide()
+            return
+        slider = self.slider
+        value = QStyle.sliderValueFromPosition(slider.minimum(), slider.maximum(), int(x), slider.width())
+        position = int(value / slider.maximum() * duration)
+        tile = self.window.thumbnails.preview(position)
+        if tile is None:
+            self.hide()
+            return
+        painter = QPainter(tile)
+        painter.setPen(QColor("#ffffff"))
+        painter.setFont(QFont("Segoe UI", 9, QFont.Weight.Bold))
+        painter.drawText(tile.rect().adjusted(0, 0, 0, -4),
+                         Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignBottom, format_time(position // 1000))
+        painter.end()
+        self.setPixmap(QPixmap.fromImage(tile))
+        self.adjustSize()
+        anchor = slider.mapToGlobal(QPoint(int(x), 0))
+        self.move(anchor.x() - self.width() // 2, anchor.y() - self.height() - 8)
+        self.show()
+
+class FrameCapture(QObject):
+    """Saves frames straight from the display QVideoSink at their native resolution.
+
+    Only a shallow QVideoFrame reference is taken on the GUI thread; the
+    conversion to QImage, encoding and the disk write run in a thread pool.
+    Burst mode plays the A/B range and keeps every Nth frame the sink shows.
+    When encoding falls behind, playback pauses until the pool catches up,
+    so frames are held briefly instead of dropped or queued without bound.
+    """
+    encoded = pyqtSignal(str, str)
+    frame_saved = pyqtSignal(str, str)
+    burst_finished = pyqtSignal(str)
+
+    FORMATS = {"PNG": "png", "JPEG": "jpg", "WebP": "webp"}
+    QUALITY = 90
+    MAX_HELD = 8
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.image_format = "PNG"
+        self.burst_every = 1
+        self.workers = min(4, os.cpu_count() or 1)
+        self.max_pending = max(4, self.workers * 2)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = 0
+        self.burst = None
+        self.encoded.connect(self._frame_done)
+        window.video_widget.videoSink().videoFrameChanged.connect(self.burst_frame)
+
+    def output_dir(self):
+        pictures = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.PicturesLocation)
+        path = os.path.join(pictures or os.path.expanduser("~"), "MediaPlayer")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def file_path(self, position):
+        source = self.window.media_player.source().toLocalFile()
+        base = os.path.splitext(os.path.basename(source))[0] or "frame"
+        seconds, milliseconds = divmod(max(0, position), 1000)
+        stamp = format_time(seconds).replace(":", "-")
+        return os.path.join(self.output_dir(), f"{base}_{stamp}.{milliseconds:03d}.{self.FORMATS[self.image_format]}")
+
+    def capture(self, frame, position):
+        """Queue one frame for saving, returns False when it is invalid or the pool is saturated"""
+        if frame is None or not frame.isValid() or self.pending >= self.max_pending:
+            return False
+        self.pending += 1
+        self.executor.submit(self._encode, QVideoFrame(frame), self.file_path(position))
+        return True
+
+    def _encode(self, frame, file_path):
+        image = frame.toImage()
+        if image.isNull():
+            self.encoded.emit(file_path, "frame could not be converted")
+            return
+        quality = -1 if self.image_format == "PNG" else self.QUALITY
+        if image.save(file_path, None, quality):
+            self.encoded.emit(file_path, "")
+        else:
+            self.encoded.emit(file_path, f"{self.image_format} encoding failed")
+
+    def _frame_done(self, file_path, error):
+        self.pending -= 1
+        burst = self.burst
+        if burst is None:
+            self.frame_saved.emit(file_path, error)
+        else:
+            burst["saved" if not error else "failed"] += 1
+            burst["last_saved"] = time.perf_counter()
+            held = burst["held"]
+            while held and self.pending < self.max_pending:
+                self.capture(*held.popleft())
+            if burst["paused"] and not held and not burst["finished"]:
+                burst["paused"] = False
+                self.window.media_player.play()
+            if burst["finished"] and self.pending == 0 and not held:
+                self.report_burst()
+
+    def start_burst(self, start, end):
+        self.burst = {"start": start, "end": end, "seen": 0, "captured": 0, "dropped": 0, "saved": 0,
+                      "failed": 0, "started": time.perf_counter(), "last_saved": None, "finished": False,
+                      "held": deque(), "paused": False, "last": None}
+        player = self.window.media_player
+        player.setPosition(start)
+        player.play()
+
+    def burst_frame(self, frame):
+        burst = self.burst
+        if burst is None or burst["finished"] or not frame.isValid():
+            return
+        position = frame.startTime() // 1000 if frame.startTime() >= 0 else self.window.media_player.position()
+        # Frames decoded before the seek to A landed are not part of the range
+        if position < burst["start"] - 50:
+            return
+        # Playback jumping back (a loop or a seek) means the range will not be seen to its end
+        if position >= burst["end"] or (burst["last"] is not None and position < burst["last"] - 50):
+            self.finish_burst()
+            return
+        burst["last"] = position
+        burst["seen"] += 1
+        if (burst["seen"] - 1) % self.burst_every == 0:
+            if self.capture(frame, position):
+                burst["captured"] += 1
+            elif len(burst["held"]) < self.MAX_HELD:
+                # Frames already decoded still arrive for a moment after the pause
+                burst["held"].append((QVideoFrame(frame), position))
+                burst["captured"] += 1
+                if not burst["paused"]:
+                    burst["paused"] = True
+                    self.window.media_player.pause()
+            else:
+                burst["dropped"] += 1
+
+    def capturing(self):
+        return self.burst is not None and not self.burst["finished"]
+
+    def finish_burst(self):
+        burst = self.burst
+        burst["finished"] = True
+        burst["capture_seconds"] = time.perf_counter() - burst["started"]
+        self.window.media_player.pause()
+        if self.pending == 0 and not burst["held"]:
+            self.report_burst()
+
+    def report_burst(self):
+        burst = self.burst
+        self.burst = None
+        capture_seconds = burst["capture_seconds"] or 1e-9
+        save_seconds = ((burst["last_saved"] or time.perf_counter()) - burst["started"]) or 1e-9
+        self.burst_finished.emit(
+            f"Burst: {burst['saved']} frames saved, {burst['dropped']} dropped, {burst['failed']} failed; "
+            f"captured {burst['captured'] / capture_seconds:.1f} fps, saved {burst['saved'] / save_seconds:.1f} fps")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+class UiRefreshScheduler(QObject):
+    """Coalesces playback position updates into at most one UI refresh per display frame.
+
+    Position signals only record the latest value and arm a single-shot
+    timer aligned to the next frame slot, so any number of signals in one
+    frame cost one refresh. Widgets are only touched when what they show
+    actually changes. Paused playback refreshes at PAUSED_INTERVAL and
+    nothing is scheduled while the window is minimized or hidden.
+    """
+    PAUSED_INTERVAL = 250
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.position = None
+        self.playing = False
+        self.visible = True
+        self.last_refresh = 0.0
+        self.slider_value = None
+        self.label_second = None
+        self.counters = dict.fromkeys(
+            ("position_signals", "refreshes", "slider_updates", "label_updates", "hidden_skips"), 0)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.refresh)
+
+    def frame_interval(self):
+        screen = self.window.screen()
+        rate = screen.refreshRate() if screen is not None else 0
+        return 1000.0 / rate if rate > 0 else 1000.0 / 60
+
+    def position_changed(self, position):
+        self.counters["position_signals"] += 1
+        self.position = position
+        self.schedule()
+
+    def set_playing(self, playing):
+        self.playing = playing
+        if self.position is not None:
+            self.schedule()
+
+    def set_visible(self, visible):
+        if visible == self.visible:
+            return
+        self.visible = visible
+        if not visible:
+            self.timer.stop()
+        elif self.position is not None:
+            # Catch up with whatever happened while hidden
+            self.schedule()
+
+    def invalidate(self):
+        """Forget what the widgets show so the next refresh redraws them"""
+        self.slider_value = None
+        self.label_second = None
+
+    def schedule(self):
+        if not self.visible:
+            self.counters["hidden_skips"] += 1
+            return
+        if self.timer.isActive():
+            return
+        interval = self.frame_interval() if self.playing else max(self.frame_interval(), self.PAUSED_INTERVAL)
+        elapsed = (time.perf_counter() - self.last_refresh) * 1000.0
+        self.timer.start(max(0, int(interval - elapsed)))
+
+    def refresh(self):
+        if self.position is None:
+            return
+        self.counters["refreshes"] += 1
+        self.last_refresh = time.perf_counter()
+        window = self.window
+        position = self.position
+        if not window.is_seeking:
+            duration = window.media_player.duration()
+            if duration > 0:
+                value = int(position / duration * 10000)
+                if value != self.slider_value:
+                    self.slider_value = value
+                    window.progress_slider.setValue(value)
+                    self.counters["slider_updates"] += 1
+                second = position // 1000
+                if second != self.label_second:
+                    self.label_second = second
+                    window.time_label.setText(window.format_time(second))
+                    self.counters["label_updates"] += 1
+        window.subtitle_overlay.update_position(position)
+
+    def stats_text(self):
+        counters = self.counters
+        signals = counters["position_signals"]
+        saved = 1.0 - counters["refreshes"] / signals if signals else 0.0
+        return (f"UI refresh: {signals} position signals, {counters['refreshes']} refreshes "
+                f"({saved:.0%} coalesced), {counters['slider_updates']} slider and "
+                f"{counters['label_updates']} label repaints, {counters['hidden_skips']} skipped while hidden")
+
+class EqualizerEngine(QObject):
+    """Plays the active track through the NumPy equalizer and a QAudioSink.
+
+    QMediaPlayer never exposes decoded PCM, so while the equalizer is on the
+    current source is decoded a second time with QAudioDecoder. The player
+    stays the clock: a feed timer tops the sink up from the decoded queue and
+    restarts the decode whenever the sink drifts away from the player
+    position (seeks, track changes). QAudioDecoder cannot seek, so a restart
+    decodes from the top and drops buffers until it reaches wherever the
+    player is by then. The player's own output is only muted once the sink
+    is fed, and the timer only runs while a track plays or is routed.
+    """
+    FEED_INTERVAL = 10
+    BUFFER_MS = 200
+    MAX_QUEUED_MS = 2000
+    DRIFT_MS = 150
+    GAIN_DEBOUNCE = 30
+
+    SAMPLE_TYPES = {
+        QAudioFormat.SampleFormat.Float: (np.float32, 1.0),
+        QAudioFormat.SampleFormat.Int16: (np.int16, 1.0 / 32768),
+        QAudioFormat.SampleFormat.Int32: (np.int32, 1.0 / 2147483648),
+    }
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.enabled = False
+        self.gains = [0.0] * len(EQ_FREQUENCIES)
+        self.decoder = None
+        self.sink = None
+        self.device = None
+        self.equalizer = None
+        self.source = None
+        self.failed_source = None
+        self.output = None
+        self.muted_output = None
+        self.chunks = deque()
+        self.queued_frames = 0
+        self.catching_up = False
+        self.start_position = 0
+        self.written_frames = 0
+
+        self.feed_timer = QTimer(self)
+        self.feed_timer.setInterval(self.FEED_INTERVAL)
+        self.feed_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.feed_timer.timeout.connect(self.feed)
+        self.gain_timer = QTimer(self)
+        self.gain_timer.setSingleShot(True)
+        self.gain_timer.setInterval(self.GAIN_DEBOUNCE)
+        self.gain_timer.timeout.connect(self.apply_gains)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if enabled:
+            self.failed_source = None
+            self.feed_timer.start()
+        else:
+            self.feed_timer.stop()
+            self.stop_routing()
+
+    def wake(self):
+        """Resume feeding after the timer stopped on a paused, idle or unusable player"""
+        if self.enabled and not self.feed_timer.isActive():
+            self.feed_timer.start()
+
+    def set_gains(self, gains):
+        self.gains = list(gains)
+        # Slider drags and presets change several bands in a row, build the filter once
+        self.gain_timer.start()
+
+    def apply_gains(self):
+        if self.equalizer is not None:
+            self.equalizer.set_gains(self.gains)
+
+    def output_format(self):
+        audio_format = QMediaDevices.defaultAudioOutput().preferredFormat()
+        audio_format.setSampleFormat(QAudioFormat.SampleFormat.Float)
+        audio_format.setChannelCount(min(2, max(1, audio_format.channelCount())))
+        return audio_format
+
+    def start_routing(self, position):
+        self.stop_routing()
+        player = self.window.media_player
+        self.source = player.source()
+        audio_format = self.output_format()
+        self.sample_rate = audio_format.sampleRate()
+        self.channels = audio_format.channelCount()
+        self.frame_bytes = audio_format.bytesPerFrame()
+        self.equalizer = Equalizer(self.sample_rate, self.channels)
+        self.equalizer.set_gains(self.gains)
+        self.catching_up = True
+        self.start_position = position
+        self.written_frames = 0
+
+        self.decoder = QAudioDecoder(self)
+        self.decoder.setAudioFormat(audio_format)
+        self.decoder.setSource(self.source)
+        self.decoder.bufferReady.connect(self.pull)
+        self.decoder.error.connect(self.decoder_error)
+        self.sink = QAudioSink(audio_format, self)
+        self.sink.setBufferSize(self.sample_rate * self.BUFFER_MS // 1000 * self.frame_bytes)
+        self.sink.setVolume(self.window.audio_output.volume())
+        self.device = self.sink.start()
+        # The player keeps playing out loud until the decode has caught up with it
+        self.output = self.window.audio_output
+        self.decoder.start()
+
+    def stop_routing(self):
+        if self.decoder is not None:
+            self.decoder.bufferReady.disconnect(self.pull)
+            self.decoder.error.disconnect(self.decoder_error)
+            self.decoder.stop()
+            self.decoder.deleteLater()
+            self.decoder = None
+        if self.sink is not None:
+            self.sink.stop()
+            self.sink.deleteLater()
+            self.sink = None
+            self.device = None
+        if self.muted_output is not None:
+            self.muted_output.setMuted(False)
+            self.muted_output = None
+        self.output = None
+        self.equalizer = None
+        self.source = None
+        self.chunks.clear()
+        self.queued_frames = 0
+
+    def decoder_error(self, error):
+        self.failed_source = self.source
+        self.window.status_bar.showMessage(f"Equalizer bypassed: {self.decoder.errorString()}")
+        self.stop_routing()
+
+    def pull(self):
+        """Move decoded buffers into the queue until it holds MAX_QUEUED_MS of audio"""
+        limit = self.sample_rate * self.MAX_QUEUED_MS // 1000
+        while self.queued_frames < limit and self.decoder.bufferAvailable():
+            buffer = self.decoder.read()
+            sample_type = self.SAMPLE_TYPES.get(buffer.format().sampleFormat())
+            if sample_type is None or buffer.byteCount() == 0:
+                continue
+            data = buffer.constData()
+            data.setsize(buffer.byteCount())
+            samples = np.frombuffer(data, dtype=sample_type[0]).reshape(-1, self.channels)
+            if sample_type[1] != 1.0:
+                samples = samples.astype(np.float32) * np.float32(sample_type[1])
+            skip = 0
+            if self.catching_up:
+                # The player moved on while the decode ran up to it, aim at where it is now
+                start_ms = buffer.startTime() / 1000.0
+                target = self.window.media_player.position()
+                if start_ms + len(samples) * 1000.0 / self.sample_rate <= target:
+                    continue
+                skip = max(0, int((target - start_ms) * self.sample_rate / 1000.0))
+                self.start_position = start_ms + skip * 1000.0 / self.sample_rate
+                self.catching_up = False
+            # The decoder reuses its memory, keep a private copy
+            samples = samples[skip:].copy() if sample_type[1] == 1.0 else samples[skip:]
+            self.chunks.append(samples)
+            self.queued_frames += len(samples)
+
+    def played_position(self):
+        buffered = (self.sink.bufferSize() - self.sink.bytesFree()) // self.frame_bytes
+        return self.start_position + (self.written_frames - buffered) * 1000.0 / self.sample_rate
+
+    def feed(self):
+        player = self.window.media_player
+        playing = player.playbackState() == QMediaPlayer.PlaybackState.PlayingState
+        # Rate changes would need time stretching, those are left to the player
+        usable = (playing and abs(player.playbackRate() - 1.0) < 1e-3 and not player.source().isEmpty()
+                  and player.source() != self.failed_source)
+        if not usable:
+            if self.decoder is not None and (not playing and player.source() == self.source):
+                self.sink.suspend()
+            else:
+                self.stop_routing()
+            # Nothing to feed until wake() reports a change
+            self.feed_timer.stop()
+            return
+        if (self.decoder is None or player.source() != self.source
+                or self.window.audio_output is not self.output):
+            self.start_routing(player.position())
+            return
+        if self.sink.state() == QAudio.State.SuspendedState:
+            self.sink.resume()
+        if self.written_frames and abs(self.played_position() - player.position()) > self.DRIFT_MS:
+            self.start_routing(player.position())
+            return
+        volume = self.window.audio_output.volume()
+        if self.sink.volume() != volume:
+            self.sink.setVolume(volume)
+        free_frames = self.sink.bytesFree() // self.frame_bytes
+        if free_frames and self.chunks and self.muted_output is None:
+            # From here the sink carries the sound
+            self.muted_output = self.output
+            self.muted_output.setMuted(True)
+        while free_frames and self.chunks:
+            chunk = self.chunks[0]
+            if len(chunk) > free_frames:
+                self.chunks[0] = chunk[free_frames:]
+                chunk = chunk[:free_frames]
+            else:
+                self.chunks.popleft()
+            self.equalizer.process(chunk)
+            self.device.write(chunk.tobytes())
+            free_frames -= len(chunk)
+            self.queued_frames -= len(chunk)
+            self.written_frames += len(chunk)
+        self.pull()
+
 class EqualizerDialog(QDialog):
-    def __init__(self, player, parent=None):
+    def __init__(self, engine, parent=None):
         super().__init__(parent)
-        self.player = player
+        self.engine = engine
         self.setWindowTitle("Audio Equalizer")
         self.setMinimumSize(600, 450)
         self.band_values = [0.0] * 10
@@ -106,9 +2275,12 @@ class EqualizerDialog(QDialog):
         
     def toggle_equalizer(self, state):
         self.equalizer_enabled = (state == Qt.CheckState.Checked.value)
+        self.engine.set_enabled(self.equalizer_enabled)
         
     def update_band(self, index, value):
-        self.band_values[index] = value / 10.0
+        # Slider steps are decibels
+        self.band_values[index] = float(value)
+        self.engine.set_gains(self.band_values)
         
     def apply_preset(self, index):
         presets = {
@@ -142,28 +2314,486 @@ class EqualizerDialog(QDialog):
             slider.setValue(0)
         self.preset_combo.setCurrentIndex(0)
         self.band_values = [0.0] * 10
+        self.engine.set_gains(self.band_values)
+
+class StartupProfiler(QObject):
+    """Timestamps of the startup stages for --profile-startup, printed once the first frame shows"""
+    TIMEOUT = 15000
 
-class MediaPlayer(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.marks = [("imports", IMPORTS_DONE)]
+        self.reported = False
+        self.window = None
+
+    def mark(self, stage):
+        self.marks.append((stage, time.perf_counter()))
+
+    def watch(self, window):
+        """Finish at the window's first video frame, or first position update for audio"""
+        self.window = window
+        window.video_widget.videoSink().videoFrameChanged.connect(self.first_frame)
+        window.media_player.positionChanged.connect(self.first_position)
+        QTimer.singleShot(self.TIMEOUT, self.report)
+
+    def first_position(self, position):
+        if position > 0 and not self.window.media_player.hasVideo():
+            self.first_frame()
+
+    def first_frame(self, *args):
+        if not self.reported:
+            self.mark("first frame")
+            self.report()
+
+    def report(self):
+        if self.reported:
+            return
+        self.reported = True
+        print("Startup profile (ms since main.py started loading):")
+        previous = MODULE_STARTED
+        for stage, timestamp in self.marks:
+            print(f"  {stage:<20}{(timestamp - MODULE_STARTED) * 1000:9.1f}  "
+                  f"(+{(timestamp - previous) * 1000:.1f})")
+            previous = timestamp
+        if self.marks[-1][0] != "first frame":
+            print("  first frame         not reached")
+        sys.stdout.flush()
+        # Closing the window shuts its worker threads down before the application exits
+        self.window.close()
+
+class MetricsServer(QObject):
+    """Serves telemetry over HTTP on the loopback interface: /metrics as Prometheus text, /metrics.json"""
+    MAX_REQUEST = 8192
+
+    def __init__(self, telemetry, parent=None):
+        super().__init__(parent)
+        self.telemetry = telemetry
+        self.server = QTcpServer(self)
+        self.server.newConnection.connect(self.accept)
+        self.buffers = {}
+
+    def listen(self, port):
+        return self.server.listen(QHostAddress(QHostAddress.SpecialAddress.LocalHost), port)
+
+    def close(self):
+        self.server.close()
+
+    def accept(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            if not socket.peerAddress().isLoopback():
+                socket.abort()
+                socket.deleteLater()
+                continue
+            self.buffers[socket] = bytearray()
+            socket.readyRead.connect(lambda socket=socket: self.read(socket))
+            socket.disconnected.connect(lambda socket=socket: self.drop(socket))
+
+    def read(self, socket):
+        buffer = self.buffers.get(socket)
+        if buffer is None:
+            return
+        buffer += bytes(socket.readAll())
+        if b"\r\n\r\n" not in buffer and b"\n\n" not in buffer:
+            if len(buffer) > self.MAX_REQUEST:
+                del self.buffers[socket]
+                socket.abort()
+            return
+        del self.buffers[socket]
+        request = bytes(buffer).split(b"\n", 1)[0].split()
+        method = request[0] if request else b""
+        path = request[1].split(b"?", 1)[0] if len(request) > 1 else b""
+        if method != b"GET":
+            status, content_type, body = "405 Method Not Allowed", "text/plain", b"GET only\n"
+        elif path in (b"/", b"/metrics"):
+            status, content_type = "200 OK", "text/plain; version=0.0.4; charset=utf-8"
+            body = self.telemetry.prometheus_text().encode("utf-8")
+        elif path == b"/metrics.json":
+            status, content_type = "200 OK", "application/json"
+            body = self.telemetry.json_line().encode("utf-8")
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"/metrics or /metrics.json\n"
+        header = (f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        socket.write(header.encode("ascii") + body)
+        socket.disconnectFromHost()
+
+    def drop(self, socket):
+        self.buffers.pop(socket, None)
+        socket.deleteLater()
+
+class PlaybackTelemetry(QObject):
+    """Times setSource to loaded and to first frame, seeks and track switches, counts frames and signals.
+
+    The window forwards the active player's signals here, so measurements
+    follow gapless and A-B loop player swaps. Each hook is a counter bump or
+    a histogram insert; snapshots are only built when exported.
+    """
+    LOG_INTERVAL = 10000
+    SIGNALS = ("positionChanged", "durationChanged", "playbackStateChanged", "mediaStatusChanged",
+               "errorOccurred", "videoFrameChanged")
+    HELP = (
+        ("load", "setSource until the media is loaded"),
+        ("first_frame", "setSource until the first video frame, or first position for audio"),
+        ("seek", "Seek issued until the first frame at the new position"),
+        ("track_switch", "Gapless handoff until the first frame of the next track"),
+        ("frame_lateness", "How late frames arrive against their presentation times"),
+        ("signals", "Player and video sink signal emissions"),
+        ("dropped_frames", "Frames missing between consecutive presentation times"),
+        ("late_frames", "Frames more than one frame interval behind schedule"),
+        ("seek_timeouts", "Seeks that produced no frame in time"),
+        ("stalls", "Times the media stalled for lack of data"),
+        ("errors", "Player errors by type"),
+        ("playlist_tracks", "Tracks in the playlist"),
+        ("playback_rate", "Current playback rate"),
+    )
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.metrics = Telemetry()
+        for name, text in self.HELP:
+            self.metrics.describe(name, text)
+        self.labels = {name: (("signal", name),) for name in self.SIGNALS}
+        self.frame_clock = FrameClock()
+        self.source_started = None
+        self.awaiting_load = False
+        self.awaiting_frame = False
+        self.server = None
+        self.log_path = None
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(self.LOG_INTERVAL)
+        self.log_timer.timeout.connect(self.write_log)
+        window.video_widget.videoSink().videoFrameChanged.connect(self.frame_arrived)
+
+    def serve(self, port):
+        self.server = MetricsServer(self, self)
+        return self.server.listen(port)
+
+    def log_to(self, path):
+        self.log_path = path
+        self.log_timer.start()
+
+    def update_gauges(self):
+        self.metrics.set_gauge("playlist_tracks", len(self.window.playlist))
+        player = self.window.media_player
+        if player is not None:
+            self.metrics.set_gauge("playback_rate", player.playbackRate())
+
+    def json_line(self):
+        self.update_gauges()
+        return self.metrics.json_line()
+
+    def prometheus_text(self):
+        self.update_gauges()
+        return self.metrics.prometheus_text()
+
+    def write_log(self):
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(self.json_line())
+        except OSError as e:
+            self.log_timer.stop()
+            self.window.status_bar.showMessage(f"Telemetry log stopped: {e}")
+
+    def close(self):
+        if self.log_timer.isActive():
+            self.log_timer.stop()
+            self.write_log()
+        if self.server is not None:
+            self.server.close()
+
+    def source_set(self):
+        self.source_started = time.perf_counter()
+        self.awaiting_load = True
+        self.awaiting_frame = True
+        self.frame_clock.reset()
+
+    def player_swapped(self):
+        self.frame_clock.reset()
+
+    def _first_frame(self, now):
+        self.awaiting_frame = False
+        self.metrics.observe("first_frame", (now - self.source_started) * 1000.0)
+
+    def position_changed(self, position):
+        self.metrics.count("signals", labels=self.labels["positionChanged"])
+        if self.awaiting_frame and position > 0 and not self.window.media_player.hasVideo():
+            self._first_frame(time.perf_counter())
+
+    def duration_changed(self, duration):
+        self.metrics.count("signals", labels=self.labels["durationChanged"])
+
+    def playback_state_changed(self, state):
+        self.metrics.count("signals", labels=self.labels["playbackStateChanged"])
+        # Paused time must not count against the frames that follow
+        self.frame_clock.reset()
+
+    def media_status_changed(self, status):
+        self.metrics.count("signals", labels=self.labels["mediaStatusChanged"])
+        if status == QMediaPlayer.MediaStatus.LoadedMedia and self.awaiting_load:
+            self.awaiting_load = False
+            self.metrics.observe("load", (time.perf_counter() - self.source_started) * 1000.0)
+        elif status == QMediaPlayer.MediaStatus.StalledMedia:
+            self.metrics.count("stalls")
+
+    def error(self, error):
+        self.metrics.count("signals", labels=self.labels["errorOccurred"])
+        self.metrics.count("errors", labels=(("error", error.name),))
+
+    def frame_arrived(self, frame):
+        now = time.perf_counter()
+        self.metrics.count("signals", labels=self.labels["videoFrameChanged"])
+        if self.awaiting_frame and frame.isValid():
+            self._first_frame(now)
+        player = self.window.media_player
+        if player is None or player.playbackState() != QMediaPlayer.PlaybackState.PlayingState:
+            return
+        frame_rate = frame.surfaceFormat().frameRate()
+        dropped, late, lateness_ms = self.frame_clock.frame(
+            frame.startTime(), now, player.playbackRate(), 1e6 / frame_rate if frame_rate > 0 else None)
+        if dropped:
+            self.metrics.count("dropped_frames", dropped)
+        if late:
+            self.metrics.count("late_frames")
+        self.metrics.observe("frame_lateness", lateness_ms)
+
+    def seek_issued(self):
+        self.frame_clock.reset()
+
+    def seek_completed(self, latency_ms):
+        self.metrics.observe("seek", latency_ms)
+
+    def seek_timed_out(self):
+        self.metrics.count("seek_timeouts")
+
+    def track_switched(self, latency_ms):
+        self.metrics.observe("track_switch", latency_ms)
+
+    def summary_text(self):
+        snapshot = self.metrics.snapshot()
+        histograms, counters = snapshot["histograms"], snapshot["counters"]
+        parts = []
+        for name, label in (("first_frame", "first frame"), ("seek", "seek"), ("track_switch", "track switch")):
+            stats = histograms.get(name)
+            if stats and stats["p50_ms"] is not None:
+                parts.append(f"{label} p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms")
+        frames = counters.get('signals{signal="videoFrameChanged"}')
+        if frames:
+            parts.append(f"{frames['rate']:.1f} frames/s")
+        for name in ("dropped_frames", "late_frames", "stalls"):
+            if name in counters:
+                parts.append(f"{counters[name]['total']} {name.replace('_', ' ')}")
+        return "Telemetry: " + ("; ".join(parts) if parts else "nothing recorded yet")
+
+class MediaPlayer(QMainWindow):
+    """Main window, built in two stages.
+
+    The constructor only builds widgets so the window can show at once. The
+    multimedia backend, whose first QMediaPlayer is the slowest part of
+    startup, is created by finish_startup on the first event loop turn.
+    """
+    # Files shorter than this start from the top, longer ones continue where they stopped
+    RESUME_MIN_DURATION_MS = 5 * 60 * 1000
+    # Stopping this close to the end counts as having finished the file
+    RESUME_END_MARGIN_MS = 10_000
+    SESSION_FLUSH_MS = 5000
+        
+    def __init__(self, profiler=None, keep_session=True):
+        super().__init__()
+        self.profiler = profiler
+        # A profiled or benchmark window neither restores nor saves the user's session
+        self.keep_session = keep_session and profiler is None
         self.media_player = None
         self.audio_output = None
         self.video_widget = None
         self.current_media_url = None
         self.playlist = []
-        self.current_index = -1
+        self.play_queue = PlayQueue()
+        self.reset_current_path = None
         self.equalizer_dialog = None
         self.subtitle_file = None
         self.is_seeking = False
         self.ab_start = None
         self.ab_end = None
-        self.bookmarks = []
-        self.recent_files = []
-        self.favorites = set()
+        self.bookmarks = BookmarkIndex()
+        self.bookmark_key = None
+        self.bookmark_loader = None
+        self.bookmark_combo_filled = False
+        # Settings and favorites are small, the playlist is read later by a SessionLoader
+        self.session = SessionStore(self.data_file_path("session"))
+        if self.keep_session:
+            self.session.load()
+        else:
+            self.session.playlist_restored([])
+        self.recent_files = self.session.recent
+        self.favorites = self.session.favorites
+        self.pending_resume = None
+        self.session_loader = None
+        self.folder_scanner = None
+        self.library_scanner = None
+        self.playlist_loader = None
+        self.playlist_saver = None
+        self.metadata_prober = None
+        self.duplicate_detector = None
+        self.subtitle_loader = None
+        self.frame_index_loader = None
+        self.frame_index = None
+        
+        self.bookmark_store = BookmarkStore(self.data_file_path("bookmarks.sqlite3"))
+        self.ui_refresh = UiRefreshScheduler(self)
         
         self.init_ui()
+        self.telemetry = PlaybackTelemetry(self)
+        self.session_timer = QTimer(self)
+        self.session_timer.setInterval(self.SESSION_FLUSH_MS)
+        self.session_timer.timeout.connect(self.save_session)
+        
+    def profile_mark(self, stage):
+        if self.profiler is not None:
+            self.profiler.mark(stage)
+            
+    def finish_startup(self, file_paths=()):
+        """Second startup stage, runs once the window is on screen"""
+        self.profile_mark("event loop")
         self.setup_media_player()
-        self.setup_timer()
+        self.profile_mark("multimedia ready")
+        if self.profiler is not None:
+            self.profiler.watch(self)
+            if not file_paths:
+                # The report closes the window, nothing may start on it afterwards
+                self.profiler.report()
+                return
+        # Files from the command line replace the track the last session stopped on
+        if self.keep_session:
+            self.restore_session(arm=not file_paths)
+        if file_paths:
+            self.play_file(file_paths[0])
+        
+    def restore_session(self, arm=True):
+        """Apply saved settings, arm the last track at its old position and rehydrate the playlist"""
+        session = self.session
+        self.volume_slider.setValue(session.get("volume", self.volume_slider.value()))
+        speed = session.get("speed", self.speed_combo.currentIndex())
+        if 0 <= speed < self.speed_combo.count():
+            self.speed_combo.setCurrentIndex(speed)
+        self.shuffle_btn.setChecked(session.get("shuffle", False))
+        self.content_dedup_action.setChecked(session.get("dedup_content", False))
+        repeat = session.get("repeat", REPEAT_OFF)
+        if repeat in REPEAT_MODES and repeat != REPEAT_OFF:
+            self.set_repeat_mode(repeat)
+        normalization = session.get("normalization", GAIN_OFF)
+        if normalization in GAIN_MODES and normalization != GAIN_OFF:
+            self.normalization_actions[normalization].setChecked(True)
+            self.normalizer.set_mode(normalization)
+        current = session.get("current")
+        if arm and current and os.path.isfile(current):
+            self.pending_resume = (current, session.resume.get(current, 0), session.get("ab"))
+            self.play_file(current)
+        if not session.playlist_known:
+            self.session_loader = SessionLoader(session.playlist_path, session.playlist_ops, self)
+            self.session_loader.entries_loaded.connect(self.session_entries_loaded)
+            self.session_loader.load_finished.connect(self.session_load_finished)
+            self.session_loader.finished.connect(self.session_loader.deleteLater)
+            self.session_loader.start()
+        self.session_timer.start()
+        
+    def session_entries_loaded(self, file_paths):
+        if self.sender() is not self.session_loader:
+            return
+        # Once a reset made the store take the live playlist, restored rows are new to it
+        self.extend_playlist(file_paths, journal=self.session.playlist_known)
+        file_path = self.current_path()
+        if self.current_index < 0 and file_path in file_paths:
+            self.play_queue.start(self.playlist.index(file_path))
+            self.update_playlist_selection()
+        
+    def session_load_finished(self, file_paths, error):
+        if self.sender() is not self.session_loader:
+            return
+        self.session_loader = None
+        if error:
+            # The store keeps its journal and compacts once a later start reads the playlist
+            self.status_bar.showMessage(f"Could not restore the playlist: {error}")
+            return
+        self.session.playlist_restored(file_paths)
+        if file_paths:
+            self.status_bar.showMessage(f"Restored {len(file_paths)} playlist entries")
+        
+    def current_path(self):
+        return self.current_media_url.toLocalFile() if self.current_media_url is not None else None
+        
+    def save_position(self):
+        """Store where the current file is, forgetting it when the file is as good as finished"""
+        file_path = self.current_path()
+        if self.media_player is None or file_path is None or self.pending_resume is not None:
+            return
+        duration = self.media_player.duration()
+        if duration <= 0:
+            # Not loaded yet, the saved position still stands
+            return
+        position = self.media_player.position()
+        if position >= duration - self.RESUME_END_MARGIN_MS:
+            position = 0
+        self.session.set_resume(file_path, position)
+        
+    def save_session(self):
+        if not self.keep_session:
+            return
+        self.save_position()
+        try:
+            self.session.flush()
+        except OSError as e:
+            self.status_bar.showMessage(f"Could not save the session: {e}")
+        
+    def apply_resume(self):
+        """Seek a freshly loaded file to its resume point, True when it should wait paused"""
+        file_path = self.current_path()
+        if self.pending_resume is not None and self.pending_resume[0] == file_path:
+            _path, position, ab = self.pending_resume
+            self.pending_resume = None
+            if position:
+                self.media_player.setPosition(position)
+            if ab and ab[0] == file_path:
+                self.ab_start, self.ab_end = ab[1], ab[2]
+                self.ab_loop.set_points()
+                self.update_ab_buttons()
+                self.save_ab_points()
+            self.status_bar.showMessage(f"Restored: {os.path.basename(file_path)} at "
+                                        f"{self.format_time(position // 1000)}")
+            return True
+        self.pending_resume = None
+        position = self.session.resume.get(file_path)
+        duration = self.media_player.duration()
+        if (position and duration >= self.RESUME_MIN_DURATION_MS
+                and position < duration - self.RESUME_END_MARGIN_MS):
+            self.media_player.setPosition(position)
+            self.status_bar.showMessage(f"Resuming {os.path.basename(file_path)} at "
+                                        f"{self.format_time(position // 1000)}")
+        return False
+        
+    def receive_launch(self, files, flags):
+        """Files forwarded by a later launch of the player"""
+        file_paths = [path for path in files if os.path.isfile(path)]
+        # One batch, so 50 files from 'Open with' cost a single model insert and probe request
+        added = self.extend_playlist(file_paths)
+        if file_paths and flags.get("play"):
+            self.play_file(file_paths[0])
+        if file_paths:
+            self.status_bar.showMessage(f"Added {added} of {len(file_paths)} files from another launch")
+        if self.isMinimized():
+            self.showNormal()
+        self.raise_()
+        self.activateWindow()
+        
+    def open_paths(self, paths):
+        """Queue media files named on the command line, returns the ones that exist"""
+        file_paths = [os.path.abspath(path) for path in paths if os.path.isfile(path)]
+        missing = len(paths) - len(file_paths)
+        self.extend_playlist(file_paths)
+        if missing:
+            self.status_bar.showMessage(f"{missing} command line path{'s' if missing != 1 else ''} not found")
+        return [path for path in file_paths if self.playlist_model.contains(path)]
         
     def init_ui(self):
         self.setWindowTitle("MediaPlayer - Professional Media Player")
@@ -252,27 +2882,27 @@ class MediaPlayer(QMainWindow):
                 background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
                     stop:0 #0098f4, stop:1 #0078d4);
             }
-            QListWidget {
+            QListView {
                 background-color: #1a1a1a;
                 border: 2px solid #2a2a2a;
                 border-radius: 8px;
                 padding: 5px;
                 outline: none;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 12px;
                 border-bottom: 1px solid #2a2a2a;
                 border-radius: 6px;
                 margin: 3px;
                 background-color: #1a1a1a;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background: qlineargradient(x1:0, y1:0, x2:1, y2:0,
                     stop:0 #0078d4, stop:1 #005a9e);
                 color: #ffffff;
                 border: 2px solid #004578;
             }
-            QListWidget::item:hover {
+            QListView::item:hover {
                 background-color: #2a2a2a;
                 border: 1px solid #3a3a3a;
             }
@@ -407,6 +3037,7 @@ class MediaPlayer(QMainWindow):
         self.video_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
         self.video_widget.setAspectRatioMode(Qt.AspectRatioMode.KeepAspectRatio)
         video_layout.addWidget(self.video_widget)
+        self.subtitle_overlay = SubtitleOverlay(self.video_widget)
         
         splitter.addWidget(video_container)
         
@@ -419,18 +3050,39 @@ class MediaPlayer(QMainWindow):
         playlist_layout.setSpacing(15)
         
         # Search/filter
-        search_box = QLineEdit()
-        search_box.setPlaceholderText("Search playlist...")
-        search_box.textChanged.connect(self.filter_playlist)
-        playlist_layout.addWidget(search_box)
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search playlist...")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.filter_playlist)
+        playlist_layout.addWidget(self.search_box)
+        
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(120)
+        self.search_timer.timeout.connect(self.apply_playlist_filter)
 
         playlist_label = QLabel("📋 Playlist")
         playlist_label.setFont(QFont("Segoe UI", 16, QFont.Weight.Bold))
         playlist_label.setStyleSheet("color: #0078d4; padding: 5px;")
         playlist_layout.addWidget(playlist_label)
         
-        self.playlist_widget = QListWidget()
-        self.playlist_widget.itemDoubleClicked.connect(self.play_selected_item)
+        self.playlist_model = PlaylistModel(self.playlist, self)
+        self.playlist_model.favorites = self.favorites
+        self.playlist_proxy = PlaylistFilterProxy(self)
+        self.playlist_proxy.setSourceModel(self.playlist_model)
+        self.playlist_model.rowsInserted.connect(self.playlist_rows_inserted)
+        self.playlist_model.rowsAboutToBeRemoved.connect(self.playlist_rows_about_to_be_removed)
+        self.playlist_model.rowsRemoved.connect(self.playlist_rows_removed)
+        self.playlist_model.modelAboutToBeReset.connect(self.playlist_about_to_reset)
+        self.playlist_model.modelReset.connect(self.playlist_reset)
+        self.playlist_widget = QListView()
+        self.playlist_widget.setModel(self.playlist_proxy)
+        self.playlist_widget.setUniformItemSizes(True)
+        self.playlist_widget.setLayoutMode(QListView.LayoutMode.Batched)
+        self.playlist_widget.setBatchSize(500)
+        self.playlist_widget.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.playlist_widget.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.playlist_widget.doubleClicked.connect(self.play_selected_item)
         playlist_layout.addWidget(self.playlist_widget)
         
         playlist_buttons = QHBoxLayout()
@@ -491,6 +3143,15 @@ class MediaPlayer(QMainWindow):
         open_folder_action.triggered.connect(self.open_folder)
         file_menu.addAction(open_folder_action)
         
+        self.recent_menu = file_menu.addMenu("Open Recent")
+        self.recent_menu.aboutToShow.connect(self.fill_recent_menu)
+        
+        self.cancel_scan_action = QAction("Cancel Folder Scan", self)
+        self.cancel_scan_action.setShortcut(QKeySequence("Esc"))
+        self.cancel_scan_action.setEnabled(False)
+        self.cancel_scan_action.triggered.connect(self.cancel_folder_scan)
+        file_menu.addAction(self.cancel_scan_action)
+        
         file_menu.addSeparator()
         
         exit_action = QAction("Exit", self)
@@ -521,6 +3182,99 @@ class MediaPlayer(QMainWindow):
         next_action.triggered.connect(self.play_next)
         playback_menu.addAction(next_action)
         
+        play_next_action = QAction("Play Selected Next", self)
+        play_next_action.setShortcut(QKeySequence("Ctrl+Shift+N"))
+        play_next_action.triggered.connect(lambda: self.queue_selected(play_next=True))
+        playback_menu.addAction(play_next_action)
+        
+        enqueue_action = QAction("Add Selected to Queue", self)
+        enqueue_action.setShortcut(QKeySequence("Ctrl+Shift+Q"))
+        enqueue_action.triggered.connect(lambda: self.queue_selected(play_next=False))
+        playback_menu.addAction(enqueue_action)
+        
+        playback_menu.addSeparator()
+        
+        self.gapless_action = QAction("Gapless Playback", self)
+        self.gapless_action.setCheckable(True)
+        self.gapless_action.setChecked(True)
+        self.gapless_action.toggled.connect(self.set_gapless_enabled)
+        playback_menu.addAction(self.gapless_action)
+        
+        crossfade_menu = playback_menu.addMenu("Crossfade")
+        crossfade_group = QActionGroup(self)
+        for seconds in (0, 1, 2, 3, 5, 8):
+            action = QAction("Off" if seconds == 0 else f"{seconds} s", self)
+            action.setCheckable(True)
+            action.setChecked(seconds == 0)
+            action.triggered.connect(lambda checked, ms=seconds * 1000: self.set_crossfade(ms))
+            crossfade_group.addAction(action)
+            crossfade_menu.addAction(action)
+        
+        preload_menu = playback_menu.addMenu("Preload Next Track")
+        preload_group = QActionGroup(self)
+        for seconds in (2, 5, 10, 20):
+            action = QAction(f"{seconds} s", self)
+            action.setCheckable(True)
+            action.setChecked(seconds == GaplessController.PRELOAD_SECONDS)
+            action.triggered.connect(lambda checked, s=seconds: self.set_gapless_preload(s))
+            preload_group.addAction(action)
+            preload_menu.addAction(action)
+        
+        playback_menu.addSeparator()
+        
+        snap_action = QAction("Snap to Keyframes While Seeking", self)
+        snap_action.setCheckable(True)
+        snap_action.setChecked(True)
+        snap_action.toggled.connect(self.set_keyframe_snapping)
+        playback_menu.addAction(snap_action)
+        
+        seek_stats_action = QAction("Seek Statistics", self)
+        seek_stats_action.triggered.connect(self.show_seek_stats)
+        playback_menu.addAction(seek_stats_action)
+        
+        telemetry_action = QAction("Playback Telemetry", self)
+        telemetry_action.triggered.connect(self.show_telemetry)
+        playback_menu.addAction(telemetry_action)
+        
+        export_telemetry_action = QAction("Export Telemetry...", self)
+        export_telemetry_action.triggered.connect(self.export_telemetry)
+        playback_menu.addAction(export_telemetry_action)
+        
+        playback_menu.addSeparator()
+        
+        seamless_ab_action = QAction("Seamless A-B Loop", self)
+        seamless_ab_action.setCheckable(True)
+        seamless_ab_action.setChecked(True)
+        seamless_ab_action.toggled.connect(self.set_ab_seamless)
+        playback_menu.addAction(seamless_ab_action)
+        
+        ab_stats_action = QAction("A-B Loop Statistics", self)
+        ab_stats_action.triggered.connect(self.show_ab_stats)
+        playback_menu.addAction(ab_stats_action)
+        
+        # Library menu
+        library_menu = menubar.addMenu("Library")
+        
+        add_library_folder_action = QAction("Add Folder to Library...", self)
+        add_library_folder_action.triggered.connect(self.add_library_folder)
+        library_menu.addAction(add_library_folder_action)
+        
+        open_library_action = QAction("Open Library", self)
+        open_library_action.setShortcut(QKeySequence("Ctrl+L"))
+        open_library_action.triggered.connect(self.open_library)
+        library_menu.addAction(open_library_action)
+        
+        rescan_library_action = QAction("Rescan Library", self)
+        rescan_library_action.triggered.connect(self.rescan_library)
+        library_menu.addAction(rescan_library_action)
+        
+        library_menu.addSeparator()
+        
+        self.content_dedup_action = QAction("Find Copies by Content", self)
+        self.content_dedup_action.setCheckable(True)
+        self.content_dedup_action.toggled.connect(self.set_content_dedup)
+        library_menu.addAction(self.content_dedup_action)
+        
         # Audio menu
         audio_menu = menubar.addMenu("Audio")
         
@@ -528,6 +3282,22 @@ class MediaPlayer(QMainWindow):
         equalizer_action.triggered.connect(self.show_equalizer)
         audio_menu.addAction(equalizer_action)
         
+        normalization_menu = audio_menu.addMenu("Volume Normalization")
+        normalization_group = QActionGroup(self)
+        self.normalization_actions = {}
+        for mode, label in ((GAIN_OFF, "Off"), (GAIN_TRACK, "Track Gain"), (GAIN_ALBUM, "Album Gain")):
+            action = QAction(label, self)
+            action.setCheckable(True)
+            action.setChecked(mode == GAIN_OFF)
+            action.triggered.connect(lambda checked, mode=mode: self.set_normalization(mode))
+            normalization_group.addAction(action)
+            normalization_menu.addAction(action)
+            self.normalization_actions[mode] = action
+        
+        analyze_loudness_action = QAction("Analyze Playlist Loudness", self)
+        analyze_loudness_action.triggered.connect(self.analyze_playlist_loudness)
+        audio_menu.addAction(analyze_loudness_action)
+        
         # Video menu
         video_menu = menubar.addMenu("Video")
         
@@ -536,6 +3306,43 @@ class MediaPlayer(QMainWindow):
         fullscreen_action.triggered.connect(self.toggle_fullscreen)
         video_menu.addAction(fullscreen_action)
         
+        video_menu.addSeparator()
+        
+        screenshot_action = QAction("Take Screenshot", self)
+        screenshot_action.setShortcut(QKeySequence("Ctrl+Shift+S"))
+        screenshot_action.triggered.connect(self.take_screenshot)
+        video_menu.addAction(screenshot_action)
+        
+        burst_action = QAction("Burst Capture A-B", self)
+        burst_action.setShortcut(QKeySequence("Ctrl+Shift+B"))
+        burst_action.triggered.connect(self.burst_capture)
+        video_menu.addAction(burst_action)
+        
+        burst_menu = video_menu.addMenu("Burst Capture Every")
+        burst_group = QActionGroup(self)
+        for every in (1, 2, 5, 10, 25):
+            action = QAction("Frame" if every == 1 else f"{every} Frames", self)
+            action.setCheckable(True)
+            action.setChecked(every == 1)
+            action.triggered.connect(lambda checked, n=every: setattr(self.frame_capture, "burst_every", n))
+            burst_group.addAction(action)
+            burst_menu.addAction(action)
+        
+        format_menu = video_menu.addMenu("Screenshot Format")
+        format_group = QActionGroup(self)
+        for name in FrameCapture.FORMATS:
+            action = QAction(name, self)
+            action.setCheckable(True)
+            action.setChecked(name == "PNG")
+            action.triggered.connect(lambda checked, n=name: setattr(self.frame_capture, "image_format", n))
+            format_group.addAction(action)
+            format_menu.addAction(action)
+        
+        video_menu.addSeparator()
+        refresh_stats_action = QAction("UI Refresh Statistics", self)
+        refresh_stats_action.triggered.connect(self.show_refresh_stats)
+        video_menu.addAction(refresh_stats_action)
+        
         # Subtitle menu
         subtitle_menu = menubar.addMenu("Subtitle")
         
@@ -543,6 +3350,42 @@ class MediaPlayer(QMainWindow):
         load_subtitle_action.triggered.connect(self.load_subtitle)
         subtitle_menu.addAction(load_subtitle_action)
         
+        clear_subtitle_action = QAction("Disable Subtitles", self)
+        clear_subtitle_action.triggered.connect(self.clear_subtitles)
+        subtitle_menu.addAction(clear_subtitle_action)
+        
+        # Bookmarks menu
+        bookmarks_menu = menubar.addMenu("Bookmarks")
+        
+        add_bookmark_action = QAction("Add Bookmark", self)
+        add_bookmark_action.setShortcut(QKeySequence("Ctrl+B"))
+        add_bookmark_action.triggered.connect(self.add_bookmark)
+        bookmarks_menu.addAction(add_bookmark_action)
+        
+        next_bookmark_action = QAction("Next Bookmark", self)
+        next_bookmark_action.setShortcut(QKeySequence("]"))
+        next_bookmark_action.triggered.connect(self.next_bookmark)
+        bookmarks_menu.addAction(next_bookmark_action)
+        
+        previous_bookmark_action = QAction("Previous Bookmark", self)
+        previous_bookmark_action.setShortcut(QKeySequence("["))
+        previous_bookmark_action.triggered.connect(self.previous_bookmark)
+        bookmarks_menu.addAction(previous_bookmark_action)
+        
+        bookmarks_menu.addSeparator()
+        import_chapters_action = QAction("Import Chapters...", self)
+        import_chapters_action.triggered.connect(self.import_bookmarks)
+        bookmarks_menu.addAction(import_chapters_action)
+        
+        export_bookmarks_action = QAction("Export Bookmarks...", self)
+        export_bookmarks_action.triggered.connect(self.export_bookmarks)
+        bookmarks_menu.addAction(export_bookmarks_action)
+        
+        bookmarks_menu.addSeparator()
+        clear_bookmarks_action = QAction("Clear Bookmarks for This File", self)
+        clear_bookmarks_action.triggered.connect(self.clear_bookmarks)
+        bookmarks_menu.addAction(clear_bookmarks_action)
+        
     def create_toolbar(self):
         toolbar = QToolBar()
         toolbar.setMovable(False)
@@ -654,11 +3497,13 @@ class MediaPlayer(QMainWindow):
         self.repeat_btn = ModernButton("🔁 Repeat")
         self.repeat_btn.setCheckable(True)
         self.repeat_btn.setMinimumWidth(110)
+        self.repeat_btn.clicked.connect(self.cycle_repeat)
         controls_layout.addWidget(self.repeat_btn)
         
         self.shuffle_btn = ModernButton("🔀 Shuffle")
         self.shuffle_btn.setCheckable(True)
         self.shuffle_btn.setMinimumWidth(110)
+        self.shuffle_btn.toggled.connect(self.set_shuffle)
         controls_layout.addWidget(self.shuffle_btn)
         
         control_layout.addLayout(controls_layout)
@@ -680,11 +3525,11 @@ class MediaPlayer(QMainWindow):
         advanced_layout.addWidget(self.ab_clear_btn)
 
         frame_back = ModernButton("⏪ Frame-")
-        frame_back.clicked.connect(lambda: self.frame_step(-50))
+        frame_back.clicked.connect(lambda: self.frame_step(-1))
         advanced_layout.addWidget(frame_back)
 
         frame_forward = ModernButton("⏩ Frame+")
-        frame_forward.clicked.connect(lambda: self.frame_step(50))
+        frame_forward.clicked.connect(lambda: self.frame_step(1))
         advanced_layout.addWidget(frame_forward)
 
         screenshot_btn = ModernButton("📸 Shot")
@@ -695,10 +3540,12 @@ class MediaPlayer(QMainWindow):
         bookmark_btn.clicked.connect(self.add_bookmark)
         advanced_layout.addWidget(bookmark_btn)
 
-        self.bookmark_combo = QComboBox()
+        self.bookmark_combo = LazyComboBox()
         self.bookmark_combo.setMinimumWidth(180)
+        self.bookmark_combo.popup_about_to_show.connect(self.fill_bookmark_combo)
         self.bookmark_combo.currentIndexChanged.connect(self.jump_bookmark)
         advanced_layout.addWidget(self.bookmark_combo)
+        self.reset_bookmark_combo()
 
         control_layout.addLayout(advanced_layout)
         
@@ -713,79 +3560,349 @@ class MediaPlayer(QMainWindow):
         self.media_player = QMediaPlayer()
         self.media_player.setAudioOutput(self.audio_output)
         self.media_player.setVideoOutput(self.video_widget)
+        self.connect_player_signals(self.media_player)
+        
+        # Second player that pre-loads the next track for gapless handoff
+        standby_output = QAudioOutput()
+        standby_output.setVolume(0.0)
+        standby_player = QMediaPlayer()
+        standby_player.setAudioOutput(standby_output)
+        self.gapless = GaplessController(self, standby_player, standby_output)
+        self.gapless.switch_measured.connect(self.report_switch_latency)
+        self.equalizer_engine = EqualizerEngine(self)
+        self.seek_scheduler = SeekScheduler(self)
+        self.ab_loop = ABLoopController(self)
+        self.ab_loop.loop_measured.connect(self.report_loop_jitter)
+        self.thumbnails = ThumbnailGenerator(self, ThumbnailCache(self.data_file_path("thumbnails")))
+        self.seek_preview = SeekPreview(self, self.progress_slider)
+        self.frame_capture = FrameCapture(self)
+        self.frame_capture.frame_saved.connect(self.screenshot_saved)
+        self.frame_capture.burst_finished.connect(self.status_bar.showMessage)
+        self.normalizer = VolumeNormalizer(self, self.data_file_path("loudness.sqlite3"))
+        self.normalizer.measured.connect(self.loudness_measured)
+        
+    def connect_player_signals(self, player):
+        player.positionChanged.connect(self.position_changed)
+        player.durationChanged.connect(self.duration_changed)
+        player.playbackStateChanged.connect(self.playback_state_changed)
+        player.errorOccurred.connect(self.handle_error)
+        player.mediaStatusChanged.connect(self.media_status_changed)
+        
+    def disconnect_player_signals(self, player):
+        player.positionChanged.disconnect(self.position_changed)
+        player.durationChanged.disconnect(self.duration_changed)
+        player.playbackStateChanged.disconnect(self.playback_state_changed)
+        player.errorOccurred.disconnect(self.handle_error)
+        player.mediaStatusChanged.disconnect(self.media_status_changed)
         
-        # Connect signals
-        self.media_player.positionChanged.connect(self.position_changed)
-        self.media_player.durationChanged.connect(self.duration_changed)
-        self.media_player.playbackStateChanged.connect(self.playback_state_changed)
-        self.media_player.errorOccurred.connect(self.handle_error)
-        self.media_player.mediaStatusChanged.connect(self.media_status_changed)
+    def swap_player(self, player, output, index, same_media=False):
+        """Make an already playing standby player the active one"""
+        old_player = self.media_player
+        if not same_media:
+            # The outgoing track played to its end
+            self.session.set_resume(self.current_path(), None)
+        self.disconnect_player_signals(old_player)
+        old_player.setVideoOutput(None)
+        player.setVideoOutput(self.video_widget)
+        self.media_player = player
+        self.audio_output = output
+        self.connect_player_signals(player)
+        self.telemetry.player_swapped()
+        self.equalizer_engine.wake()
+        self.play_queue.start(index)
+        self.current_media_url = player.source()
+        self.seek_scheduler.reset()
+        if not same_media:
+            self.remember_current(player.source().toLocalFile())
+            self.normalizer.track_changed(player.source().toLocalFile())
+            self.reset_ab_loop()
+            self.load_frame_index(player.source().toLocalFile())
+            self.load_bookmarks(player.source().toLocalFile())
+            self.thumbnails.load(player.source().toLocalFile())
+            self.update_playlist_selection()
+            self.duration_changed(player.duration())
+        self.play_btn.setText("⏸ Pause")
+        self.ui_refresh.set_playing(True)
+        
+    def set_gapless_enabled(self, enabled):
+        self.gapless.enabled = enabled
+        if not enabled:
+            self.gapless.disarm()
             
-    def setup_timer(self):
-        self.timer = QTimer()
-        self.timer.setInterval(50)
-        self.timer.timeout.connect(self.update_ui)
-        self.timer.start()
+    def set_normalization(self, mode):
+        self.normalizer.set_mode(mode)
+        self.normalizer.track_changed(self.current_path())
+        self.apply_volume()
+        self.session.set("normalization", mode)
+        self.status_bar.showMessage("Volume normalization off" if mode == GAIN_OFF
+                                    else f"Volume normalization: {mode} gain")
+        
+    def analyze_playlist_loudness(self):
+        self.normalizer.request(self.playlist, VolumeNormalizer.BACKGROUND)
+        self.status_bar.showMessage(f"Measuring loudness of {len(self.normalizer.pending)} files")
+        
+    def loudness_measured(self, file_path):
+        # A new measurement can complete the album of the playing track
+        self.apply_volume()
+        if file_path != self.current_path():
+            return
+        result = self.normalizer.results[file_path]
+        if result is None or result.integrated is None:
+            self.status_bar.showMessage(f"No loudness measured for {os.path.basename(file_path)}")
+            return
+        gain_db = self.normalizer.gain_db(file_path)
+        peak = f", peak {result.true_peak:.1f} dBTP" if result.true_peak is not None else ""
+        gain = f", gain {gain_db:+.1f} dB" if gain_db is not None else ""
+        self.status_bar.showMessage(f"Loudness: {result.integrated:.1f} LUFS{peak}{gain}")
         
+    def set_crossfade(self, milliseconds):
+        self.gapless.crossfade_ms = milliseconds
+        self.status_bar.showMessage(f"Crossfade: {milliseconds // 1000} s" if milliseconds else "Crossfade off")
+        
+    def set_gapless_preload(self, seconds):
+        self.gapless.preload_seconds = seconds
+        self.status_bar.showMessage(f"Next track preloads {seconds} s before the switch")
+        
+    def report_switch_latency(self, latency_ms, gap_ms):
+        self.telemetry.track_switched(latency_ms)
+        latencies = sorted(self.gapless.latencies)
+        median = latencies[len(latencies) // 2]
+        self.status_bar.showMessage(f"Track switch: {latency_ms:.0f} ms to first frame, "
+                                    f"audible gap {max(0.0, gap_ms):.0f} ms (median {max(0.0, median):.0f} ms)")
+            
     def open_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self, "Open Media File", "",
-            "Media Files (*.mp4 *.avi *.mkv *.mov *.wmv *.flv *.webm *.mp3 *.wav *.flac *.ogg *.m4a *.aac);;All Files (*)"
+            media_file_filter()
         )
         if file_path:
             self.add_to_playlist(file_path)
             self.play_file(file_path)
-            
+        
+    def fill_recent_menu(self):
+        self.recent_menu.clear()
+        for file_path in self.recent_files:
+            action = self.recent_menu.addAction(os.path.basename(file_path))
+            action.setToolTip(file_path)
+            action.triggered.connect(lambda checked=False, path=file_path: self.open_recent(path))
+        if not self.recent_files:
+            self.recent_menu.addAction("No recent files").setEnabled(False)
+        
+    def open_recent(self, file_path):
+        if not os.path.isfile(file_path):
+            self.status_bar.showMessage(f"File not found: {file_path}")
+            return
+        self.add_to_playlist(file_path)
+        self.play_file(file_path)
+        
     def open_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Open Folder")
         if folder_path:
-            media_extensions = ['.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm',
-                              '.mp3', '.wav', '.flac', '.ogg', '.m4a', '.aac']
-            count = 0
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    if any(file.lower().endswith(ext) for ext in media_extensions):
-                        file_path = os.path.join(root, file)
-                        self.add_to_playlist(file_path)
-                        count += 1
-            if count > 0:
-                self.status_bar.showMessage(f"Added {count} media files to playlist")
-                if self.playlist:
-                    self.play_file(self.playlist[0])
-            else:
-                self.status_bar.showMessage("No media files found in selected folder")
+            self.start_folder_scan(folder_path)
+            
+    def start_folder_scan(self, folder_path):
+        self.cancel_folder_scan()
+        self.folder_scanner = FolderScanner(folder_path, self)
+        self.folder_scanner.files_found.connect(self.folder_scan_batch)
+        self.folder_scanner.progress.connect(self.folder_scan_progress)
+        self.folder_scanner.scan_finished.connect(self.folder_scan_finished)
+        self.folder_scanner.finished.connect(self.folder_scanner.deleteLater)
+        self.cancel_scan_action.setEnabled(True)
+        self.status_bar.showMessage(f"Scanning {folder_path}...")
+        self.folder_scanner.start()
+        
+    def cancel_folder_scan(self):
+        if self.folder_scanner is not None and self.folder_scanner.isRunning():
+            self.folder_scanner.cancel()
+            
+    def folder_scan_batch(self, file_paths):
+        if self.sender() is not self.folder_scanner:
+            return
+        first_new = len(self.playlist)
+        added = self.extend_playlist(file_paths)
+        if added and self.current_media_url is None:
+            self.play_file(self.playlist[first_new], first_new)
+            
+    def folder_scan_progress(self, dirs_scanned, files_found):
+        if self.sender() is self.folder_scanner:
+            self.status_bar.showMessage(f"Scanning... {dirs_scanned} folders, {files_found} media files found")
+            
+    def folder_scan_finished(self, count, cancelled):
+        if self.sender() is not self.folder_scanner:
+            return
+        self.folder_scanner = None
+        self.cancel_scan_action.setEnabled(False)
+        if cancelled:
+            self.status_bar.showMessage(f"Scan cancelled - added {count} media files to playlist")
+        elif count > 0:
+            self.status_bar.showMessage(f"Added {count} media files to playlist")
+        else:
+            self.status_bar.showMessage("No media files found in selected folder")
                 
+    def data_file_path(self, name):
+        data_dir = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
+        os.makedirs(data_dir, exist_ok=True)
+        return os.path.join(data_dir, name)
+        
+    def add_library_folder(self):
+        folder_path = QFileDialog.getExistingDirectory(self, "Add Folder to Library")
+        if folder_path:
+            self.start_library_scan(new_root=folder_path)
+            
+    def open_library(self):
+        self.start_library_scan()
+        
+    def rescan_library(self):
+        self.start_library_scan(load_existing=False)
+        
+    def start_library_scan(self, new_root=None, load_existing=True):
+        if self.library_scanner is not None and self.library_scanner.isRunning():
+            self.status_bar.showMessage("Library scan already in progress")
+            return
+        self.library_scanner = LibraryScanner(self.data_file_path("library.sqlite3"),
+                                              new_root, load_existing, self)
+        self.library_scanner.files_loaded.connect(self.library_files_loaded)
+        self.library_scanner.library_delta.connect(self.library_delta_received)
+        self.library_scanner.scan_finished.connect(self.library_scan_finished)
+        self.library_scanner.finished.connect(self.library_scanner.deleteLater)
+        self.status_bar.showMessage("Updating library...")
+        self.library_scanner.start()
+        
+    def library_files_loaded(self, file_paths):
+        first_new = len(self.playlist)
+        added = self.extend_playlist(file_paths)
+        if added and self.current_media_url is None:
+            self.play_file(self.playlist[first_new], first_new)
+            
+    def library_delta_received(self, added, removed):
+        self.library_files_loaded(added)
+        if removed:
+            self.remove_from_playlist(removed)
+            
+    def library_scan_finished(self, added, removed, cancelled):
+        self.library_scanner = None
+        state = "cancelled" if cancelled else "updated"
+        self.status_bar.showMessage(f"Library {state}: {added} new, {removed} removed, "
+                                    f"{len(self.playlist)} in playlist")
+        
     def add_files(self):
         file_paths, _ = QFileDialog.getOpenFileNames(
             self, "Add Media Files", "",
-            "Media Files (*.mp4 *.avi *.mkv *.mov *.wmv *.flv *.webm *.mp3 *.wav *.flac *.ogg *.m4a *.aac);;All Files (*)"
+            media_file_filter()
         )
         if file_paths:
-            for file_path in file_paths:
-                self.add_to_playlist(file_path)
+            self.extend_playlist(file_paths)
             self.status_bar.showMessage(f"Added {len(file_paths)} file(s) to playlist")
             if self.playlist and not self.media_player.source():
-                self.play_file(self.playlist[0])
+                self.play_file(self.playlist[0], 0)
             
     def add_to_playlist(self, file_path):
-        if file_path not in self.playlist:
-            self.playlist.append(file_path)
-            item = QListWidgetItem(os.path.basename(file_path))
-            item.setData(Qt.ItemDataRole.UserRole, file_path)
-            self.playlist_widget.addItem(item)
+        self.extend_playlist([file_path])
+
+    def extend_playlist(self, file_paths, journal=True):
+        added = self.playlist_model.append_paths(file_paths)
+        if added:
+            new_paths = self.playlist[-added:]
+            if journal:
+                self.session.playlist_added(new_paths)
+            self.probe_metadata(new_paths)
+            self.detect_duplicates(new_paths)
+        return added
+        
+    def probe_metadata(self, file_paths):
+        if self.metadata_prober is None:
+            self.metadata_prober = MetadataProber(self.data_file_path("probe_cache.sqlite3"), self)
+            self.metadata_prober.metadata_ready.connect(self.playlist_model.update_metadata)
+            self.metadata_prober.start()
+        self.metadata_prober.enqueue(file_paths)
+        
+    def detect_duplicates(self, file_paths):
+        if self.duplicate_detector is None:
+            self.duplicate_detector = DuplicateDetector(self)
+            self.duplicate_detector.duplicates_found.connect(self.remove_duplicates)
+            self.duplicate_detector.set_fingerprints(self.content_dedup_action.isChecked())
+            self.duplicate_detector.start()
+        self.duplicate_detector.add(file_paths)
+        
+    def remove_duplicates(self, pairs):
+        """Drop entries found to be another listed file, pairs are (duplicate, original)"""
+        # The playing entry stays, the user picked that name
+        current = self.current_path()
+        pairs = [(path, original) for path, original in pairs if path != current]
+        removed = self.remove_from_playlist([path for path, _original in pairs])
+        if removed:
+            path, original = pairs[0]
+            self.status_bar.showMessage(f"Removed {removed} duplicate{'s' if removed != 1 else ''} from the playlist "
+                                        f"({os.path.basename(path)} is {original})")
+        
+    def set_content_dedup(self, enabled):
+        if self.duplicate_detector is not None:
+            self.duplicate_detector.set_fingerprints(enabled)
+        self.session.set("dedup_content", enabled)
+        
+    def remove_from_playlist(self, file_paths):
+        removed = self.playlist_model.remove_paths(file_paths)
+        if removed and self.current_index >= 0:
+            self.update_playlist_selection()
+        return removed
+        
+    def playlist_rows_inserted(self, parent, first, last):
+        self.play_queue.insert_range(first, last)
+        
+    def playlist_rows_about_to_be_removed(self, parent, first, last):
+        file_paths = self.playlist[first:last + 1]
+        self.session.playlist_removed(file_paths)
+        if self.duplicate_detector is not None:
+            self.duplicate_detector.forget(file_paths)
+        
+    def playlist_rows_removed(self, parent, first, last):
+        self.play_queue.remove_range(first, last)
+        
+    def playlist_about_to_reset(self):
+        self.reset_current_path = self.path_at(self.current_index)
+        
+    def playlist_reset(self):
+        # Queue and history do not survive a reset, the playing track keeps its place
+        self.play_queue.reset(len(self.playlist))
+        if self.reset_current_path is not None and self.playlist_model.contains(self.reset_current_path):
+            self.play_queue.start(self.playlist.index(self.reset_current_path))
+        self.reset_current_path = None
+        self.session.playlist_replaced(self.playlist)
+        if self.duplicate_detector is not None:
+            self.duplicate_detector.retain(self.playlist)
             
-    def play_file(self, file_path):
+    def play_file(self, file_path, index=None):
         try:
             url = QUrl.fromLocalFile(file_path)
+            # The track being left keeps its place for next time
+            self.save_position()
+            self.remember_current(file_path)
+            self.gapless.disarm()
+            self.gapless.begin_switch_measure(self.media_player)
+            self.seek_scheduler.reset()
+            self.reset_ab_loop()
+            self.telemetry.source_set()
             self.media_player.setSource(url)
+            self.load_frame_index(file_path)
+            self.load_bookmarks(file_path)
+            self.thumbnails.load(file_path)
             self.current_media_url = url
-            self.current_index = self.playlist.index(file_path) if file_path in self.playlist else -1
+            if index is None:
+                index = self.playlist.index(file_path) if self.playlist_model.contains(file_path) else -1
+            self.play_queue.start(index)
+            self.normalizer.track_changed(file_path)
+            self.apply_volume()
             self.update_playlist_selection()
             self.status_bar.showMessage(f"Loading: {os.path.basename(file_path)}")
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Failed to load file: {str(e)}")
             self.status_bar.showMessage(f"Error loading file: {str(e)}")
         
+    def remember_current(self, file_path):
+        self.session.set("current", file_path)
+        self.session.add_recent(file_path)
+        self.recent_files = self.session.recent
+        
     def toggle_play_pause(self):
         if self.media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState:
             self.media_player.pause()
@@ -793,77 +3910,214 @@ class MediaPlayer(QMainWindow):
         else:
             if not self.media_player.source():
                 if self.playlist:
-                    self.play_file(self.playlist[0])
+                    self.play_file(self.playlist[0], 0)
             self.media_player.play()
             self.play_btn.setText("⏸ Pause")
             
     def stop(self):
+        self.gapless.disarm()
         self.media_player.stop()
         self.play_btn.setText("▶ Play")
         self.progress_slider.setValue(0)
         self.time_label.setText("00:00")
+        self.ui_refresh.invalidate()
         self.status_bar.showMessage("Stopped")
         
+    @property
+    def current_index(self):
+        """Playlist row of the playing track, -1 when it is not in the playlist"""
+        return self.play_queue.current
+        
     def play_previous(self):
-        if self.playlist and self.current_index > 0:
-            self.current_index -= 1
-            self.play_file(self.playlist[self.current_index])
-        elif self.playlist and self.repeat_btn.isChecked():
-            self.current_index = len(self.playlist) - 1
-            self.play_file(self.playlist[self.current_index])
-            
-    def play_next(self):
-        if self.playlist and self.current_index < len(self.playlist) - 1:
-            self.current_index += 1
-            self.play_file(self.playlist[self.current_index])
-        elif self.playlist and self.repeat_btn.isChecked():
-            self.current_index = 0
-            self.play_file(self.playlist[self.current_index])
+        index = self.play_queue.previous()
+        if index is not None:
+            self.play_file(self.playlist[index], index)
+            
+    def peek_next_index(self):
+        """Index the end of the current track moves to, None when playback stops there"""
+        return self.play_queue.peek_next(auto=True)
+        
+    def path_at(self, index):
+        return self.playlist_model.path_at(index) if index is not None else None
+        
+    def play_next(self, auto=False):
+        index = self.play_queue.next(auto)
+        if index is not None:
+            self.play_file(self.playlist[index], index)
         elif self.playlist:
             self.stop()
             
-    def play_selected_item(self, item):
-        file_path = item.data(Qt.ItemDataRole.UserRole)
+    def set_shuffle(self, enabled):
+        self.play_queue.set_shuffle(enabled)
+        # The armed track was picked in the old order
+        self.gapless.disarm()
+        self.session.set("shuffle", enabled)
+        self.status_bar.showMessage("Shuffle on" if enabled else "Shuffle off")
+        
+    def cycle_repeat(self):
+        mode = self.play_queue.cycle_repeat()
+        self.set_repeat_mode(mode)
+        self.status_bar.showMessage(f"Repeat: {mode}")
+        
+    def set_repeat_mode(self, mode):
+        self.play_queue.set_repeat(mode)
+        labels = {REPEAT_OFF: "🔁 Repeat", REPEAT_ALL: "🔁 Repeat All", REPEAT_ONE: "🔂 Repeat One"}
+        self.repeat_btn.setText(labels[mode])
+        self.repeat_btn.setChecked(mode != REPEAT_OFF)
+        self.gapless.disarm()
+        self.session.set("repeat", mode)
+        
+    def queue_selected(self, play_next):
+        current = self.playlist_proxy.mapToSource(self.playlist_widget.currentIndex())
+        if not current.isValid():
+            return
+        if play_next:
+            self.play_queue.queue_next([current.row()])
+        else:
+            self.play_queue.enqueue([current.row()])
+        self.gapless.disarm()
+        queued = len(self.play_queue.up_next)
+        self.status_bar.showMessage(f"Queued: {os.path.basename(self.playlist[current.row()])} ({queued} in queue)")
+            
+    def filter_playlist(self, text):
+        # Restart the debounce window, the search itself runs once typing pauses
+        self.search_timer.start()
+        
+    def apply_playlist_filter(self):
+        query = self.search_box.text()
+        start = time.perf_counter()
+        shown = self.playlist_proxy.set_filter(query)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if query.strip():
+            self.status_bar.showMessage(f"{shown} of {len(self.playlist)} tracks match \"{query}\" "
+                                        f"({elapsed_ms:.1f} ms)")
+        self.update_playlist_selection()
+        
+    def play_selected_item(self, model_index):
+        source_index = self.playlist_proxy.mapToSource(model_index)
+        file_path = source_index.data(Qt.ItemDataRole.UserRole)
         if file_path:
-            self.current_index = self.playlist.index(file_path)
-            self.play_file(file_path)
+            self.play_file(file_path, source_index.row())
+            
+    def save_playlist(self):
+        if not self.playlist:
+            self.status_bar.showMessage("Playlist is empty - nothing to save")
+            return
+        if self.playlist_saver is not None:
+            self.status_bar.showMessage("Playlist save already in progress")
+            return
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Save Playlist", "playlist.m3u8", playlist_file_filter()
+        )
+        if not file_path:
+            return
+        if not os.path.splitext(file_path)[1]:
+            if "PLS" in selected_filter:
+                file_path += ".pls"
+            elif "XSPF" in selected_filter:
+                file_path += ".xspf"
+            else:
+                file_path += ".m3u8"
+        # A shallow copy keeps the writer consistent while the playlist keeps changing
+        self.playlist_saver = PlaylistSaver(file_path, list(self.playlist), self)
+        self.playlist_saver.save_finished.connect(self.playlist_save_finished)
+        self.playlist_saver.finished.connect(self.playlist_saver.deleteLater)
+        self.status_bar.showMessage(f"Saving playlist to {os.path.basename(file_path)}...")
+        self.playlist_saver.start()
+        
+    def playlist_save_finished(self, count, error):
+        file_path = self.playlist_saver.file_path
+        self.playlist_saver = None
+        if error:
+            QMessageBox.warning(self, "Save Playlist", f"Failed to save playlist: {error}")
+            self.status_bar.showMessage(f"Error saving playlist: {error}")
+        else:
+            self.status_bar.showMessage(f"Saved {count} entries to {os.path.basename(file_path)}")
+            
+    def load_playlist(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Load Playlist", "", playlist_file_filter()
+        )
+        if file_path:
+            self.start_playlist_load(file_path)
+            
+    def start_playlist_load(self, file_path):
+        if self.playlist_loader is not None:
+            self.playlist_loader.cancel()
+        self.playlist_loader = PlaylistLoader(file_path, self)
+        self.playlist_loader.entries_loaded.connect(self.playlist_entries_loaded)
+        self.playlist_loader.load_finished.connect(self.playlist_load_finished)
+        self.playlist_loader.finished.connect(self.playlist_loader.deleteLater)
+        self.status_bar.showMessage(f"Loading playlist {os.path.basename(file_path)}...")
+        self.playlist_loader.start()
+        
+    def playlist_entries_loaded(self, file_paths):
+        if self.sender() is not self.playlist_loader:
+            return
+        first_new = len(self.playlist)
+        added = self.extend_playlist(file_paths)
+        if added and self.current_media_url is None:
+            self.play_file(self.playlist[first_new], first_new)
+        self.status_bar.showMessage(f"Loading playlist... {len(self.playlist)} entries")
+            
+    def playlist_load_finished(self, count, error):
+        if self.sender() is not self.playlist_loader:
+            return
+        file_path = self.playlist_loader.file_path
+        self.playlist_loader = None
+        if error:
+            QMessageBox.warning(self, "Load Playlist", f"Failed to load playlist: {error}")
+            self.status_bar.showMessage(f"Error loading playlist: {error}")
+        else:
+            self.status_bar.showMessage(f"Loaded {count} entries from {os.path.basename(file_path)}")
             
     def remove_selected(self):
-        current_item = self.playlist_widget.currentItem()
-        if current_item:
-            file_path = current_item.data(Qt.ItemDataRole.UserRole)
-            if file_path in self.playlist:
-                index = self.playlist.index(file_path)
-                self.playlist.remove(file_path)
-                self.playlist_widget.takeItem(self.playlist_widget.row(current_item))
-                if index == self.current_index:
-                    if self.playlist:
-                        self.current_index = min(index, len(self.playlist) - 1)
-                        if self.current_index >= 0:
-                            self.play_file(self.playlist[self.current_index])
-                    else:
-                        self.stop()
-                elif index < self.current_index:
-                    self.current_index -= 1
+        current = self.playlist_proxy.mapToSource(self.playlist_widget.currentIndex())
+        if current.isValid():
+            index = current.row()
+            was_current = index == self.current_index
+            if self.playlist_model.remove_row(index) is not None and was_current:
+                # The play queue moved on to the track that took its place
+                if self.playlist:
+                    self.play_next()
+                else:
+                    self.stop()
                         
     def clear_playlist(self):
         reply = QMessageBox.question(self, "Clear Playlist", 
                                     "Are you sure you want to clear the playlist?",
                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
-            self.playlist.clear()
-            self.playlist_widget.clear()
+            if self.session_loader is not None:
+                # Entries still on their way from the last session would refill the list
+                self.session_loader.cancel()
+                self.session_loader = None
+            self.playlist_model.clear()
             self.stop()
             self.status_bar.showMessage("Playlist cleared")
         
     def set_volume(self, value):
-        self.audio_output.setVolume(value / 100.0)
+        self.apply_volume()
         self.volume_label.setText(f"{value}%")
+        self.session.set("volume", value)
+        
+    def output_volume(self, file_path=None):
+        """Slider volume with the normalization gain of file_path, the current track by default"""
+        if file_path is None:
+            file_path = self.current_path()
+        # Gains above unity only use the headroom the slider leaves
+        return min(1.0, self.volume_slider.value() / 100.0 * self.normalizer.gain(file_path))
+        
+    def apply_volume(self):
+        self.gapless.set_volume(self.output_volume())
         
     def set_speed(self, index):
         speeds = [0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0]
         if index < len(speeds):
             self.media_player.setPlaybackRate(speeds[index])
+            self.gapless.standby_player.setPlaybackRate(speeds[index])
+            self.equalizer_engine.wake()
+            self.session.set("speed", index)
             self.status_bar.showMessage(f"Playback speed: {speeds[index]}x")
             
     def seek_pressed(self):
@@ -874,62 +4128,336 @@ class MediaPlayer(QMainWindow):
         position = self.progress_slider.value() / 10000.0
         duration = self.media_player.duration()
         if duration > 0:
-            self.media_player.setPosition(int(position * duration))
+            self.seek_scheduler.request(int(position * duration), exact=True)
         
     def seek_changed(self, value):
         if self.is_seeking:
             position = value / 10000.0
             duration = self.media_player.duration()
             if duration > 0:
-                self.media_player.setPosition(int(position * duration))
+                self.seek_scheduler.request(int(position * duration), exact=False)
                 
     def position_changed(self, position):
-        if not self.is_seeking:
-            duration = self.media_player.duration()
-            if duration > 0:
-                progress = position / duration
-                self.progress_slider.setValue(int(progress * 10000))
-                self.time_label.setText(self.format_time(position // 1000))
+        self.telemetry.position_changed(position)
+        self.ab_loop.position_changed(position)
+        self.seek_scheduler.position_changed(position)
+        self.ui_refresh.position_changed(position)
+        self.gapless.position_changed(position)
                 
     def duration_changed(self, duration):
+        self.telemetry.duration_changed(duration)
         if duration > 0:
             self.duration_label.setText(self.format_time(duration // 1000))
             self.status_bar.showMessage(f"Playing: {os.path.basename(self.playlist[self.current_index]) if self.current_index >= 0 and self.current_index < len(self.playlist) else 'Media'}")
             
     def playback_state_changed(self, state):
+        self.telemetry.playback_state_changed(state)
+        self.equalizer_engine.wake()
+        self.ui_refresh.set_playing(state == QMediaPlayer.PlaybackState.PlayingState)
         if state == QMediaPlayer.PlaybackState.PlayingState:
             self.play_btn.setText("⏸ Pause")
         elif state == QMediaPlayer.PlaybackState.PausedState:
             self.play_btn.setText("▶ Play")
         elif state == QMediaPlayer.PlaybackState.StoppedState:
             self.play_btn.setText("▶ Play")
-            # Auto-play next
-            if self.playlist and self.current_index >= 0 and self.current_index < len(self.playlist) - 1:
-                self.play_next()
-            elif self.playlist and self.repeat_btn.isChecked() and len(self.playlist) > 0:
-                self.current_index = 0
-                self.play_file(self.playlist[0])
+            # Only a track that played to its end moves on, not the stop button
+            if self.media_player.mediaStatus() == QMediaPlayer.MediaStatus.EndOfMedia:
+                self.session.set_resume(self.current_path(), None)
+                self.play_next(auto=True)
                 
     def media_status_changed(self, status):
+        self.telemetry.media_status_changed(status)
         if status == QMediaPlayer.MediaStatus.LoadedMedia:
-            self.media_player.play()
+            if self.apply_resume():
+                # A restored session waits on its old frame until play is pressed
+                self.media_player.pause()
+            else:
+                self.media_player.play()
                 
     def handle_error(self, error, error_string):
+        self.telemetry.error(error)
         error_msg = error_string if error_string else "Unknown error occurred"
         QMessageBox.warning(self, "Playback Error", f"Error: {error_msg}\n\nMake sure the file format is supported and codecs are installed.")
         self.status_bar.showMessage(f"Error: {error_msg}")
         
-    def update_ui(self):
-        # UI updates are handled by signals now
-        pass
-                
     def format_time(self, seconds):
-        hours = seconds // 3600
-        minutes = (seconds % 3600) // 60
-        secs = seconds % 60
-        if hours > 0:
-            return f"{hours:02d}:{minutes:02d}:{secs:02d}"
-        return f"{minutes:02d}:{secs:02d}"
+        return format_time(seconds)
+        
+    def load_frame_index(self, file_path):
+        self.frame_index = None
+        self.seek_scheduler.set_keyframes(None)
+        self.frame_index_loader = FrameIndexLoader(file_path, self.data_file_path("frame_index"), self)
+        self.frame_index_loader.index_loaded.connect(self.frame_index_loaded)
+        self.frame_index_loader.finished.connect(self.frame_index_loader.deleteLater)
+        self.frame_index_loader.start()
+        
+    def frame_index_loaded(self, file_path, index):
+        if self.sender() is self.frame_index_loader and index is not None:
+            self.frame_index = index
+            self.seek_scheduler.set_keyframes(index.keyframe_positions())
+            
+    def load_bookmarks(self, file_path):
+        self.bookmarks = BookmarkIndex()
+        self.bookmark_key = None
+        self.reset_bookmark_combo()
+        self.bookmark_loader = BookmarkLoader(file_path, self.data_file_path("bookmarks.sqlite3"), self)
+        self.bookmark_loader.bookmarks_loaded.connect(self.bookmarks_loaded)
+        self.bookmark_loader.finished.connect(self.bookmark_loader.deleteLater)
+        self.bookmark_loader.start()
+        
+    def bookmarks_loaded(self, file_path, key, index):
+        if self.sender() is self.bookmark_loader and key:
+            self.bookmark_key = key
+            self.bookmarks = index
+            self.reset_bookmark_combo()
+            
+    def reset_bookmark_combo(self):
+        """Show only a summary item, the full list is built when the popup opens"""
+        combo = self.bookmark_combo
+        combo.blockSignals(True)
+        combo.clear()
+        count = len(self.bookmarks)
+        combo.addItem(f"🔖 {count} bookmark{'s' if count != 1 else ''}", None)
+        combo.blockSignals(False)
+        self.bookmark_combo_filled = False
+        
+    def fill_bookmark_combo(self):
+        if self.bookmark_combo_filled:
+            return
+        combo = self.bookmark_combo
+        combo.blockSignals(True)
+        for mark in self.bookmarks:
+            combo.addItem(f"{self.format_time(mark.position // 1000)}  {mark.label}", mark.position)
+        combo.blockSignals(False)
+        self.bookmark_combo_filled = True
+        
+    def add_bookmark(self):
+        if self.media_player.source().isEmpty():
+            return
+        if self.bookmark_key is None:
+            self.status_bar.showMessage("Bookmarks are still loading for this file")
+            return
+        position = self.media_player.position()
+        label = f"Bookmark {len(self.bookmarks) + 1}"
+        self.bookmarks.add(position, label)
+        self.bookmark_store.add(self.bookmark_key, position, label)
+        self.reset_bookmark_combo()
+        self.status_bar.showMessage(f"Bookmark added at {self.format_time(position // 1000)}")
+        
+    def jump_bookmark(self, index):
+        position = self.bookmark_combo.itemData(index)
+        if position is not None:
+            self.seek_scheduler.request(position, exact=True)
+            
+    def next_bookmark(self):
+        mark = self.bookmarks.next_after(self.media_player.position())
+        if mark is None:
+            self.status_bar.showMessage("No later bookmark")
+            return
+        self.seek_scheduler.request(mark.position, exact=True)
+        self.status_bar.showMessage(f"Bookmark: {mark.label}")
+        
+    def previous_bookmark(self):
+        # Within a second of a mark, stepping back skips past it like a CD player
+        mark = self.bookmarks.previous_before(self.media_player.position() - 1000)
+        if mark is None:
+            self.status_bar.showMessage("No earlier bookmark")
+            return
+        self.seek_scheduler.request(mark.position, exact=True)
+        self.status_bar.showMessage(f"Bookmark: {mark.label}")
+        
+    def import_bookmarks(self):
+        if self.bookmark_key is None:
+            self.status_bar.showMessage("Open a file before importing chapters")
+            return
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Import Chapters", "",
+            "Chapter Lists (*.txt *.chapters);;All Files (*)"
+        )
+        if not file_path:
+            return
+        try:
+            marks = read_chapters(file_path)
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Failed to import chapters: {str(e)}")
+            return
+        self.bookmark_store.add_many(self.bookmark_key, marks)
+        for mark in marks:
+            self.bookmarks.add(mark.position, mark.label)
+        self.reset_bookmark_combo()
+        self.status_bar.showMessage(f"Imported {len(marks)} chapters")
+        
+    def export_bookmarks(self):
+        if not self.bookmarks:
+            self.status_bar.showMessage("No bookmarks to export")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Export Bookmarks", "chapters.txt",
+            "Chapter Lists (*.txt *.chapters);;All Files (*)"
+        )
+        if not file_path:
+            return
+        try:
+            count = write_chapters(file_path, self.bookmarks)
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Failed to export bookmarks: {str(e)}")
+            return
+        self.status_bar.showMessage(f"Exported {count} bookmarks to {os.path.basename(file_path)}")
+        
+    def clear_bookmarks(self):
+        if self.bookmark_key is None:
+            return
+        self.bookmark_store.clear(self.bookmark_key)
+        self.bookmarks = BookmarkIndex()
+        self.reset_bookmark_combo()
+        self.status_bar.showMessage("Bookmarks cleared")
+        
+    def frame_step(self, frames):
+        if self.media_player.source().isEmpty():
+            return
+        if self.media_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState:
+            self.media_player.pause()
+        scheduler = self.seek_scheduler
+        # Repeated presses build on the target that is still being sought
+        base = scheduler.pending if scheduler.pending is not None else scheduler.in_flight
+        if base is None:
+            base = self.media_player.position()
+        if self.frame_index is not None:
+            target = self.frame_index.step(base, frames)
+            if target is None:
+                self.status_bar.showMessage("No more frames")
+                return
+        else:
+            # Without an index for this container assume 25 fps
+            target = max(0, base + frames * 40)
+        scheduler.request(target, exact=True)
+        self.status_bar.showMessage(f"Frame at {format_time(target // 1000)}.{target % 1000:03d}")
+            
+    def set_keyframe_snapping(self, enabled):
+        self.seek_scheduler.snap_to_keyframes = enabled
+        
+    def show_seek_stats(self):
+        self.status_bar.showMessage(self.seek_scheduler.stats_text())
+        
+    def show_telemetry(self):
+        self.status_bar.showMessage(self.telemetry.summary_text())
+        
+    def export_telemetry(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Export Telemetry", "telemetry.jsonl",
+            "JSON Lines (*.jsonl);;Prometheus Text (*.prom *.txt)"
+        )
+        if not file_path:
+            return
+        try:
+            if os.path.splitext(file_path)[1].lower() in (".prom", ".txt"):
+                with open(file_path, 'w', encoding='utf-8') as f:
+                    f.write(self.telemetry.prometheus_text())
+            else:
+                # JSON lines accumulate, one snapshot per export
+                with open(file_path, 'a', encoding='utf-8') as f:
+                    f.write(self.telemetry.json_line())
+        except OSError as e:
+            QMessageBox.warning(self, "Export Telemetry", f"Failed to export telemetry: {e}")
+            return
+        self.status_bar.showMessage(f"Telemetry exported to {os.path.basename(file_path)}")
+        
+    def set_ab_start(self):
+        if self.media_player.source().isEmpty():
+            return
+        self.ab_start = self.media_player.position()
+        if self.ab_end is not None and self.ab_end < self.ab_start + ABLoopController.MIN_LOOP_MS:
+            self.ab_end = None
+        self.ab_loop.set_points()
+        self.update_ab_buttons()
+        self.save_ab_points()
+        self.status_bar.showMessage(f"A-B loop start: {self.format_time(self.ab_start // 1000)}")
+        
+    def set_ab_end(self):
+        if self.ab_start is None:
+            self.status_bar.showMessage("Set point A first")
+            return
+        position = self.media_player.position()
+        if position < self.ab_start + ABLoopController.MIN_LOOP_MS:
+            self.status_bar.showMessage("Point B must be after point A")
+            return
+        self.ab_end = position
+        self.ab_loop.set_points()
+        self.update_ab_buttons()
+        self.save_ab_points()
+        self.media_player.setPosition(self.ab_start)
+        self.status_bar.showMessage(f"A-B loop: {self.format_time(self.ab_start // 1000)} - "
+                                    f"{self.format_time(self.ab_end // 1000)}")
+        
+    def clear_ab_loop(self):
+        self.reset_ab_loop()
+        self.status_bar.showMessage("A-B loop cleared")
+        
+    def reset_ab_loop(self):
+        self.ab_start = None
+        self.ab_end = None
+        self.ab_loop.reset()
+        self.update_ab_buttons()
+        self.save_ab_points()
+        
+    def save_ab_points(self):
+        file_path = self.current_path()
+        points = [file_path, self.ab_start, self.ab_end] if self.ab_start is not None else None
+        self.session.set("ab", points)
+        
+    def update_ab_buttons(self):
+        self.ab_set_a_btn.setText("A⏺" if self.ab_start is None else f"A {self.format_time(self.ab_start // 1000)}")
+        self.ab_set_b_btn.setText("B⏺" if self.ab_end is None else f"B {self.format_time(self.ab_end // 1000)}")
+        
+    def set_ab_seamless(self, enabled):
+        self.ab_loop.seamless = enabled
+        self.ab_loop.set_points()
+        
+    def report_loop_jitter(self, error_ms):
+        mean, deviation, p95 = self.ab_loop.jitter()
+        self.status_bar.showMessage(f"A-B loop: boundary error {error_ms:+.0f} ms, "
+                                    f"mean {mean:+.1f} ms, jitter {deviation:.1f} ms (p95 {p95:.0f} ms)")
+        
+    def show_ab_stats(self):
+        self.status_bar.showMessage(self.ab_loop.stats_text())
+        
+    def take_screenshot(self):
+        frame = self.video_widget.videoSink().videoFrame()
+        if not frame.isValid():
+            self.status_bar.showMessage("No video frame to capture")
+        elif not self.frame_capture.capture(frame, self.media_player.position()):
+            self.status_bar.showMessage("Screenshot skipped, still saving earlier frames")
+            
+    def screenshot_saved(self, file_path, error):
+        if error:
+            self.status_bar.showMessage(f"Screenshot failed: {error}")
+        else:
+            self.status_bar.showMessage(f"Screenshot saved: {file_path}")
+            
+    def burst_capture(self):
+        if self.ab_start is None or self.ab_end is None:
+            self.status_bar.showMessage("Set A and B first to burst capture a range")
+            return
+        if self.frame_capture.burst is not None:
+            return
+        self.frame_capture.start_burst(self.ab_start, self.ab_end)
+        self.status_bar.showMessage("Burst capturing A-B...")
+        
+    def show_refresh_stats(self):
+        self.status_bar.showMessage(self.ui_refresh.stats_text())
+        
+    def changeEvent(self, event):
+        if event.type() == event.Type.WindowStateChange:
+            self.ui_refresh.set_visible(self.isVisible() and not self.isMinimized())
+        super().changeEvent(event)
+        
+    def showEvent(self, event):
+        self.ui_refresh.set_visible(not self.isMinimized())
+        super().showEvent(event)
+        
+    def hideEvent(self, event):
+        self.ui_refresh.set_visible(False)
+        super().hideEvent(event)
         
     def toggle_fullscreen(self):
         if self.video_widget:
@@ -941,7 +4469,7 @@ class MediaPlayer(QMainWindow):
             
     def show_equalizer(self):
         if not self.equalizer_dialog:
-            self.equalizer_dialog = EqualizerDialog(self.media_player, self)
+            self.equalizer_dialog = EqualizerDialog(self.equalizer_engine, self)
         self.equalizer_dialog.show()
         
     def load_subtitle(self):
@@ -951,31 +4479,129 @@ class MediaPlayer(QMainWindow):
         )
         if file_path:
             self.subtitle_file = file_path
-            self.status_bar.showMessage(f"Subtitle loaded: {os.path.basename(file_path)}")
+            self.subtitle_loader = SubtitleLoader(file_path, self)
+            self.subtitle_loader.subtitles_loaded.connect(self.subtitles_loaded)
+            self.subtitle_loader.start()
+            self.status_bar.showMessage(f"Loading subtitle: {os.path.basename(file_path)}")
+            
+    def subtitles_loaded(self, cues, error):
+        if self.sender() is not self.subtitle_loader:
+            return
+        if error:
+            QMessageBox.warning(self, "Error", f"Failed to load subtitle: {error}")
+            self.status_bar.showMessage(f"Error loading subtitle: {error}")
+            return
+        self.subtitle_overlay.set_cues(cues)
+        self.subtitle_overlay.update_position(self.media_player.position())
+        self.status_bar.showMessage(f"Subtitle loaded: {os.path.basename(self.subtitle_file)} ({len(cues)} cues)")
+        
+    def clear_subtitles(self):
+        self.subtitle_file = None
+        self.subtitle_overlay.set_cues(None)
+        self.status_bar.showMessage("Subtitles disabled")
             
+    def toggle_favorite(self):
+        """Star or unstar the selected track, or the playing one when nothing is selected"""
+        current = self.playlist_proxy.mapToSource(self.playlist_widget.currentIndex())
+        file_path = current.data(Qt.ItemDataRole.UserRole) if current.isValid() else self.current_path()
+        if not file_path:
+            self.status_bar.showMessage("Select a track to add to favorites")
+            return
+        favorite = file_path not in self.favorites
+        self.session.set_favorite(file_path, favorite)
+        if current.isValid():
+            self.playlist_model.refresh_row(current.row())
+        action = "Added to" if favorite else "Removed from"
+        self.status_bar.showMessage(f"{action} favorites: {os.path.basename(file_path)}")
+        
     def update_playlist_selection(self):
         if self.current_index >= 0 and self.current_index < len(self.playlist):
-            for i in range(self.playlist_widget.count()):
-                item = self.playlist_widget.item(i)
-                if item and item.data(Qt.ItemDataRole.UserRole) == self.playlist[self.current_index]:
-                    self.playlist_widget.setCurrentItem(item)
-                    break
+            index = self.playlist_proxy.mapFromSource(self.playlist_model.index(self.current_index))
+            if index.isValid():
+                self.playlist_widget.setCurrentIndex(index)
+                self.playlist_widget.scrollTo(index)
                 
     def closeEvent(self, event):
+        for scanner in (self.library_scanner, self.playlist_loader, self.session_loader):
+            if scanner is not None:
+                scanner.cancel()
+                scanner.wait()
+        # A new folder scan only cancels the previous one, it may still be winding down
+        for scanner in self.findChildren(FolderScanner):
+            scanner.cancel()
+            scanner.wait()
+        # Every track change starts a loader, earlier ones may still be running
+        for loader in self.findChildren(FrameIndexLoader) + self.findChildren(BookmarkLoader):
+            loader.wait()
+        # Before the player stops and forgets its position
+        self.session_timer.stop()
+        self.save_session()
+        if self.subtitle_loader is not None:
+            self.subtitle_loader.wait()
+        if self.playlist_saver is not None:
+            self.playlist_saver.wait()
+        for worker in (self.metadata_prober, self.duplicate_detector):
+            if worker is not None:
+                worker.stop()
+                worker.wait()
         if self.media_player:
+            self.frame_capture.shutdown()
+            self.thumbnails.cancel()
+            self.ab_loop.reset()
+            self.equalizer_engine.set_enabled(False)
+            self.gapless.disarm()
+            self.normalizer.stop()
             self.media_player.stop()
+        self.bookmark_store.close()
+        self.telemetry.close()
         event.accept()
 
 def main():
+    # QApplication strips the Qt options it understands from sys.argv
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
     
+    parser = argparse.ArgumentParser(prog="MediaPlayer")
+    parser.add_argument("files", nargs="*", help="media files to play")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print startup stage timings and exit after the first frame")
+    parser.add_argument("--play", action="store_true",
+                        help="start the first file when handing files to a running player")
+    parser.add_argument("--new-instance", action="store_true",
+                        help="start a separate player instead of using a running one")
+    parser.add_argument("--telemetry-port", type=int, metavar="PORT",
+                        help="serve playback telemetry on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--telemetry-log", metavar="PATH",
+                        help="append a JSON telemetry snapshot to PATH every 10 seconds")
+    args = parser.parse_args(sys.argv[1:])
+    instance_server = None
+    if launch_request(sys.argv) is not None:
+        instance_server = InstanceServer()
+        # A launch that started at the same time may have claimed the server
+        if not instance_server.listen():
+            if forward_launch(sys.argv):
+                sys.exit(0)
+            instance_server.listen(replace_stale=True)
+    profiler = StartupProfiler() if args.profile_startup else None
+    if profiler is not None:
+        profiler.mark("QApplication")
+    
     # Set application properties
     app.setApplicationName("MediaPlayer")
     app.setOrganizationName("MediaPlayer")
     
-    player = MediaPlayer()
+    player = MediaPlayer(profiler)
+    if args.telemetry_port is not None and not player.telemetry.serve(args.telemetry_port):
+        print(f"Telemetry endpoint: port {args.telemetry_port} is not available", file=sys.stderr)
+    if args.telemetry_log:
+        player.telemetry.log_to(args.telemetry_log)
+    if instance_server is not None:
+        instance_server.message_received.connect(player.receive_launch)
+    file_paths = player.open_paths(args.files)
+    player.profile_mark("window constructed")
     player.show()
+    player.profile_mark("window shown")
+    QTimer.singleShot(0, lambda: player.finish_startup(file_paths))
     
     sys.exit(app.exec())
 
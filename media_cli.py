@@ -0,0 +1,162 @@
+"""
+Headless batch tool: scan folders, probe headers and write playlists and caches.
+
+Run: python media_cli.py ROOT... [-o PLAYLIST] [--workers N] [--library] [--frame-index]
+
+Folders are split into their top level subfolders and scanned in a process
+pool with the player's own extension rules. The headers of every file are
+probed in the same pool. Probes go to the probe cache and, with
+--frame-index, video frame indexes go to the frame index cache, both in the
+player's data folder, so the player shows durations and steps frames
+without probing again. Every stage reports its throughput. Has no Qt
+dependency.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from frame_index import FrameIndexCache
+from media_library import MediaLibrary
+from media_probe import ProbeCache, probe_paths
+from media_scan import VIDEO_EXTENSIONS, is_media_file, scan_media_files
+from playlist_io import PlaylistEntry, playlist_format, write_playlist
+
+APP_NAME = "MediaPlayer"
+
+
+def app_data_dir():
+    """The folder QStandardPaths.AppDataLocation gives the player, worked out without Qt"""
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~\\AppData\\Roaming")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(base, APP_NAME, APP_NAME)
+
+
+def _scan_job(directory):
+    return list(scan_media_files(directory))
+
+
+def _index_job(job):
+    path, cache_dir = job
+    return FrameIndexCache(cache_dir).load(path) is not None
+
+
+def scan_roots(roots, executor):
+    """Media files below roots, each root's subfolders scanned in parallel"""
+    paths = []
+    for root in roots:
+        root = os.path.abspath(root)
+        if os.path.isfile(root):
+            if is_media_file(root):
+                paths.append(root)
+            continue
+        subfolders = []
+        try:
+            with os.scandir(root) as entries:
+                for entry in sorted(entries, key=lambda entry: entry.name):
+                    if entry.is_dir(follow_symlinks=False):
+                        subfolders.append(entry.path)
+                    elif is_media_file(entry.name) and entry.is_file():
+                        paths.append(entry.path)
+        except OSError as e:
+            print(f"skipping {root}: {e}", file=sys.stderr)
+            continue
+        for found in executor.map(_scan_job, subfolders):
+            paths.extend(found)
+    return paths
+
+
+def _rate(count, seconds):
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def _report(stage, count, seconds, unit="files"):
+    print(f"{stage:>12}: {count} {unit} in {seconds:.3f}s = {_rate(count, seconds):.0f} {unit}/sec")
+
+
+def run(roots, output=None, data_dir=None, workers=None, probe=True, library=False,
+        frame_index=False, relative=True):
+    data_dir = data_dir or app_data_dir()
+    os.makedirs(data_dir, exist_ok=True)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        start = time.perf_counter()
+        paths = scan_roots(roots, executor)
+        results["scan"] = (len(paths), time.perf_counter() - start)
+
+        infos = {}
+        if probe:
+            start = time.perf_counter()
+            cache = ProbeCache(os.path.join(data_dir, "probe_cache.sqlite3"))
+            try:
+                for path, info in probe_paths(paths, cache, executor=executor):
+                    if info is not None:
+                        infos[path] = info
+            finally:
+                cache.close()
+            results["probe"] = (len(paths), time.perf_counter() - start)
+
+        if frame_index:
+            start = time.perf_counter()
+            cache_dir = os.path.join(data_dir, "frame_index")
+            videos = [path for path in paths if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS]
+            indexed = sum(executor.map(_index_job, ((path, cache_dir) for path in videos), chunksize=4))
+            results["frame index"] = (indexed, time.perf_counter() - start)
+
+    if library:
+        start = time.perf_counter()
+        index = MediaLibrary(os.path.join(data_dir, "library.sqlite3"))
+        try:
+            for root in roots:
+                if os.path.isdir(root):
+                    index.add_root(os.path.abspath(root))
+                    index.rescan(os.path.abspath(root))
+            results["library"] = (index.file_count(), time.perf_counter() - start)
+        finally:
+            index.close()
+
+    if output:
+        start = time.perf_counter()
+        entries = []
+        for path in paths:
+            info = infos.get(path)
+            entries.append(PlaylistEntry(path, info.title if info else None, info.duration if info else None))
+        written = write_playlist(output, entries, relative)
+        results["playlist"] = (written, time.perf_counter() - start)
+    return paths, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("roots", nargs="+", help="folders or media files to include")
+    parser.add_argument("-o", "--output", help="playlist to write (.m3u, .m3u8, .pls or .xspf)")
+    parser.add_argument("--data-dir", help=f"cache folder, defaults to the player's ({app_data_dir()})")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--no-probe", action="store_true", help="skip header probing")
+    parser.add_argument("--library", action="store_true", help="add the folders to the player's library index")
+    parser.add_argument("--frame-index", action="store_true", help="build frame indexes for video files")
+    parser.add_argument("--absolute", action="store_true", help="write absolute paths to the playlist")
+    args = parser.parse_args(argv)
+    if args.output:
+        try:
+            playlist_format(args.output)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        _paths, results = run(args.roots, args.output, args.data_dir, args.workers, not args.no_probe,
+                              args.library, args.frame_index, not args.absolute)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    for stage, (count, seconds) in results.items():
+        _report(stage, count, seconds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Duplicate detection for playlist entries that name media already listed.
+
+Files are compared on three levels. The normalized real path catches the
+same file reached through a symlink, another letter case on a case
+insensitive file system or a relative path. The identity, device and
+inode with the size, catches hard links and a share mounted under two
+paths. The optional content fingerprint catches copies in different
+places. It hashes the size with a head, a middle and a tail sample read
+through mmap, and only files whose size matches another entry are hashed
+at all. Every check is a dict lookup, so indexing n files is O(n). Has no
+Qt dependency.
+"""
+import hashlib
+import mmap
+import os
+from collections import namedtuple
+
+FileKeys = namedtuple("FileKeys", ["real", "identity", "size"])
+
+SAMPLE_SIZE = 64 * 1024
+
+
+def file_keys(path):
+    """FileKeys for path, None when it cannot be read"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # Some network file systems report no inode, the real path has to do there
+    identity = (stat.st_dev, stat.st_ino, stat.st_size) if stat.st_ino else None
+    return FileKeys(os.path.normcase(os.path.realpath(path)), identity, stat.st_size)
+
+
+def content_fingerprint(path, sample_size=SAMPLE_SIZE):
+    """Hash of the size and three evenly spread samples, None when the file cannot be read"""
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            digest = hashlib.sha1(str(size).encode('ascii'))
+            if size <= 3 * sample_size:
+                digest.update(f.read())
+            else:
+                # Only the sampled pages are faulted in, nothing is copied for the skipped bytes
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    for offset in (0, (size - sample_size) // 2, size - sample_size):
+                        digest.update(view[offset:offset + sample_size])
+            return digest.hexdigest()
+    except (OSError, ValueError):
+        return None
+
+
+class DuplicateIndex:
+    """Hash index of listed files that reports new paths naming one of them"""
+    def __init__(self):
+        self._keys = {}
+        self._by_real = {}
+        self._by_identity = {}
+        # Size to the paths of that size, as dict keys in the order they were added
+        self._by_size = {}
+        self._fingerprints = {}
+        self._by_content = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, path):
+        return path in self._keys
+
+    def add(self, path, keys):
+        """Index path, or return the listed path it duplicates"""
+        if keys is None or path in self._keys:
+            return None
+        original = self._by_real.get(keys.real)
+        if original is None and keys.identity is not None:
+            original = self._by_identity.get(keys.identity)
+        if original is not None:
+            return original
+        self._keys[path] = keys
+        self._by_real[keys.real] = path
+        if keys.identity is not None:
+            self._by_identity[keys.identity] = path
+        self._by_size.setdefault(keys.size, {})[path] = None
+        return None
+
+    def fingerprint_candidates(self, paths=None):
+        """Paths still to fingerprint because another indexed file has the same size"""
+        if paths is None:
+            sizes = [size for size, group in self._by_size.items() if len(group) > 1]
+        else:
+            sizes = dict.fromkeys(self._keys[path].size for path in paths if path in self._keys)
+        candidates = []
+        for size in sizes:
+            group = self._by_size.get(size, ())
+            if len(group) > 1:
+                # Older entries first, so the copy added later is the one reported
+                candidates.extend(path for path in group if path not in self._fingerprints)
+        return candidates
+
+    def add_fingerprint(self, path, fingerprint):
+        """Record the content hash of path, or return the listed path with the same content"""
+        if path not in self._keys or fingerprint is None:
+            return None
+        original = self._by_content.get(fingerprint)
+        if original is not None and original != path:
+            return original
+        self._fingerprints[path] = fingerprint
+        self._by_content[fingerprint] = path
+        return None
+
+    def remove(self, path):
+        keys = self._keys.pop(path, None)
+        if keys is None:
+            return
+        if self._by_real.get(keys.real) == path:
+            del self._by_real[keys.real]
+        if keys.identity is not None and self._by_identity.get(keys.identity) == path:
+            del self._by_identity[keys.identity]
+        group = self._by_size[keys.size]
+        del group[path]
+        if not group:
+            del self._by_size[keys.size]
+        fingerprint = self._fingerprints.pop(path, None)
+        if fingerprint is not None and self._by_content.get(fingerprint) == path:
+            del self._by_content[fingerprint]
+
+    def retain(self, paths):
+        """Forget every indexed path not in paths"""
+        keep = set(paths)
+        for path in [path for path in self._keys if path not in keep]:
+            self.remove(path)
+
+    def clear(self):
+        for index in (self._keys, self._by_real, self._by_identity, self._by_size, self._fingerprints,
+                      self._by_content):
+            index.clear()
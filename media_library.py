@@ -0,0 +1,234 @@
+"""
+Persistent media library index stored in SQLite.
+
+Every indexed file is keyed on its case-normalized path and stores the
+path as found on disk, its size and mtime, every directory stores its
+own mtime. The key only finds a file again, the real path is what the
+player shows and plays. A rescan only lists directories whose mtime
+moved; unchanged directories are descended through the child list
+already in the index.
+"""
+import os
+import sqlite3
+from collections import namedtuple
+
+from media_scan import MEDIA_EXTENSIONS
+
+LibraryDelta = namedtuple("LibraryDelta", ["added", "removed", "changed"])
+
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    key TEXT PRIMARY KEY,
+    parent TEXT,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    key TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+"""
+
+
+def normalize_path(path):
+    """Index key of a path, the same for every spelling of it on a case-insensitive file system"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _prefix_range(root):
+    """Bounds that select every path strictly below root with a range scan"""
+    base = root.rstrip(os.sep)
+    return base + os.sep, base + chr(ord(os.sep) + 1)
+
+
+class MediaLibrary:
+    """SQLite backed index of media files below a set of root folders"""
+    COMMIT_EVERY = 2000
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # Tables from before real paths were kept, the next rescan fills them again
+            self.conn.executescript("DROP TABLE IF EXISTS roots; DROP TABLE IF EXISTS dirs; "
+                                    "DROP TABLE IF EXISTS files;")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def add_root(self, path):
+        root = os.path.abspath(path)
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO roots(key, path) VALUES (?, ?)", (normalize_path(root), root))
+        return root
+
+    def remove_root(self, path):
+        root = normalize_path(path)
+        dirs = self._load_dirs(root)[0]
+        with self.conn:
+            self.conn.execute("DELETE FROM roots WHERE key = ?", (root,))
+            self._delete_dirs(list(dirs))
+
+    def roots(self):
+        return [row[0] for row in self.conn.execute("SELECT path FROM roots ORDER BY key")]
+
+    def files(self, root=None):
+        """All indexed file paths as found on disk, optionally limited to one root, in key order"""
+        if root is None:
+            rows = self.conn.execute("SELECT path FROM files ORDER BY key")
+            return [row[0] for row in rows]
+        low, high = _prefix_range(normalize_path(root))
+        rows = self.conn.execute("SELECT path FROM files WHERE key > ? AND key < ? ORDER BY key",
+                                 (low, high))
+        return [row[0] for row in rows]
+
+    def file_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def _load_dirs(self, root):
+        """Mtime of every directory below root and the (key, path) children of each, by key"""
+        mtimes = {}
+        children = {}
+        low, high = _prefix_range(root)
+        rows = self.conn.execute(
+            "SELECT key, parent, path, mtime_ns FROM dirs WHERE key = ? OR (key > ? AND key < ?)",
+            (root, low, high))
+        for key, parent, path, mtime_ns in rows:
+            mtimes[key] = mtime_ns
+            children.setdefault(parent, []).append((key, path))
+        return mtimes, children
+
+    def _subtree(self, path, children):
+        result = []
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            result.append(current)
+            stack.extend(key for key, _path in children.get(current, ()))
+        return result
+
+    def _delete_dirs(self, dirs):
+        removed = []
+        for directory in dirs:
+            removed.extend(row[0] for row in
+                           self.conn.execute("SELECT path FROM files WHERE dir = ?", (directory,)))
+            self.conn.execute("DELETE FROM files WHERE dir = ?", (directory,))
+            self.conn.execute("DELETE FROM dirs WHERE key = ?", (directory,))
+        return removed
+
+    def rescan(self, path, is_cancelled=None, on_delta=None):
+        """Bring the index for one root up to date and return what changed.
+
+        Directories with an unchanged mtime are not listed again, so file
+        edits that keep the directory mtime are only picked up once that
+        directory changes. on_delta(LibraryDelta) receives partial results
+        each time a batch of changes is committed.
+        """
+        root = normalize_path(path)
+        known_mtimes, known_children = self._load_dirs(root)
+        added, removed, changed = [], [], []
+        pending = [[], [], []]
+        conn = self.conn
+        extensions = MEDIA_EXTENSIONS
+        splitext = os.path.splitext
+
+        def flush():
+            conn.commit()
+            if on_delta is not None and any(pending):
+                on_delta(LibraryDelta(*pending))
+            added.extend(pending[0])
+            removed.extend(pending[1])
+            changed.extend(pending[2])
+            pending[0], pending[1], pending[2] = [], [], []
+
+        # A directory's mtime is stored by a marker popped after its whole subtree. An
+        # interrupted scan leaves the old mtime, so the next one lists it again
+        # instead of descending only through the children already indexed.
+        stack = [(root, os.path.abspath(path), None, None)]
+        while stack:
+            if is_cancelled is not None and is_cancelled():
+                break
+            directory, dir_path, parent, done_mtime_ns = stack.pop()
+            if done_mtime_ns is not None:
+                conn.execute("INSERT OR REPLACE INTO dirs(key, parent, path, mtime_ns) VALUES (?, ?, ?, ?)",
+                             (directory, parent, dir_path, done_mtime_ns))
+                continue
+            try:
+                mtime_ns = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                if directory in known_mtimes:
+                    pending[1].extend(self._delete_dirs(self._subtree(directory, known_children)))
+                continue
+
+            if known_mtimes.get(directory) == mtime_ns:
+                stack.extend((child, child_path, directory, None)
+                             for child, child_path in known_children.get(directory, ()))
+                continue
+
+            current_files = {}
+            current_dirs = []
+            try:
+                with os.scandir(dir_path) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                current_dirs.append((normalize_path(entry.path), entry.path))
+                            elif splitext(entry.name)[1].lower() in extensions and entry.is_file():
+                                stat = entry.stat()
+                                current_files[normalize_path(entry.path)] = (entry.path, stat.st_size,
+                                                                             stat.st_mtime_ns)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+            indexed = {row[0]: (row[1], row[2], row[3]) for row in
+                       conn.execute("SELECT key, path, size, mtime_ns FROM files WHERE dir = ?", (directory,))}
+            gone = [key for key in indexed if key not in current_files]
+            upserts = []
+            for key, info in current_files.items():
+                previous = indexed.get(key)
+                if previous is None:
+                    pending[0].append(info[0])
+                elif previous[0] != info[0]:
+                    # Renamed to a different case, the player knows it by its old spelling
+                    pending[1].append(previous[0])
+                    pending[0].append(info[0])
+                elif previous != info:
+                    pending[2].append(info[0])
+                else:
+                    continue
+                upserts.append((key, directory) + info)
+            if gone:
+                conn.executemany("DELETE FROM files WHERE key = ?", ((key,) for key in gone))
+                pending[1].extend(indexed[key][0] for key in gone)
+            if upserts:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO files(key, dir, path, size, mtime_ns) VALUES (?, ?, ?, ?, ?)", upserts)
+
+            live_dirs = {key for key, _path in current_dirs}
+            for child, _path in known_children.get(directory, ()):
+                if child not in live_dirs:
+                    pending[1].extend(self._delete_dirs(self._subtree(child, known_children)))
+
+            stack.append((directory, dir_path, parent, mtime_ns))
+            current_dirs.sort(reverse=True)
+            stack.extend((child, child_path, directory, None) for child, child_path in current_dirs)
+            if sum(len(items) for items in pending) >= self.COMMIT_EVERY:
+                flush()
+        flush()
+        return LibraryDelta(added, removed, changed)
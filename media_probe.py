@@ -0,0 +1,556 @@
+"""
+Header-only metadata probing for the common audio/video containers.
+
+Files are memory-mapped and only the structures that describe the stream
+are parsed: MP4 moov/mvhd/stsd/ilst, FLAC STREAMINFO and Vorbis comments,
+RIFF WAV/AVI headers, MP3 ID3v2/ID3v1 with Xing/Info/VBRI frame counts,
+and Ogg Vorbis/Opus identification, comment and last-page granule.
+Results are cached in SQLite keyed on (path, size, mtime). Has no Qt
+dependency.
+"""
+import mmap
+import os
+import sqlite3
+import struct
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+MediaInfo = namedtuple("MediaInfo", ["duration", "codec", "title", "artist", "album",
+                                     "bitrate", "sample_rate", "channels"],
+                       defaults=(None,) * 8)
+
+EMPTY_INFO = MediaInfo()
+
+
+def _text(raw, encoding='utf-8'):
+    value = raw.split(b'\x00', 1)[0].decode(encoding, 'replace').strip()
+    return value or None
+
+
+def _finish(info, file_size):
+    """Fill in an average bitrate from the file size when the header has none"""
+    if info.bitrate is None and info.duration:
+        info = info._replace(bitrate=int(file_size * 8 / info.duration / 1000))
+    return info
+
+
+# MP4 / QuickTime
+
+MP4_TAGS = {b'\xa9nam': 'title', b'\xa9ART': 'artist', b'aART': 'artist', b'\xa9alb': 'album'}
+
+
+def iter_mp4_boxes(mm, start, end):
+    """Yield (type, payload_start, box_end) for the boxes between start and end"""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', mm, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack_from('>Q', mm, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _find_mp4_box(mm, start, end, box_type):
+    for found, payload, box_end in iter_mp4_boxes(mm, start, end):
+        if found == box_type:
+            return payload, box_end
+    return None
+
+
+def probe_mp4(mm):
+    moov = _find_mp4_box(mm, 0, len(mm), b'moov')
+    if moov is None:
+        return EMPTY_INFO
+    fields = {}
+    video_codec = audio_codec = None
+    for box_type, payload, box_end in iter_mp4_boxes(mm, *moov):
+        if box_type == b'mvhd':
+            if mm[payload] == 1:
+                timescale, duration = struct.unpack_from('>IQ', mm, payload + 20)
+            else:
+                timescale, duration = struct.unpack_from('>II', mm, payload + 12)
+            if timescale:
+                fields['duration'] = duration / timescale
+        elif box_type == b'trak':
+            mdia = _find_mp4_box(mm, payload, box_end, b'mdia')
+            if mdia is None:
+                continue
+            handler = None
+            hdlr = _find_mp4_box(mm, *mdia, b'hdlr')
+            if hdlr is not None:
+                handler = bytes(mm[hdlr[0] + 8:hdlr[0] + 12])
+            stbl = None
+            minf = _find_mp4_box(mm, *mdia, b'minf')
+            if minf is not None:
+                stbl = _find_mp4_box(mm, *minf, b'stbl')
+            stsd = _find_mp4_box(mm, *stbl, b'stsd') if stbl is not None else None
+            if stsd is None or stsd[0] + 16 > stsd[1]:
+                continue
+            codec = bytes(mm[stsd[0] + 12:stsd[0] + 16]).decode('latin-1').strip()
+            if handler == b'vide' and video_codec is None:
+                video_codec = codec
+            elif handler == b'soun' and audio_codec is None:
+                audio_codec = codec
+                entry = stsd[0] + 8
+                # Sound sample entry: 8 bytes header, 8 reserved/index, 8 version fields
+                if entry + 36 <= stsd[1]:
+                    fields['channels'] = struct.unpack_from('>H', mm, entry + 24)[0]
+                    fields['sample_rate'] = struct.unpack_from('>I', mm, entry + 32)[0] >> 16
+        elif box_type == b'udta':
+            meta = _find_mp4_box(mm, payload, box_end, b'meta')
+            if meta is None:
+                continue
+            start = meta[0]
+            # ISO meta is a full box, QuickTime meta is not
+            if mm[start + 4:start + 8] != b'hdlr':
+                start += 4
+            ilst = _find_mp4_box(mm, start, meta[1], b'ilst')
+            if ilst is None:
+                continue
+            for tag, item, item_end in iter_mp4_boxes(mm, *ilst):
+                name = MP4_TAGS.get(tag)
+                if name is None or name in fields:
+                    continue
+                data = _find_mp4_box(mm, item, item_end, b'data')
+                if data is not None:
+                    fields[name] = _text(mm[data[0] + 8:data[1]])
+    codec = "/".join(c for c in (video_codec, audio_codec) if c) or None
+    return MediaInfo(codec=codec, **fields)
+
+
+# FLAC
+
+def _vorbis_comments(data, pos):
+    """Parse a Vorbis comment block (shared by FLAC and Ogg) into tag fields"""
+    fields = {}
+    try:
+        vendor_length = struct.unpack_from('<I', data, pos)[0]
+        pos += 4 + vendor_length
+        count = struct.unpack_from('<I', data, pos)[0]
+        pos += 4
+        for _ in range(count):
+            length = struct.unpack_from('<I', data, pos)[0]
+            pos += 4
+            key, _, value = bytes(data[pos:pos + length]).partition(b'=')
+            pos += length
+            name = {b'TITLE': 'title', b'ARTIST': 'artist', b'ALBUM': 'album'}.get(key.upper())
+            if name and name not in fields:
+                fields[name] = _text(value)
+    except struct.error:
+        pass
+    return fields
+
+
+def probe_flac(mm, start=0):
+    pos = start + 4
+    fields = {}
+    while pos + 4 <= len(mm):
+        header = mm[pos]
+        block_type = header & 0x7F
+        length = int.from_bytes(mm[pos + 1:pos + 4], 'big')
+        body = pos + 4
+        if block_type == 0 and length >= 18:
+            packed = int.from_bytes(mm[body + 10:body + 18], 'big')
+            sample_rate = packed >> 44
+            fields['sample_rate'] = sample_rate
+            fields['channels'] = ((packed >> 41) & 0x7) + 1
+            total_samples = packed & 0xFFFFFFFFF
+            if sample_rate and total_samples:
+                fields['duration'] = total_samples / sample_rate
+        elif block_type == 4:
+            fields.update(_vorbis_comments(mm[body:body + length], 0))
+        if header & 0x80:
+            break
+        pos = body + length
+    return MediaInfo(codec='flac', **fields)
+
+
+# RIFF: WAV and AVI
+
+WAV_FORMATS = {1: 'pcm', 3: 'pcm_float', 6: 'alaw', 7: 'mulaw', 0x55: 'mp3', 0xFFFE: 'pcm'}
+RIFF_INFO = {b'INAM': 'title', b'IART': 'artist', b'IPRD': 'album'}
+
+
+def iter_riff_chunks(mm, start, end):
+    pos = start
+    while pos + 8 <= end:
+        chunk_id, size = struct.unpack_from('<4sI', mm, pos)
+        yield chunk_id, pos + 8, min(pos + 8 + size, end)
+        # Chunks are padded to an even size
+        pos += 8 + size + (size & 1)
+
+
+def probe_riff(mm):
+    form = bytes(mm[8:12])
+    fields = {}
+    byte_rate = data_size = None
+    for chunk_id, body, end in iter_riff_chunks(mm, 12, len(mm)):
+        if chunk_id == b'fmt ' and end - body >= 16:
+            tag, channels, sample_rate, byte_rate = struct.unpack_from('<HHII', mm, body)
+            fields.update(codec=WAV_FORMATS.get(tag, f'wav_0x{tag:04x}'), channels=channels,
+                          sample_rate=sample_rate, bitrate=byte_rate * 8 // 1000)
+        elif chunk_id == b'data':
+            # A streaming writer may leave the size field at its maximum
+            data_size = end - body
+        elif chunk_id == b'LIST' and end - body >= 4:
+            list_type = bytes(mm[body:body + 4])
+            if list_type == b'INFO':
+                for info_id, info_body, info_end in iter_riff_chunks(mm, body + 4, end):
+                    name = RIFF_INFO.get(info_id)
+                    if name:
+                        fields.setdefault(name, _text(mm[info_body:info_end], 'latin-1'))
+            elif list_type == b'hdrl' and form == b'AVI ':
+                avih = next((c for c in iter_riff_chunks(mm, body + 4, end) if c[0] == b'avih'), None)
+                if avih is not None and avih[2] - avih[1] >= 20:
+                    usec_per_frame, = struct.unpack_from('<I', mm, avih[1])
+                    total_frames, = struct.unpack_from('<I', mm, avih[1] + 16)
+                    fields['duration'] = usec_per_frame * total_frames / 1e6
+                    fields['codec'] = 'avi'
+    if form == b'WAVE' and byte_rate and data_size is not None:
+        fields['duration'] = data_size / byte_rate
+    return MediaInfo(**fields)
+
+
+# MP3
+
+MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 25: (11025, 12000, 8000)}
+ID3_FRAMES = {b'TIT2': 'title', b'TPE1': 'artist', b'TALB': 'album',
+              b'TT2': 'title', b'TP1': 'artist', b'TAL': 'album'}
+ID3_ENCODINGS = ('latin-1', 'utf-16', 'utf-16-be', 'utf-8')
+
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _id3_text(raw):
+    if not raw:
+        return None
+    encoding = ID3_ENCODINGS[raw[0]] if raw[0] < 4 else 'latin-1'
+    terminator = b'\x00\x00' if encoding.startswith('utf-16') else b'\x00'
+    text = bytes(raw[1:])
+    if terminator in text:
+        # UTF-16 terminators must sit on a code unit boundary
+        index = text.find(terminator)
+        while index != -1 and len(terminator) == 2 and index % 2:
+            index = text.find(terminator, index + 1)
+        if index != -1:
+            text = text[:index]
+    return text.decode(encoding, 'replace').strip() or None
+
+
+def parse_id3v2(mm):
+    """Return (tag fields, offset just past the tag)"""
+    if len(mm) < 10 or mm[:3] != b'ID3':
+        return {}, 0
+    major = mm[3]
+    flags = mm[5]
+    end = 10 + _syncsafe(mm[6:10]) + (10 if flags & 0x10 else 0)
+    fields = {}
+    pos = 10
+    if flags & 0x40 and major >= 3:
+        # Extended header, size is syncsafe in v2.4 and excludes itself in v2.3
+        ext = mm[10:14]
+        pos += _syncsafe(ext) if major == 4 else struct.unpack('>I', ext)[0] + 4
+    id_len, header_len = (3, 6) if major == 2 else (4, 10)
+    while pos + header_len <= min(end, len(mm)):
+        frame_id = bytes(mm[pos:pos + id_len])
+        if frame_id[0] == 0:
+            break
+        if major == 2:
+            size = int.from_bytes(mm[pos + 3:pos + 6], 'big')
+        elif major == 4:
+            size = _syncsafe(mm[pos + 4:pos + 8])
+        else:
+            size = struct.unpack_from('>I', mm, pos + 4)[0]
+        name = ID3_FRAMES.get(frame_id)
+        if name and name not in fields:
+            fields[name] = _id3_text(mm[pos + header_len:pos + header_len + size])
+        pos += header_len + size
+    return fields, end
+
+
+def _mp3_frame(mm, pos):
+    """Decode the frame header at pos, None when it is not a valid header"""
+    if pos + 4 > len(mm):
+        return None
+    header = struct.unpack_from('>I', mm, pos)[0]
+    if header & 0xFFE00000 != 0xFFE00000:
+        return None
+    version_bits = (header >> 19) & 3
+    layer_bits = (header >> 17) & 3
+    bitrate_index = (header >> 12) & 0xF
+    rate_index = (header >> 10) & 3
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    version = {3: 1, 2: 2, 0: 25}[version_bits]
+    layer = 4 - layer_bits
+    bitrate = MP3_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index]
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    mono = (header >> 6) & 3 == 3
+    if layer == 1:
+        samples = 384
+    elif layer == 3 and version != 1:
+        samples = 576
+    else:
+        samples = 1152
+    return version, layer, bitrate, sample_rate, mono, samples
+
+
+def probe_mp3(mm):
+    fields, pos = parse_id3v2(mm)
+    limit = min(len(mm), pos + 65536)
+    frame = None
+    while pos < limit:
+        pos = mm.find(b'\xff', pos, limit)
+        if pos == -1:
+            break
+        frame = _mp3_frame(mm, pos)
+        if frame is not None:
+            break
+        pos += 1
+    if len(mm) >= 128 and mm[-128:-125] == b'TAG':
+        tag = len(mm) - 128
+        for name, offset in (('title', 3), ('artist', 33), ('album', 63)):
+            if not fields.get(name):
+                fields[name] = _text(mm[tag + offset:tag + offset + 30], 'latin-1')
+        audio_end = tag
+    else:
+        audio_end = len(mm)
+    if frame is None:
+        return MediaInfo(codec='mp3', **fields)
+    version, layer, bitrate, sample_rate, mono, samples = frame
+    fields.update(codec=f'mp{layer}', sample_rate=sample_rate, channels=1 if mono else 2)
+    if version == 1:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    xing = pos + 4 + side_info
+    frames = None
+    if mm[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = struct.unpack_from('>I', mm, xing + 4)[0]
+        if flags & 1:
+            frames = struct.unpack_from('>I', mm, xing + 8)[0]
+    elif mm[pos + 36:pos + 40] == b'VBRI':
+        frames = struct.unpack_from('>I', mm, pos + 50)[0]
+    if frames:
+        fields['duration'] = frames * samples / sample_rate
+    elif bitrate:
+        fields['duration'] = (audio_end - pos) * 8 / (bitrate * 1000)
+        fields['bitrate'] = bitrate
+    return MediaInfo(**fields)
+
+
+# Ogg
+
+def _ogg_packets(mm, count, limit=1 << 20):
+    """Reassemble the first count packets of the stream starting at offset 0"""
+    packets = []
+    current = bytearray()
+    pos = 0
+    serial = None
+    while pos + 27 <= min(len(mm), limit) and len(packets) < count:
+        if mm[pos:pos + 4] != b'OggS':
+            break
+        page_serial = struct.unpack_from('<I', mm, pos + 14)[0]
+        segments = mm[pos + 26]
+        table = mm[pos + 27:pos + 27 + segments]
+        body = pos + 27 + segments
+        if serial is None:
+            serial = page_serial
+        if page_serial == serial:
+            for lacing in table:
+                current += mm[body:body + lacing]
+                body += lacing
+                if lacing < 255:
+                    packets.append(bytes(current))
+                    current = bytearray()
+                    if len(packets) == count:
+                        break
+        pos = pos + 27 + segments + sum(table)
+    return packets, serial
+
+
+def _ogg_last_granule(mm, serial):
+    search_end = len(mm)
+    tail_start = max(0, search_end - 65536 * 2)
+    while True:
+        pos = mm.rfind(b'OggS', tail_start, search_end)
+        if pos == -1:
+            return None
+        if pos + 27 <= len(mm) and struct.unpack_from('<I', mm, pos + 14)[0] == serial:
+            granule = struct.unpack_from('<q', mm, pos + 6)[0]
+            if granule >= 0:
+                return granule
+        search_end = pos
+
+
+def probe_ogg(mm):
+    packets, serial = _ogg_packets(mm, 2)
+    if not packets:
+        return EMPTY_INFO
+    head = packets[0]
+    comments = packets[1] if len(packets) > 1 else b''
+    fields = {}
+    granule = _ogg_last_granule(mm, serial)
+    if head.startswith(b'\x01vorbis') and len(head) >= 28:
+        channels, sample_rate, _maximum, nominal = struct.unpack_from('<BIii', head, 11)
+        fields.update(codec='vorbis', channels=channels, sample_rate=sample_rate)
+        if nominal > 0:
+            fields['bitrate'] = nominal // 1000
+        if granule is not None and sample_rate:
+            fields['duration'] = granule / sample_rate
+        if comments.startswith(b'\x03vorbis'):
+            fields.update(_vorbis_comments(comments, 7))
+    elif head.startswith(b'OpusHead') and len(head) >= 19:
+        channels, pre_skip, input_rate = struct.unpack_from('<BHI', head, 9)
+        # Opus granule positions always count 48 kHz samples
+        fields.update(codec='opus', channels=channels, sample_rate=input_rate or 48000)
+        if granule is not None:
+            fields['duration'] = max(0, granule - pre_skip) / 48000
+        if comments.startswith(b'OpusTags'):
+            fields.update(_vorbis_comments(comments, 8))
+    elif head.startswith(b'\x7fFLAC') and len(head) >= 13 + 34:
+        # Ogg FLAC mapping header, the native 'fLaC' marker sits at offset 9
+        flac = probe_flac(head, 9)
+        fields.update(flac._asdict())
+    else:
+        fields['codec'] = 'ogg'
+    return MediaInfo(**fields)
+
+
+def probe_mapped(mm):
+    """Dispatch on the file's magic bytes"""
+    magic = bytes(mm[:12])
+    if magic.startswith(b'fLaC'):
+        return probe_flac(mm)
+    if magic.startswith(b'OggS'):
+        return probe_ogg(mm)
+    if magic.startswith(b'RIFF') and magic[8:12] in (b'WAVE', b'AVI '):
+        return probe_riff(mm)
+    if magic[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide'):
+        return probe_mp4(mm)
+    if magic.startswith(b'ID3'):
+        _tags, end = parse_id3v2(mm)
+        # FLAC files occasionally carry a leading ID3 tag
+        if mm[end:end + 4] == b'fLaC':
+            info = probe_flac(mm, end)
+            return info._replace(**{k: v for k, v in _tags.items() if not getattr(info, k)})
+        return probe_mp3(mm)
+    if magic[0] == 0xFF and magic[1] & 0xE0 == 0xE0:
+        return probe_mp3(mm)
+    return EMPTY_INFO
+
+
+def probe_file(path):
+    """Probe one file's headers, returns MediaInfo (empty when nothing is recognised)"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return EMPTY_INFO
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            try:
+                info = probe_mapped(mm)
+            except (struct.error, IndexError, ValueError, KeyError):
+                # Truncated or corrupt headers: report what the magic alone tells
+                info = EMPTY_INFO
+    return _finish(info, size)
+
+
+def _probe_job(path):
+    try:
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime_ns, probe_file(path)
+    except OSError:
+        return path, None, None, None
+
+
+class ProbeCache:
+    """SQLite cache of MediaInfo keyed on (path, size, mtime)"""
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS probe (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            + ", ".join(f"{name}" for name in MediaInfo._fields) + ")")
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, path, size, mtime_ns):
+        row = self.conn.execute(
+            "SELECT " + ", ".join(MediaInfo._fields) + " FROM probe WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, size, mtime_ns)).fetchone()
+        return MediaInfo(*row) if row is not None else None
+
+    def put_many(self, rows):
+        """rows are (path, size, mtime_ns, MediaInfo) tuples as produced by probe_paths"""
+        placeholders = ", ".join("?" * (len(MediaInfo._fields) + 3))
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO probe VALUES ({placeholders})",
+                                  ((path, size, mtime_ns) + tuple(info)
+                                   for path, size, mtime_ns, info in rows))
+
+
+def probe_paths(paths, cache=None, max_workers=None, executor=None, chunksize=16):
+    """Yield (path, MediaInfo) for every path, probing cache misses in a pool.
+
+    Pass a ProcessPoolExecutor for CPU-bound local disks; the default
+    thread pool suits network shares where probing waits on I/O.
+    Unreadable files yield None.
+    """
+    misses = []
+    if cache is not None:
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                yield path, None
+                continue
+            info = cache.get(path, stat.st_size, stat.st_mtime_ns)
+            if info is None:
+                misses.append(path)
+            else:
+                yield path, info
+    else:
+        misses = list(paths)
+    if not misses:
+        return
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_workers or min(32, (os.cpu_count() or 1) * 4))
+    results = executor.map(_probe_job, misses, chunksize=chunksize)
+    try:
+        probed = []
+        for path, size, mtime_ns, info in results:
+            if info is not None:
+                probed.append((path, size, mtime_ns, info))
+            yield path, info
+            if cache is not None and len(probed) >= 500:
+                cache.put_many(probed)
+                probed = []
+        if cache is not None and probed:
+            cache.put_many(probed)
+    finally:
+        # Closing the map iterator cancels the probes that have not started,
+        # shutdown(cancel_futures=True) would need Python 3.9
+        results.close()
+        if own_executor:
+            executor.shutdown(wait=False)
@@ -0,0 +1,56 @@
+"""
+Media file discovery shared by the player and command line tools.
+Has no Qt dependency so it can run on worker threads or headless machines.
+"""
+import os
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm')
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.ogg', '.m4a', '.aac')
+MEDIA_EXTENSIONS = frozenset(VIDEO_EXTENSIONS + AUDIO_EXTENSIONS)
+
+
+def media_file_filter():
+    """File dialog filter string for all supported media types"""
+    patterns = " ".join(f"*{ext}" for ext in VIDEO_EXTENSIONS + AUDIO_EXTENSIONS)
+    return f"Media Files ({patterns});;All Files (*)"
+
+
+def is_media_file(name):
+    return os.path.splitext(name)[1].lower() in MEDIA_EXTENSIONS
+
+
+def scan_media_files(root, on_directory=None, is_cancelled=None):
+    """Yield media file paths below root in directory order.
+
+    Uses os.scandir so file type checks come from the directory listing
+    instead of extra stat calls. on_directory(path) is called for every
+    directory visited and is_cancelled() is polled between directories.
+    Unreadable directories are skipped, as os.walk does.
+    """
+    extensions = MEDIA_EXTENSIONS
+    splitext = os.path.splitext
+    stack = [root]
+    while stack:
+        if is_cancelled is not None and is_cancelled():
+            return
+        directory = stack.pop()
+        if on_directory is not None:
+            on_directory(directory)
+        try:
+            with os.scandir(directory) as entries:
+                files = []
+                subdirs = []
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif splitext(entry.name)[1].lower() in extensions and entry.is_file():
+                            files.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        files.sort()
+        yield from files
+        subdirs.sort(reverse=True)
+        stack.extend(subdirs)
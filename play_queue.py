@@ -0,0 +1,297 @@
+"""
+Play order of the playlist: sequential or shuffled, repeat modes, a play
+next queue and a bounded history.
+
+Shuffle is a Fisher-Yates permutation drawn lazily. perm[:drawn] holds the
+tracks already played in the current cycle, and each step swaps one random
+track from the undrawn tail into place. A step is O(1) however long the
+playlist is, and nothing is shuffled up front. The permutation and its
+inverse are NumPy arrays, so renumbering rows after an insert or removal is
+a few vectorised passes. Tracks are playlist rows. The owner reports
+inserted and removed row ranges as a Qt model announces them. Removals
+that arrive bottom-up are batched and applied together on the next query.
+Has no Qt dependency.
+"""
+import random
+from collections import deque
+
+import numpy as np
+
+REPEAT_OFF = "off"
+REPEAT_ALL = "all"
+REPEAT_ONE = "one"
+REPEAT_MODES = (REPEAT_OFF, REPEAT_ALL, REPEAT_ONE)
+
+HISTORY_LENGTH = 1000
+
+
+class PlayQueue:
+    """Decides which playlist row plays next or previous"""
+    def __init__(self, count=0, rng=None):
+        self._count = count
+        self._current = -1
+        self.shuffle = False
+        self.repeat = REPEAT_OFF
+        self.up_next = deque()
+        self.history = deque(maxlen=HISTORY_LENGTH)
+        # Tracks stepped back over with previous, next returns through them first
+        self.forward = deque(maxlen=HISTORY_LENGTH)
+        self.random = rng or random.Random()
+        self._perm = None
+        self._where = None
+        self._drawn = 0
+        self._peeked = None
+        # Row that took the place of a removed current track
+        self._resume = None
+        # Removed (first, last) ranges not applied yet, lowest last
+        self._pending = []
+
+    def __len__(self):
+        self._flush()
+        return self._count
+
+    @property
+    def current(self):
+        """Row of the playing track, -1 when it is not in the playlist"""
+        self._flush()
+        return self._current
+
+    def reset(self, count=0):
+        self._count = count
+        self._current = -1
+        self.up_next.clear()
+        self.history.clear()
+        self.forward.clear()
+        self._perm = None
+        self._where = None
+        self._drawn = 0
+        self._peeked = None
+        self._resume = None
+        self._pending = []
+
+    def set_shuffle(self, enabled):
+        self._flush()
+        self.shuffle = enabled
+        self.forward.clear()
+        self._new_cycle()
+        if enabled and self._current >= 0:
+            self._mark_drawn(self._current)
+
+    def set_repeat(self, mode):
+        if mode not in REPEAT_MODES:
+            raise ValueError(f"Unknown repeat mode: {mode}")
+        self.repeat = mode
+
+    def cycle_repeat(self):
+        self.repeat = REPEAT_MODES[(REPEAT_MODES.index(self.repeat) + 1) % len(REPEAT_MODES)]
+        return self.repeat
+
+    def queue_next(self, rows):
+        """Play rows right after the current track, ahead of anything queued before"""
+        self._flush()
+        self.up_next.extendleft(reversed(list(rows)))
+
+    def enqueue(self, rows):
+        self._flush()
+        self.up_next.extend(rows)
+
+    def start(self, row):
+        """Make row the current track, after a jump or for a row returned by peek_next"""
+        self._flush()
+        if row == self._current:
+            return
+        if self.up_next and self.up_next[0] == row:
+            self.up_next.popleft()
+        elif self.forward and self.forward[-1] == row:
+            self.forward.pop()
+        else:
+            self.forward.clear()
+        if self._current >= 0:
+            self.history.append(self._current)
+        self._current = row
+        self._resume = None
+        if self.shuffle and 0 <= row < self._count:
+            self._mark_drawn(row)
+
+    def peek_next(self, auto=False):
+        """Row next would move to without moving it, auto means the track ended"""
+        self._flush()
+        if auto and self.repeat == REPEAT_ONE and self._current >= 0:
+            return self._current
+        if self.up_next:
+            return self.up_next[0]
+        if auto and self._current < 0 and self._resume is None:
+            # The track that ended was never part of the playlist
+            return None
+        if self.forward:
+            return self.forward[-1]
+        if self._count == 0:
+            return None
+        if self.shuffle:
+            return self._draw()
+        if self._current >= 0:
+            row = self._current + 1
+        else:
+            row = self._resume if self._resume is not None else 0
+        if row < self._count:
+            return row
+        return 0 if self.repeat == REPEAT_ALL else None
+
+    def next(self, auto=False):
+        row = self.peek_next(auto)
+        if row is not None:
+            self.start(row)
+        return row
+
+    def previous(self):
+        """Step back through the history, or to the row above when there is none"""
+        self._flush()
+        if self.history:
+            row = self.history.pop()
+        elif self.shuffle or self._count == 0:
+            return None
+        else:
+            base = self._current if self._current >= 0 else (self._resume or 0)
+            if base > 0:
+                row = base - 1
+            elif self.repeat == REPEAT_ALL:
+                row = self._count - 1
+            else:
+                return None
+        if self._current >= 0:
+            self.forward.append(self._current)
+        self._current = row
+        self._resume = None
+        return row
+
+    def insert_range(self, first, last):
+        """Rows first..last were inserted, later rows moved down"""
+        self._flush()
+        added = last - first + 1
+        appended = first >= self._count
+        if not appended:
+            self._current = self._shift_row(self._current, first, added)
+            self._resume = self._shift_row(self._resume, first, added)
+            for rows in (self.up_next, self.history, self.forward):
+                shifted = [self._shift_row(row, first, added) for row in rows]
+                rows.clear()
+                rows.extend(shifted)
+        if self._perm is not None:
+            self._reserve(self._count + added)
+            perm = self._perm
+            if not appended:
+                live = perm[:self._count]
+                live[live >= first] += added
+            # New tracks join the part of the cycle that has not been played yet
+            perm[self._count:self._count + added] = np.arange(first, first + added)
+            if appended:
+                self._where[first:first + added] = np.arange(self._count, self._count + added)
+            else:
+                self._where[perm[:self._count + added]] = np.arange(self._count + added)
+        self._count += added
+        self._peeked = None
+
+    def remove_range(self, first, last):
+        """Rows first..last were removed, later rows moved up"""
+        if self._pending and last >= self._pending[-1][0]:
+            # Only ranges below everything pending keep their original numbers
+            self._flush()
+        self._pending.append((first, last))
+
+    @staticmethod
+    def _shift_row(row, first, added):
+        return row + added if row is not None and row >= first else row
+
+    def _flush(self):
+        if not self._pending:
+            return
+        removed = np.concatenate([np.arange(first, last + 1) for first, last in self._pending])
+        removed.sort()
+        self._pending = []
+        old_count = self._count
+        self._count -= len(removed)
+
+        def renumber(rows):
+            """New numbers of rows and a mask of the ones that still exist"""
+            rows = np.asarray(rows, dtype=np.int64)
+            below = np.searchsorted(removed, rows)
+            gone = (below < len(removed)) & (removed[np.minimum(below, len(removed) - 1)] == rows)
+            return rows - below, ~gone
+
+        if self._current >= 0:
+            (row,), (alive,) = renumber([self._current])
+            if alive:
+                self._current = int(row)
+            else:
+                # Next continues with whatever moved into the removed track's place
+                self._current = -1
+                self._resume = int(row)
+        elif self._resume is not None:
+            (row,), _alive = renumber([self._resume])
+            self._resume = int(row)
+        for rows in (self.up_next, self.history, self.forward):
+            if rows:
+                numbers, alive = renumber(list(rows))
+                rows.clear()
+                rows.extend(numbers[alive].tolist())
+        if self._perm is not None:
+            numbers, alive = renumber(self._perm[:old_count])
+            self._drawn = int(np.count_nonzero(alive[:self._drawn]))
+            numbers = numbers[alive]
+            self._perm[:self._count] = numbers
+            self._where[numbers] = np.arange(self._count)
+        self._peeked = None
+
+    def _reserve(self, count):
+        if self._perm is None:
+            capacity = max(16, count)
+            self._perm = np.arange(capacity, dtype=np.int64)
+            self._where = np.arange(capacity, dtype=np.int64)
+        elif count > len(self._perm):
+            capacity = max(count, 2 * len(self._perm))
+            for name in ("_perm", "_where"):
+                grown = np.empty(capacity, dtype=np.int64)
+                grown[:self._count] = getattr(self, name)[:self._count]
+                setattr(self, name, grown)
+
+    def _new_cycle(self):
+        self._drawn = 0
+        self._peeked = None
+
+    def _swap(self, i, j):
+        perm = self._perm
+        a = int(perm[i])
+        b = int(perm[j])
+        perm[i] = b
+        perm[j] = a
+        self._where[b] = i
+        self._where[a] = j
+
+    def _mark_drawn(self, row):
+        if self._perm is None:
+            self._reserve(self._count)
+        if self._drawn >= self._count:
+            self._new_cycle()
+        position = int(self._where[row])
+        if position >= self._drawn:
+            self._swap(position, self._drawn)
+            self._drawn += 1
+        self._peeked = None
+
+    def _draw(self):
+        if self._peeked is not None:
+            return self._peeked
+        if self._perm is None:
+            self._reserve(self._count)
+        if self._drawn >= self._count:
+            if self.repeat != REPEAT_ALL:
+                return None
+            self._new_cycle()
+        remaining = self._count - self._drawn
+        pick = self._drawn + self.random.randrange(remaining)
+        if remaining > 1 and int(self._perm[pick]) == self._current:
+            # A new cycle never opens with the track that just played
+            pick = self._drawn + (pick - self._drawn + 1 + self.random.randrange(remaining - 1)) % remaining
+        self._swap(pick, self._drawn)
+        self._peeked = int(self._perm[self._drawn])
+        return self._peeked
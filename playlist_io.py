@@ -0,0 +1,257 @@
+"""
+Streaming M3U/M3U8, PLS and XSPF playlist reading and writing.
+
+Readers are generators that yield one PlaylistEntry at a time, so a
+playlist file is never held in memory as a whole. Writers take any
+iterable of paths or entries and stream through a large write buffer.
+Has no Qt dependency.
+"""
+import codecs
+import os
+from collections import namedtuple
+from urllib.parse import quote, unquote, urlparse
+from urllib.request import pathname2url, url2pathname
+from xml.etree.ElementTree import iterparse
+from xml.sax.saxutils import escape
+
+PlaylistEntry = namedtuple("PlaylistEntry", ["path", "title", "duration"])
+
+PLAYLIST_EXTENSIONS = ('.m3u8', '.m3u', '.pls', '.xspf')
+WRITE_BUFFER = 1 << 20
+XSPF_NS = "{http://xspf.org/ns/0/}"
+# Streams a playlist may name without the // of a network location
+REMOTE_SCHEMES = ('http', 'https', 'ftp', 'mms', 'rtmp', 'rtp', 'rtsp', 'udp')
+
+
+def playlist_file_filter():
+    """File dialog filter string for the supported playlist formats"""
+    return ("M3U Playlist (*.m3u8 *.m3u);;PLS Playlist (*.pls);;"
+            "XSPF Playlist (*.xspf);;All Files (*)")
+
+
+def playlist_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.m3u', '.m3u8'):
+        return 'm3u'
+    if ext == '.pls':
+        return 'pls'
+    if ext == '.xspf':
+        return 'xspf'
+    raise ValueError(f"Unsupported playlist format: {ext or path}")
+
+
+def detect_encoding(path, sample_size=65536):
+    """Guess a text playlist's encoding from its first bytes.
+
+    A BOM wins, .m3u8 is UTF-8 by definition, otherwise the sample must
+    decode as UTF-8 or the legacy Windows code page is assumed.
+    """
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    if path.lower().endswith('.m3u8'):
+        return 'utf-8'
+    try:
+        # A multi-byte character cut at the sample boundary is not an error
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp1252'
+
+
+def resolve_location(location, base_dir):
+    """Turn a playlist location into a local path, None for remote URLs"""
+    location = location.strip()
+    if not location:
+        return None
+    # Only pay for URL parsing when the line can be a URL at all
+    if ':' in location[2:]:
+        parsed = urlparse(location)
+        scheme = parsed.scheme.lower()
+        if scheme == 'file':
+            # url2pathname unquotes on its own on Windows
+            return os.path.normpath(url2pathname(parsed.path) if os.name == 'nt'
+                                    else unquote(parsed.path))
+        # Single letter schemes are Windows drive letters, and a colon alone
+        # may just be part of a file name such as "Artist: Title.mp3"
+        if len(scheme) > 1 and ('://' in location or scheme in REMOTE_SCHEMES):
+            return None
+    if not os.path.isabs(location):
+        location = os.path.join(base_dir, location)
+    return os.path.normpath(location)
+
+
+def _parse_duration(text):
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return value if value >= 0 else None
+
+
+def iter_m3u(path):
+    base_dir = os.path.dirname(os.path.abspath(path))
+    title = duration = None
+    with open(path, 'r', encoding=detect_encoding(path), errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#'):
+                if line.startswith('#EXTINF:'):
+                    info, _, title = line[8:].partition(',')
+                    # Attributes such as tvg-id="..." may follow the duration
+                    duration = _parse_duration(info.split(' ', 1)[0])
+                    title = title.strip() or None
+                continue
+            local_path = resolve_location(line, base_dir)
+            if local_path is not None:
+                yield PlaylistEntry(local_path, title, duration)
+            title = duration = None
+
+
+def iter_pls(path):
+    """PLS keys are numbered, entries are yielded as soon as the next number starts"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    current = None
+    fields = {}
+
+    def entry():
+        local_path = resolve_location(fields.get('file', ''), base_dir)
+        if local_path is None:
+            return None
+        return PlaylistEntry(local_path, fields.get('title') or None,
+                             _parse_duration(fields.get('length', '')))
+
+    with open(path, 'r', encoding=detect_encoding(path), errors='replace') as f:
+        for line in f:
+            key, sep, value = line.strip().partition('=')
+            if not sep:
+                continue
+            key = key.strip().lower()
+            for field in ('file', 'title', 'length'):
+                if key.startswith(field) and key[len(field):].isdigit():
+                    number = int(key[len(field):])
+                    if number != current:
+                        if current is not None:
+                            result = entry()
+                            if result is not None:
+                                yield result
+                        current = number
+                        fields = {}
+                    fields[field] = value.strip()
+                    break
+    if current is not None:
+        result = entry()
+        if result is not None:
+            yield result
+
+
+def iter_xspf(path):
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for _event, elem in iterparse(path, events=('end',)):
+        if elem.tag != XSPF_NS + 'track':
+            continue
+        location = elem.findtext(XSPF_NS + 'location')
+        title = elem.findtext(XSPF_NS + 'title')
+        duration = elem.findtext(XSPF_NS + 'duration')
+        # Drop the finished track so the parsed tree never grows
+        elem.clear()
+        location = (location or '').strip()
+        if location and not urlparse(location).scheme:
+            # Relative XSPF locations are URI references
+            location = unquote(location)
+        local_path = resolve_location(location, base_dir)
+        if local_path is not None:
+            seconds = _parse_duration(duration) if duration else None
+            yield PlaylistEntry(local_path, title or None,
+                                seconds / 1000.0 if seconds is not None else None)
+
+
+def iter_playlist(path):
+    """Yield PlaylistEntry items from any supported playlist file"""
+    readers = {'m3u': iter_m3u, 'pls': iter_pls, 'xspf': iter_xspf}
+    return readers[playlist_format(path)](path)
+
+
+def _as_entry(item):
+    if isinstance(item, PlaylistEntry):
+        return item
+    return PlaylistEntry(item, None, None)
+
+
+def _location(entry_path, prefix):
+    """Path relative to the playlist folder when it lives below it, else unchanged"""
+    if prefix and entry_path.startswith(prefix):
+        return entry_path[len(prefix):]
+    return entry_path
+
+
+def _relative_prefix(path, relative):
+    if not relative:
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(path)), '')
+
+
+def _title(entry):
+    return entry.title or os.path.splitext(os.path.basename(entry.path))[0]
+
+
+def write_m3u(path, items, relative=True):
+    prefix = _relative_prefix(path, relative)
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='\n', buffering=WRITE_BUFFER) as f:
+        f.write('#EXTM3U\n')
+        for entry in map(_as_entry, items):
+            duration = int(round(entry.duration)) if entry.duration is not None else -1
+            f.write(f"#EXTINF:{duration},{_title(entry)}\n"
+                    f"{_location(entry.path, prefix)}\n")
+            count += 1
+    return count
+
+
+def write_pls(path, items, relative=True):
+    prefix = _relative_prefix(path, relative)
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='\n', buffering=WRITE_BUFFER) as f:
+        f.write('[playlist]\n')
+        for number, entry in enumerate(map(_as_entry, items), 1):
+            duration = int(round(entry.duration)) if entry.duration is not None else -1
+            f.write(f"File{number}={_location(entry.path, prefix)}\n"
+                    f"Title{number}={_title(entry)}\n"
+                    f"Length{number}={duration}\n")
+            count = number
+        # Written last so entries can be streamed without counting them first
+        f.write(f"NumberOfEntries={count}\nVersion=2\n")
+    return count
+
+
+def write_xspf(path, items, relative=True):
+    prefix = _relative_prefix(path, relative)
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='\n', buffering=WRITE_BUFFER) as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<playlist version="1" xmlns="http://xspf.org/ns/0/">\n  <trackList>\n')
+        for entry in map(_as_entry, items):
+            location = _location(entry.path, prefix)
+            if os.path.isabs(location):
+                location = 'file:' + pathname2url(location)
+            else:
+                location = quote(location.replace(os.sep, '/'))
+            f.write(f"    <track>\n      <location>{escape(location)}</location>\n"
+                    f"      <title>{escape(_title(entry))}</title>\n")
+            if entry.duration is not None:
+                f.write(f"      <duration>{int(entry.duration * 1000)}</duration>\n")
+            f.write("    </track>\n")
+            count += 1
+        f.write('  </trackList>\n</playlist>\n')
+    return count
+
+
+def write_playlist(path, items, relative=True):
+    """Write paths or PlaylistEntry items in the format implied by path, returns count written"""
+    writers = {'m3u': write_m3u, 'pls': write_pls, 'xspf': write_xspf}
+    return writers[playlist_format(path)](path, items, relative)
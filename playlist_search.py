@@ -0,0 +1,165 @@
+"""
+Incremental substring search over playlist paths.
+
+Entries are indexed under the words of their basename and directory
+components, and the vocabulary itself is indexed by bigram. A query
+finds the words containing each of its word fragments through the
+bigram index, takes the entries listed under them as candidates and
+then verifies the real substring match. Entries carry ids that grow in
+playlist order, so rows are recovered with a bisect after removals
+without renumbering the postings.
+"""
+import os
+import re
+from array import array
+from bisect import bisect_left
+from itertools import compress, repeat
+from operator import contains
+
+WORD_RE = re.compile(r"\w+")
+
+
+def search_text(path):
+    """Lowercased basename and directory components, separated by '/'"""
+    return path.replace(os.sep, "/").lower()
+
+
+class PlaylistSearchIndex:
+    """Word index over playlist rows with query narrowing as the user types"""
+    # Above this share of the playlist a plain scan beats walking candidates
+    SCAN_FRACTION = 0.5
+    # Single characters cannot use the bigram index, they fall back to a scan
+    MIN_FRAGMENT = 2
+    # Candidate sets this small are verified directly instead of probing more fragments
+    CHEAP_VERIFY = 2000
+
+    def __init__(self, paths=()):
+        self._texts = []
+        self._postings = {}
+        self._words = []
+        self._word_grams = {}
+        self._row_ids = []
+        self._last_tokens = None
+        self._last_ids = None
+        self.add(paths)
+
+    def __len__(self):
+        return len(self._row_ids)
+
+    def add(self, paths):
+        texts = self._texts
+        postings = self._postings
+        findall = WORD_RE.findall
+        first_id = len(texts)
+        texts.extend(map(search_text, paths))
+        self._row_ids.extend(range(first_id, len(texts)))
+        for entry_id in range(first_id, len(texts)):
+            for word in set(findall(texts[entry_id])):
+                posting = postings.get(word)
+                if posting is None:
+                    postings[word] = array('I', (entry_id,))
+                    self._add_word(word)
+                else:
+                    posting.append(entry_id)
+        self._last_tokens = None
+
+    def _add_word(self, word):
+        word_id = len(self._words)
+        self._words.append(word)
+        word_grams = self._word_grams
+        for gram in {word[i:i + 2] for i in range(len(word) - 1)}:
+            grams = word_grams.get(gram)
+            if grams is None:
+                word_grams[gram] = array('I', (word_id,))
+            else:
+                grams.append(word_id)
+
+    def remove_rows(self, first, last):
+        for entry_id in self._row_ids[first:last + 1]:
+            # An empty text never matches, stale postings are filtered for free
+            self._texts[entry_id] = ""
+        del self._row_ids[first:last + 1]
+        self._last_tokens = None
+
+    def rebuild(self, paths):
+        self._texts = []
+        self._postings = {}
+        self._words = []
+        self._word_grams = {}
+        self._row_ids = []
+        self.add(paths)
+
+    def _matching_words(self, fragment):
+        word_grams = self._word_grams
+        best = None
+        for i in range(len(fragment) - 1):
+            grams = word_grams.get(fragment[i:i + 2])
+            if grams is None:
+                return []
+            if best is None or len(grams) < len(best):
+                best = grams
+        words = list(map(self._words.__getitem__, best))
+        return list(compress(words, map(contains, words, repeat(fragment))))
+
+    def _narrows_last(self, tokens):
+        # Every previous token is still required, so the last result is a superset
+        return self._last_tokens is not None and all(
+            any(old in new for new in tokens) for old in self._last_tokens)
+
+    def _candidate_ids(self, tokens):
+        """Smallest known superset of the matching ids, or None when a full scan is cheaper"""
+        postings = self._postings
+        limit = len(self._texts) * self.SCAN_FRACTION
+        best = None
+        best_size = None
+        fragments = [fragment for token in tokens for fragment in WORD_RE.findall(token)
+                     if len(fragment) >= self.MIN_FRAGMENT]
+        for fragment in sorted(fragments, key=len, reverse=True):
+            if best_size is not None and best_size <= self.CHEAP_VERIFY:
+                break
+            matched = []
+            size = 0
+            for word in self._matching_words(fragment):
+                posting = postings[word]
+                matched.append(posting)
+                size += len(posting)
+                if size > limit:
+                    break
+            if size <= limit and (best is None or size < best_size):
+                best, best_size = matched, size
+        if self._narrows_last(tokens) and (best is None or len(self._last_ids) <= best_size):
+            best, best_size = [self._last_ids], len(self._last_ids)
+        if best is None:
+            return None
+        if len(best) == 1:
+            return best[0]
+        return sorted(set().union(*best))
+
+    def search(self, query):
+        """Playlist rows matching every whitespace separated query token, or None for no filter"""
+        tokens = search_text(query).split()
+        if not tokens:
+            self._last_tokens = None
+            return None
+        texts = self._texts
+        ids = self._candidate_ids(tokens)
+        for token in sorted(tokens, key=len, reverse=True):
+            if ids is None:
+                ids = list(compress(range(len(texts)), map(contains, texts, repeat(token))))
+            else:
+                ids = list(compress(ids, map(contains, map(texts.__getitem__, ids), repeat(token))))
+        self._last_tokens = tokens
+        self._last_ids = ids
+        row_ids = self._row_ids
+        if len(row_ids) == len(texts):
+            # Nothing removed yet, ids are still row numbers
+            return ids
+        return [bisect_left(row_ids, entry_id) for entry_id in ids]
+
+    def search_rows(self, query, first, last):
+        """Rows in first..last matching the query, used to filter freshly appended rows"""
+        tokens = search_text(query).split()
+        texts = self._texts
+        row_ids = self._row_ids
+        return [row for row in range(first, last + 1)
+                if all(token in texts[row_ids[row]] for token in tokens)]
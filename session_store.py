@@ -0,0 +1,286 @@
+"""
+Player session kept across restarts: settings, the playlist, favorites,
+recent files and a resume position for every file.
+
+State lives in a snapshot and an append-only journal of JSON lines. A
+change is a short line appended to the journal, so a position that moves
+every few seconds never rewrites the whole session. Changes are held in
+memory and written together by flush, and settings and resume positions
+written since the last flush keep only their latest value. Once the
+journal grows past COMPACT_BYTES the state is written to a new snapshot
+generation and the journal starts over. The snapshot is split in two: a
+small JSON state file that loads at startup, and the playlist as an M3U8
+file that a worker can read after the window is up. Files are replaced
+atomically, and a journal whose generation does not match the snapshot
+is stale and ignored, so a crash mid-compaction loses nothing. Has no Qt
+dependency.
+"""
+import json
+import os
+
+from playlist_io import iter_playlist, write_m3u
+
+STATE_FILE = "state.json"
+JOURNAL_FILE = "journal.jsonl"
+COMPACT_BYTES = 256 * 1024
+MAX_RESUME_POINTS = 1000
+MAX_RECENT = 20
+
+
+def _replace_atomically(path, write):
+    """Write a file through a temporary sibling so readers see the old or the new version"""
+    temp_path = path + ".tmp"
+    write(temp_path)
+    os.replace(temp_path, path)
+
+
+def apply_playlist_ops(paths, ops):
+    """Playlist after replaying journalled add, remove and clear operations"""
+    if not ops:
+        return list(paths)
+    # A dict keeps playlist order and makes each operation a hash lookup
+    entries = dict.fromkeys(paths)
+    for op in ops:
+        kind = op["op"]
+        if kind == "add":
+            for path in op["paths"]:
+                entries.setdefault(path)
+        elif kind == "remove":
+            for path in op["paths"]:
+                entries.pop(path, None)
+        elif kind == "clear":
+            entries.clear()
+    return list(entries)
+
+
+def read_playlist(playlist_path, ops=()):
+    """Snapshot playlist with journal operations applied, slow enough for a worker thread"""
+    paths = []
+    if playlist_path is not None and os.path.exists(playlist_path):
+        paths = [entry.path for entry in iter_playlist(playlist_path)]
+    return apply_playlist_ops(paths, ops)
+
+
+class SessionStore:
+    """Write-behind session state backed by a snapshot and an append-only journal"""
+    def __init__(self, folder):
+        self.folder = folder
+        self.generation = 0
+        self.values = {}
+        # Path to position in ms, oldest update first
+        self.resume = {}
+        self.favorites = set()
+        self.recent = []
+        self.playlist_file = None
+        # Playlist operations read from the journal, applied by read_playlist
+        self.playlist_ops = []
+        # Keys of the playlist once it is known, None until then
+        self._playlist = None
+        self._ops_while_loading = []
+        self._pending = []
+        self._pending_values = {}
+        self._pending_resume = {}
+        self._compact_requested = False
+        self.journal_bytes = 0
+
+    @property
+    def state_path(self):
+        return os.path.join(self.folder, STATE_FILE)
+
+    @property
+    def journal_path(self):
+        return os.path.join(self.folder, JOURNAL_FILE)
+
+    @property
+    def playlist_path(self):
+        return os.path.join(self.folder, self.playlist_file) if self.playlist_file else None
+
+    def load(self):
+        """Read the small state and replay the journal, the playlist itself is left for read_playlist"""
+        os.makedirs(self.folder, exist_ok=True)
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        self.generation = state.get("generation", 0)
+        self.values = state.get("values", {})
+        self.resume = state.get("resume", {})
+        self.favorites = set(state.get("favorites", ()))
+        self.recent = state.get("recent", [])
+        self.playlist_file = state.get("playlist")
+        self.playlist_ops = []
+        try:
+            with open(self.journal_path, encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            lines = []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A line cut short by a crash, everything before it stands
+                break
+        if not records or records[0].get("op") != "generation" or records[0].get("value") != self.generation:
+            # Written before the last compaction finished, the snapshot already holds it
+            records = []
+        for record in records[1:]:
+            self._apply(record)
+        if len(records) != len(lines):
+            # Later appends must not land behind a torn or stale line
+            self._rewrite_journal(records[1:])
+        else:
+            self.journal_bytes = sum(len(line) for line in lines)
+        if not self.playlist_file and not self.playlist_ops:
+            self._playlist = {}
+
+    def _apply(self, record):
+        kind = record.get("op")
+        if kind == "set":
+            self.values[record["key"]] = record["value"]
+        elif kind == "resume":
+            self._set_resume(record["path"], record["position"])
+        elif kind == "favorite":
+            if record["on"]:
+                self.favorites.add(record["path"])
+            else:
+                self.favorites.discard(record["path"])
+        elif kind == "recent":
+            self.recent = record["paths"]
+        elif kind in ("add", "remove", "clear"):
+            self.playlist_ops.append(record)
+
+    @property
+    def playlist_known(self):
+        return self._playlist is not None
+
+    def set(self, key, value):
+        if key in self.values and self.values[key] == value:
+            return
+        self.values[key] = value
+        self._pending_values[key] = value
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def _set_resume(self, path, position):
+        self.resume.pop(path, None)
+        if position:
+            self.resume[path] = position
+
+    def set_resume(self, path, position):
+        """Remember where path stopped, a position of None or 0 forgets it"""
+        if self.resume.get(path) == position:
+            return
+        self._set_resume(path, position)
+        self._pending_resume[path] = position or 0
+
+    def set_favorite(self, path, on):
+        if on:
+            self.favorites.add(path)
+        else:
+            self.favorites.discard(path)
+        self._pending.append({"op": "favorite", "path": path, "on": on})
+
+    def add_recent(self, path):
+        recent = [path] + [item for item in self.recent if item != path]
+        del recent[MAX_RECENT:]
+        if recent != self.recent:
+            self.recent = recent
+            self._pending.append({"op": "recent", "paths": recent})
+
+    def _playlist_op(self, record):
+        self._pending.append(record)
+        if self._playlist is None:
+            self._ops_while_loading.append(record)
+
+    def playlist_added(self, paths):
+        if self._playlist is not None:
+            paths = [path for path in paths if path not in self._playlist]
+            self._playlist.update(dict.fromkeys(paths))
+        if paths:
+            self._playlist_op({"op": "add", "paths": paths})
+
+    def playlist_removed(self, paths):
+        if self._playlist is not None:
+            paths = [path for path in paths if path in self._playlist]
+            for path in paths:
+                del self._playlist[path]
+        if paths:
+            self._playlist_op({"op": "remove", "paths": paths})
+
+    def playlist_replaced(self, paths):
+        """The whole playlist changed at once, the next flush writes a new snapshot"""
+        self._playlist = dict.fromkeys(paths)
+        self._ops_while_loading = []
+        self._pending = [record for record in self._pending if record["op"] not in ("add", "remove", "clear")]
+        self._compact_requested = True
+
+    def playlist_restored(self, paths):
+        """The playlist read by read_playlist, changes recorded in the meantime go on top"""
+        if self._playlist is None:
+            self._playlist = dict.fromkeys(apply_playlist_ops(paths, self._ops_while_loading))
+            self._ops_while_loading = []
+
+    def _trim_resume(self):
+        for path in list(self.resume)[:max(0, len(self.resume) - MAX_RESUME_POINTS)]:
+            del self.resume[path]
+
+    def flush(self):
+        """Append pending changes to the journal, compacting it once it has grown too long"""
+        records = self._pending
+        records.extend({"op": "set", "key": key, "value": value} for key, value in self._pending_values.items())
+        records.extend({"op": "resume", "path": path, "position": position}
+                       for path, position in self._pending_resume.items())
+        self._pending = []
+        self._pending_values = {}
+        self._pending_resume = {}
+        if self._playlist is not None and (self._compact_requested or self.journal_bytes > COMPACT_BYTES):
+            self.compact()
+            return
+        if not records:
+            return
+        if self.journal_bytes == 0:
+            self._rewrite_journal(records)
+            return
+        text = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        with open(self.journal_path, 'a', encoding='utf-8', newline='\n') as f:
+            f.write(text)
+        self.journal_bytes += len(text)
+
+    def _rewrite_journal(self, records):
+        """Start the journal over with a generation header followed by records"""
+        records = [{"op": "generation", "value": self.generation}] + list(records)
+        text = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+
+        def write_journal(path):
+            with open(path, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(text)
+
+        _replace_atomically(self.journal_path, write_journal)
+        self.journal_bytes = len(text)
+
+    def compact(self):
+        """Write everything to a new snapshot generation and start an empty journal"""
+        generation = self.generation + 1
+        self._trim_resume()
+        playlist_file = f"playlist-{generation}.m3u8"
+        _replace_atomically(os.path.join(self.folder, playlist_file),
+                            lambda path: write_m3u(path, list(self._playlist), relative=False))
+        state = {"generation": generation, "playlist": playlist_file, "values": self.values,
+                 "resume": self.resume, "favorites": sorted(self.favorites), "recent": self.recent}
+
+        def write_state(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, separators=(",", ":"))
+
+        _replace_atomically(self.state_path, write_state)
+        old_playlist = self.playlist_path
+        self.generation = generation
+        self.playlist_file = playlist_file
+        self._rewrite_journal([])
+        self.playlist_ops = []
+        self._compact_requested = False
+        if old_playlist and old_playlist != self.playlist_path and os.path.exists(old_playlist):
+            os.remove(old_playlist)
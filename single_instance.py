@@ -0,0 +1,126 @@
+"""
+Single instance mode over a local socket.
+
+The first launch listens on a QLocalServer. Later launches connect to it,
+send their files and flags as one JSON line, wait for a one byte
+acknowledgement and exit. This module only imports QtCore and QtNetwork,
+so a forwarding launch never loads widgets, NumPy or the multimedia
+backend.
+"""
+import getpass
+import hashlib
+import json
+import os
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtNetwork import QAbstractSocket, QLocalServer, QLocalSocket
+
+CONNECT_TIMEOUT = 200
+ACK_TIMEOUT = 2000
+ACK = b"+"
+# Launches with these flags always start their own process
+STANDALONE_FLAGS = ("--new-instance", "--profile-startup", "--telemetry-port", "--telemetry-log")
+
+
+def instance_name():
+    """Per-user server name, MEDIAPLAYER_INSTANCE overrides it for separate profiles"""
+    name = os.environ.get("MEDIAPLAYER_INSTANCE")
+    if name:
+        return name
+    try:
+        user = getpass.getuser()
+    except (KeyError, OSError):
+        user = str(os.getuid()) if hasattr(os, "getuid") else ""
+    return "MediaPlayer-" + hashlib.sha1(user.encode("utf-8")).hexdigest()[:12]
+
+
+def encode_message(files, flags):
+    return json.dumps({"files": files, "flags": flags}).encode("utf-8") + b"\n"
+
+
+def decode_message(data):
+    message = json.loads(data.decode("utf-8"))
+    return [str(path) for path in message.get("files", [])], dict(message.get("flags", {}))
+
+
+def launch_request(argv):
+    """(files, flags) to forward for a command line, None if it must run standalone"""
+    if any(arg.split("=", 1)[0] in STANDALONE_FLAGS for arg in argv[1:]):
+        return None
+    files = [os.path.abspath(arg) for arg in argv[1:] if not arg.startswith("-") and os.path.isfile(arg)]
+    return files, {"play": "--play" in argv[1:]}
+
+
+def forward(files, flags, name=None):
+    """Hand files to a running instance, True once it has acknowledged them"""
+    socket = QLocalSocket()
+    socket.connectToServer(name or instance_name())
+    if not socket.waitForConnected(CONNECT_TIMEOUT):
+        return False
+    socket.write(encode_message(files, flags))
+    if not socket.waitForBytesWritten(ACK_TIMEOUT) or not socket.waitForReadyRead(ACK_TIMEOUT):
+        socket.abort()
+        return False
+    acknowledged = bytes(socket.read(1)) == ACK
+    socket.disconnectFromServer()
+    return acknowledged
+
+
+class InstanceServer(QObject):
+    """Accepts forwarded launches and emits their files and flags"""
+    message_received = pyqtSignal(list, dict)
+
+    def __init__(self, name=None, parent=None):
+        super().__init__(parent)
+        self.name = name or instance_name()
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.accept)
+        self.buffers = {}
+
+    def listen(self, replace_stale=False):
+        if self.server.listen(self.name):
+            return True
+        if replace_stale and self.server.serverError() == QAbstractSocket.SocketError.AddressInUseError:
+            # Left behind by a crashed instance, nothing answered on it
+            QLocalServer.removeServer(self.name)
+            return self.server.listen(self.name)
+        return False
+
+    def close(self):
+        self.server.close()
+
+    def accept(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = bytearray()
+            socket.readyRead.connect(lambda socket=socket: self.read(socket))
+            socket.disconnected.connect(lambda socket=socket: self.drop(socket))
+
+    def read(self, socket):
+        buffer = self.buffers.get(socket)
+        if buffer is None:
+            return
+        buffer += bytes(socket.readAll())
+        line, newline, _rest = buffer.partition(b"\n")
+        if not newline:
+            return
+        del self.buffers[socket]
+        try:
+            files, flags = decode_message(bytes(line))
+        except (ValueError, AttributeError):
+            socket.abort()
+            return
+        socket.write(ACK)
+        socket.flush()
+        socket.disconnectFromServer()
+        self.message_received.emit(files, flags)
+
+    def drop(self, socket):
+        self.buffers.pop(socket, None)
+        socket.deleteLater()
+
+
+def forward_launch(argv, name=None):
+    """True when a running instance accepted this command line's files"""
+    request = launch_request(argv)
+    return request is not None and forward(*request, name=name)
@@ -0,0 +1,178 @@
+"""
+SRT, WebVTT and ASS/SSA subtitle parsing with an interval index.
+
+Cues are stored in parallel arrays sorted by start time. Because cues can
+overlap, a lookup bisects to the last cue that has started and walks back
+over the cues that started less than LONG_CUE_MS earlier, the only ones a
+short cue can still be on screen from. The few cues longer than that, such
+as a sign shown for a whole scene, sit in a separate list that every
+lookup checks. Has no Qt dependency.
+"""
+import codecs
+import os
+import re
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+Cue = namedtuple("Cue", ["start", "end", "text"])
+
+SRT_TIME = re.compile(r"(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})")
+VTT_TIME = re.compile(r"(?:(\d+):)?(\d{1,2}):(\d{1,2})\.(\d{1,3})")
+TAG_RE = re.compile(r"<[^>]+>")
+ASS_OVERRIDE_RE = re.compile(r"\{[^}]*\}")
+
+
+def _ms(hours, minutes, seconds, fraction):
+    fraction = (fraction + "00")[:3]
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(fraction)
+
+
+def _read_text(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    for bom, encoding in ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'),
+                          (codecs.BOM_UTF16_BE, 'utf-16')):
+        if raw.startswith(bom):
+            return raw.decode(encoding, 'replace')
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('cp1252', 'replace')
+
+
+def _clean(text):
+    return TAG_RE.sub("", text).strip()
+
+
+def parse_srt(text):
+    cues = []
+    for block in re.split(r"\n\s*\n", text.replace("\r\n", "\n").replace("\r", "\n")):
+        lines = block.strip().split("\n")
+        for i, line in enumerate(lines):
+            if "-->" in line:
+                start, _, end = line.partition("-->")
+                start_match = SRT_TIME.search(start)
+                end_match = SRT_TIME.search(end)
+                if start_match and end_match:
+                    body = _clean("\n".join(lines[i + 1:]))
+                    if body:
+                        cues.append(Cue(_ms(*start_match.groups()), _ms(*end_match.groups()), body))
+                break
+    return cues
+
+
+def parse_vtt(text):
+    cues = []
+    blocks = re.split(r"\n\s*\n", text.replace("\r\n", "\n").replace("\r", "\n"))
+    for block in blocks:
+        lines = block.strip().split("\n")
+        if not lines or lines[0].startswith(("WEBVTT", "NOTE", "STYLE", "REGION")):
+            continue
+        for i, line in enumerate(lines):
+            if "-->" in line:
+                start, _, end = line.partition("-->")
+                start_match = VTT_TIME.search(start)
+                # Cue settings such as 'align:start' follow the end time
+                end_match = VTT_TIME.search(end)
+                if start_match and end_match:
+                    body = _clean("\n".join(lines[i + 1:]))
+                    if body:
+                        cues.append(Cue(_ms(*start_match.groups()), _ms(*end_match.groups()), body))
+                break
+    return cues
+
+
+def _ass_time(value):
+    hours, minutes, seconds = value.strip().split(":")
+    whole, _, fraction = seconds.partition(".")
+    # ASS fractions are centiseconds
+    return _ms(hours, minutes, whole, fraction.ljust(2, "0")[:2] + "0")
+
+
+def parse_ass(text):
+    cues = []
+    fields = None
+    in_events = False
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("["):
+            in_events = line.lower() == "[events]"
+            continue
+        if not in_events:
+            continue
+        if line.startswith("Format:"):
+            fields = [name.strip().lower() for name in line[7:].split(",")]
+        elif line.startswith("Dialogue:") and fields:
+            values = line[9:].split(",", len(fields) - 1)
+            if len(values) != len(fields):
+                continue
+            record = dict(zip(fields, values))
+            try:
+                start = _ass_time(record["start"])
+                end = _ass_time(record["end"])
+            except (KeyError, ValueError):
+                continue
+            body = ASS_OVERRIDE_RE.sub("", record.get("text", ""))
+            body = body.replace("\\N", "\n").replace("\\n", "\n").replace("\\h", " ").strip()
+            if body:
+                cues.append(Cue(start, end, body))
+    return cues
+
+
+PARSERS = {'.srt': parse_srt, '.vtt': parse_vtt, '.ass': parse_ass, '.ssa': parse_ass}
+
+
+def load_subtitles(path):
+    """Parse a subtitle file into a CueIndex"""
+    ext = os.path.splitext(path)[1].lower()
+    parser = PARSERS.get(ext)
+    if parser is None:
+        raise ValueError(f"Unsupported subtitle format: {ext or path}")
+    return CueIndex(parser(_read_text(path)))
+
+
+class CueIndex:
+    """Sorted, array-backed cue store answering 'what is on screen at t' with a bisect"""
+    LONG_CUE_MS = 10_000
+
+    def __init__(self, cues):
+        cues = sorted(cues, key=lambda cue: (cue.start, cue.end))
+        self.starts = array('q', (cue.start for cue in cues))
+        self.ends = array('q', (cue.end for cue in cues))
+        self.texts = [cue.text for cue in cues]
+        self.long_cues = [i for i, cue in enumerate(cues) if cue.end - cue.start > self.LONG_CUE_MS]
+
+    def __len__(self):
+        return len(self.texts)
+
+    def active(self, position):
+        """Indices of the cues shown at position (ms), in start order"""
+        i = bisect_right(self.starts, position) - 1
+        result = []
+        starts = self.starts
+        ends = self.ends
+        # A short cue that started this long ago has ended, long ones are checked below
+        horizon = position - self.LONG_CUE_MS
+        while i >= 0 and starts[i] > horizon:
+            if ends[i] > position:
+                result.append(i)
+            i -= 1
+        result.reverse()
+        early = [index for index in self.long_cues if starts[index] <= horizon and ends[index] > position]
+        if early:
+            result = sorted(early + result)
+        return tuple(result)
+
+    def next_change(self, position):
+        """Earliest time after position at which the active set can change, None if never"""
+        candidates = []
+        i = bisect_right(self.starts, position)
+        if i < len(self.starts):
+            candidates.append(self.starts[i])
+        for index in self.active(position):
+            candidates.append(self.ends[index])
+        return min(candidates) if candidates else None
+
+    def text(self, indices):
+        return "\n".join(self.texts[i] for i in indices)
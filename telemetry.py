@@ -0,0 +1,243 @@
+"""
+Playback telemetry: counters, rolling rates and latency histograms.
+
+Latencies go into histograms with fixed, roughly logarithmic buckets in
+milliseconds. Every metric keeps all-time totals, which Prometheus scrapes
+as counters and cumulative buckets, and a ring of ten second slots over
+the last five minutes, which gives a snapshot its rates and percentiles.
+Recording is a dict lookup, a bisect over the bucket bounds and a few
+additions, cheap enough to run for every video frame. FrameClock turns
+the presentation times of delivered frames into dropped and late frame
+counts. Has no Qt dependency.
+"""
+import json
+import time
+from bisect import bisect_left
+
+SLOT_SECONDS = 10.0
+WINDOW_SLOTS = 30
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 250, 400, 600, 1000, 1500, 2500, 4000,
+                      6000, 10000, 30000)
+PREFIX = "mediaplayer_"
+
+
+def metric_key(name, labels=()):
+    """Prometheus style series name, name{label="value",...}"""
+    if not labels:
+        return name
+    pairs = ",".join('{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                     for key, value in labels)
+    return f"{name}{{{pairs}}}"
+
+
+def bucket_quantile(bounds, counts, fraction):
+    """Quantile estimated from bucket counts, interpolated inside the bucket as Prometheus does"""
+    total = sum(counts)
+    if total == 0:
+        return None
+    rank = fraction * total
+    seen = 0
+    for i, count in enumerate(counts):
+        if count and seen + count >= rank:
+            if i == len(bounds):
+                # Beyond the last bound only the bound itself is known
+                return float(bounds[-1])
+            lower = bounds[i - 1] if i > 0 else 0.0
+            return lower + (bounds[i] - lower) * (rank - seen) / count
+        seen += count
+    return float(bounds[-1])
+
+
+class RollingCounter:
+    """All-time total plus per-slot counts for the rolling window"""
+    def __init__(self):
+        self.total = 0
+        self.slots = [0] * WINDOW_SLOTS
+        self.slot = 0
+
+    def advance(self, slot):
+        if slot == self.slot:
+            return
+        for passed in range(max(self.slot + 1, slot - WINDOW_SLOTS + 1), slot + 1):
+            self.slots[passed % WINDOW_SLOTS] = 0
+        self.slot = slot
+
+    def add(self, slot, amount=1):
+        if slot != self.slot:
+            self.advance(slot)
+        self.total += amount
+        self.slots[slot % WINDOW_SLOTS] += amount
+
+    def recent(self, slot):
+        self.advance(slot)
+        return sum(self.slots)
+
+
+class RollingHistogram:
+    """Bucket counts for all time and for the rolling window, the last bucket is +Inf"""
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.slots = [[0] * (len(bounds) + 1) for _ in range(WINDOW_SLOTS)]
+        self.slot = 0
+
+    def advance(self, slot):
+        if slot == self.slot:
+            return
+        for passed in range(max(self.slot + 1, slot - WINDOW_SLOTS + 1), slot + 1):
+            counts = self.slots[passed % WINDOW_SLOTS]
+            counts[:] = [0] * len(counts)
+        self.slot = slot
+
+    def observe(self, slot, value):
+        if slot != self.slot:
+            self.advance(slot)
+        i = bisect_left(self.bounds, value)
+        self.counts[i] += 1
+        self.slots[slot % WINDOW_SLOTS][i] += 1
+        self.sum += value
+        self.count += 1
+
+    def recent(self, slot):
+        self.advance(slot)
+        return [sum(column) for column in zip(*self.slots)]
+
+
+class Telemetry:
+    """Named counters, histograms and gauges with JSON and Prometheus text snapshots"""
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.help = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def _slot(self):
+        return int((self.clock() - self.started) / SLOT_SECONDS)
+
+    def count(self, name, amount=1, labels=()):
+        counter = self.counters.get((name, labels))
+        if counter is None:
+            counter = self.counters[(name, labels)] = RollingCounter()
+        counter.add(self._slot(), amount)
+
+    def observe(self, name, value_ms, labels=()):
+        histogram = self.histograms.get((name, labels))
+        if histogram is None:
+            histogram = self.histograms[(name, labels)] = RollingHistogram()
+        histogram.observe(self._slot(), value_ms)
+
+    def set_gauge(self, name, value, labels=()):
+        self.gauges[(name, labels)] = value
+
+    def window_seconds(self):
+        """Length of time the rolling figures cover, shorter while the window fills"""
+        elapsed = self.clock() - self.started
+        return min(elapsed, (WINDOW_SLOTS - 1) * SLOT_SECONDS + elapsed % SLOT_SECONDS)
+
+    def snapshot(self):
+        slot = self._slot()
+        window = self.window_seconds()
+        counters = {}
+        for (name, labels), counter in sorted(self.counters.items()):
+            recent = counter.recent(slot)
+            counters[metric_key(name, labels)] = {
+                "total": counter.total, "recent": recent, "rate": recent / window if window > 0 else 0.0}
+        histograms = {}
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            recent = histogram.recent(slot)
+            stats = {"count": histogram.count, "mean_ms": histogram.sum / histogram.count if histogram.count else None,
+                     "recent_count": sum(recent)}
+            for label, fraction in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+                stats[label] = bucket_quantile(histogram.bounds, recent, fraction)
+            histograms[metric_key(name, labels)] = stats
+        gauges = {metric_key(name, labels): value for (name, labels), value in sorted(self.gauges.items())}
+        return {"time": time.time(), "uptime_s": self.clock() - self.started, "window_s": window,
+                "counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def json_line(self):
+        return json.dumps(self.snapshot(), separators=(",", ":")) + "\n"
+
+    def prometheus_text(self):
+        """Text exposition format 0.0.4, latencies in seconds as Prometheus expects"""
+        lines = []
+
+        def header(name, kind, base):
+            if base in self.help:
+                lines.append(f"# HELP {name} {self.help[base]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for base in sorted({name for name, _labels in self.counters}):
+            name = f"{PREFIX}{base}_total"
+            header(name, "counter", base)
+            for (series, labels), counter in sorted(self.counters.items()):
+                if series == base:
+                    lines.append(f"{metric_key(name, labels)} {counter.total}")
+        for base in sorted({name for name, _labels in self.histograms}):
+            name = f"{PREFIX}{base}_seconds"
+            header(name, "histogram", base)
+            for (series, labels), histogram in sorted(self.histograms.items()):
+                if series != base:
+                    continue
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{metric_key(name + '_bucket', labels + (('le', f'{bound / 1000:g}'),))} "
+                                 f"{cumulative}")
+                lines.append(f"{metric_key(name + '_bucket', labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{metric_key(name + '_sum', labels)} {histogram.sum / 1000:.6f}")
+                lines.append(f"{metric_key(name + '_count', labels)} {histogram.count}")
+        for base in sorted({name for name, _labels in self.gauges}):
+            name = f"{PREFIX}{base}"
+            header(name, "gauge", base)
+            for (series, labels), value in sorted(self.gauges.items()):
+                if series == base:
+                    lines.append(f"{metric_key(name, labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+class FrameClock:
+    """Dropped and late frames from the presentation times of the frames a sink delivers"""
+    # A jump this large in media time is a seek or loop, not dropped frames
+    JUMP_US = 1_000_000
+    # Frames arriving this long after the previous one follow a pause or stall
+    GAP_SECONDS = 1.0
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.anchor = None
+        self.previous_us = None
+        self.previous_wall = None
+        self.min_interval_us = None
+
+    def frame(self, start_us, now, rate=1.0, interval_us=None):
+        """(frames dropped before this one, whether it is late, its lateness in ms)"""
+        if start_us < 0:
+            return 0, False, 0.0
+        previous_us, previous_wall = self.previous_us, self.previous_wall
+        self.previous_us, self.previous_wall = start_us, now
+        if (previous_us is None or start_us <= previous_us or start_us - previous_us > self.JUMP_US
+                or now - previous_wall > self.GAP_SECONDS or rate <= 0):
+            self.anchor = (now, start_us)
+            return 0, False, 0.0
+        delta = start_us - previous_us
+        if self.min_interval_us is None or delta < self.min_interval_us:
+            self.min_interval_us = delta
+        interval = interval_us or self.min_interval_us
+        dropped = max(0, int(delta / interval + 0.5) - 1)
+        anchor_wall, anchor_us = self.anchor
+        lateness_ms = ((now - anchor_wall) * 1e6 - (start_us - anchor_us) / rate) / 1000.0
+        if lateness_ms < 0:
+            # An early frame shows the schedule was later than assumed
+            self.anchor = (now, start_us)
+            lateness_ms = 0.0
+        # Later than one frame interval means the previous frame stayed up too long
+        return dropped, lateness_ms * 1000.0 > interval, lateness_ms
@@ -0,0 +1,103 @@
+"""
+On-disk cache of seek bar sprite sheets with a size budget.
+
+Each sheet is an encoded image holding a grid of equally sized tiles plus a
+small JSON sidecar with the grid layout. Entries are keyed by file identity
+(path, size and modification time), so an edited file gets a fresh sheet.
+A sheet's modification time doubles as its last use time, and the least
+recently used sheets are evicted once the cache grows past its budget.
+Has no Qt dependency.
+"""
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+SheetLayout = namedtuple("SheetLayout", ["interval_ms", "count", "columns", "tile_width", "tile_height"])
+
+DEFAULT_BUDGET = 200 * 1024 * 1024
+
+
+def sheet_key(path, tile_width, tile_height):
+    """Cache key for a file's sheet, None when the file cannot be read"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    identity = f"{os.path.normcase(os.path.realpath(path))}\0{st.st_size}\0{st.st_mtime_ns}\0{tile_width}x{tile_height}"
+    return hashlib.sha1(identity.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+class ThumbnailCache:
+    """Sprite sheets stored as <key>.<ext> with a <key>.json layout next to them"""
+    def __init__(self, directory, budget_bytes=DEFAULT_BUDGET, extension='jpg'):
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        self.extension = extension
+        os.makedirs(directory, exist_ok=True)
+        # key -> (last use, size in bytes), loaded once and then kept in step
+        self._entries = {}
+        with os.scandir(directory) as it:
+            for entry in it:
+                key, ext = os.path.splitext(entry.name)
+                if ext == '.' + extension:
+                    st = entry.stat()
+                    self._entries[key] = (st.st_mtime, st.st_size)
+        self.total_bytes = sum(size for _used, size in self._entries.values())
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return f"{base}.{self.extension}", f"{base}.json"
+
+    def get(self, key):
+        """(layout, encoded image bytes) for key, None on a miss"""
+        if key not in self._entries:
+            return None
+        image_path, layout_path = self._paths(key)
+        try:
+            with open(layout_path, 'r', encoding='utf-8') as f:
+                layout = SheetLayout(**json.load(f))
+            with open(image_path, 'rb') as f:
+                data = f.read()
+            os.utime(image_path)
+        except (OSError, ValueError, TypeError):
+            self._drop(key)
+            return None
+        self._entries[key] = (os.path.getmtime(image_path), len(data))
+        return layout, data
+
+    def put(self, key, layout, data):
+        image_path, layout_path = self._paths(key)
+        # Write under temporary names so a crash never leaves a half sheet behind
+        with open(image_path + '.tmp', 'wb') as f:
+            f.write(data)
+        with open(layout_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(layout._asdict(), f)
+        os.replace(layout_path + '.tmp', layout_path)
+        os.replace(image_path + '.tmp', image_path)
+        old = self._entries.get(key)
+        if old is not None:
+            self.total_bytes -= old[1]
+        self._entries[key] = (os.path.getmtime(image_path), len(data))
+        self.total_bytes += len(data)
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """Remove least recently used sheets until the cache fits its budget"""
+        if self.total_bytes <= self.budget_bytes:
+            return
+        for key, _entry in sorted(self._entries.items(), key=lambda item: item[1][0]):
+            if self.total_bytes <= self.budget_bytes:
+                break
+            if key != keep:
+                self._drop(key)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass